@@ -1,4 +1,5 @@
 import { supabase } from '../utils/supabaseClient.js';
+import { publishChange } from '../utils/changeFeed.js';
 
 export async function getDailyMetrics() {
     const today = new Date();
@@ -365,10 +366,25 @@ export async function syncDailyMetricsSummary() {
     // We'll wipe the table and insert a single fresh record to ensure iloc[0] works correctly.
     try {
         await supabase.from('daily_metrics_summary').delete().neq('new_leads_today', -1);
-        const { error: insertError } = await supabase.from('daily_metrics_summary').insert([metricsPayload]);
+        const { data: savedMetrics, error: insertError } = await supabase
+            .from('daily_metrics_summary')
+            .insert([metricsPayload])
+            .select('*');
 
         if (insertError) throw insertError;
+        // The stored row, with its defaults (id, metric_date, updated_at)
+        publishChange({ metrics: savedMetrics });
         console.log('[Analytics] daily_metrics_summary synchronized successfully.');
+
+        // Keep the day's latest snapshot in the history (one row per metric_date)
+        const [saved] = savedMetrics;
+        const { data: savedHistory, error: historyError } = await supabase
+            .from('daily_metrics_history')
+            .upsert([{ ...metricsPayload, metric_date: saved.metric_date, updated_at: saved.updated_at }], { onConflict: 'metric_date' })
+            .select('*');
+
+        if (historyError) throw historyError;
+        publishChange({ metrics_history: savedHistory });
     } catch (err) {
         console.error('[Analytics] Failed to sync daily_metrics_summary:', err.message);
     }
@@ -1,7 +1,7 @@
 import express from 'express';
 import { supabase } from '../utils/supabaseClient.js';
 import { getFunnelMetrics, getSourceDistribution, getPipelineMetrics } from '../analytics/metrics.js';
-import { runPipeline } from '../scheduler/index.js';
+import { pipelineStatus, runPipeline } from '../scheduler/index.js';
 
 const router = express.Router();
 
@@ -63,16 +63,21 @@ router.post('/trigger', async (req, res) => {
     try {
         console.log("🚀 Manual Pipeline Triggered from Dashboard");
 
-        // Wait for pipeline to finish for "Real-time" feel
-        await runPipeline({ sendWhatsApp: false });
+        // Start (or join) the run and answer right away; progress is polled via /trigger/status
+        runPipeline({ sendWhatsApp: false }).catch(err => console.error("Pipeline Trigger Error:", err));
 
-        res.json({ message: "Pipeline completed successfully. Data is now up to date." });
+        res.status(202).json(pipelineStatus);
     } catch (error) {
         console.error("Pipeline Trigger Error:", error);
         res.status(500).json({ error: error.message });
     }
 });
 
+router.get('/trigger/status', (req, res) => {
+    res.set('Cache-Control', 'no-store');
+    res.json(pipelineStatus);
+});
+
 router.post('/whatsapp/webhook', async (req, res) => {
     try {
         console.log(`[WhatsApp Webhook] Incoming Root Hit:`, req.body);
@@ -3,58 +3,112 @@ import fs from 'fs';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import { supabase } from '../utils/supabaseClient.js';
+import { payloadEtag, sendConditional, sendConditionalJson } from '../utils/httpCache.js';
+import { COLUMNAR_TYPE, DEAL_SCHEMA, LEAD_SCHEMA, encodeColumnar, wantsColumnar } from '../utils/columnar.js';
+import { fetchAllPages, keysetPages } from '../utils/keyset.js';
+import { FEED_ID, changesSince, onChange } from '../utils/changeFeed.js';
+import { pipelineStatus } from '../scheduler/index.js';
 
 const router = express.Router();
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
 const SNAPSHOT_PATH = path.join(__dirname, '../../../data_snapshot.json');
 
-router.get('/data', async (req, res) => {
-    const { range_label, start_utc, end_utc } = req.query;
+// SSE keep-alive comment interval (proxies drop idle connections)
+const HEARTBEAT_MS = 15000;
 
-    try {
-        console.log(`[Dashboard Proxy] Fetching data for: ${range_label}`);
+// Version of the last full payload written to disk, so unchanged polls skip the write
+let snapshotEtag = null;
 
-        let leads_q = supabase.from('crm_leads').select('lead_id,owner_name,status,source,is_converted,created_time');
-        let deals_q = supabase.from('crm_deals').select('deal_id,lead_id,deal_name,owner_name,stage,source,amount,created_time,modified_time,closed_time');
+const LEAD_FIELDS = 'lead_id,owner_name,status,source,is_converted,created_time,modified_time';
+const DEAL_FIELDS = 'deal_id,lead_id,deal_name,owner_name,stage,source,amount,created_time,modified_time,closed_time';
 
+// Filtered leads/deals selects for a request; factories, since each page needs a fresh builder
+function rowQueries({ range_label, start_utc, end_utc, since }) {
+    const leads = () => {
+        let q = supabase.from('crm_leads').select(LEAD_FIELDS);
+        if (range_label !== 'All Time' && start_utc) {
+            q = q.gte('created_time', start_utc);
+            if (end_utc) q = q.lt('created_time', end_utc);
+        }
+        // Delta mode: only rows touched after the dashboard's high-water mark
+        if (since) q = q.or(`created_time.gt.${since},modified_time.gt.${since}`);
+        return q;
+    };
+    const deals = () => {
+        let q = supabase.from('crm_deals').select(DEAL_FIELDS);
         if (range_label !== 'All Time' && start_utc) {
-            leads_q = leads_q.gte('created_time', start_utc);
-            if (end_utc) leads_q = leads_q.lt('created_time', end_utc);
-
             // Inclusive OR filter for deals
-            const orFilter = `created_time.gte.${start_utc},modified_time.gte.${start_utc},closed_time.gte.${start_utc}`;
-            deals_q = deals_q.or(orFilter);
+            q = q.or(`created_time.gte.${start_utc},modified_time.gte.${start_utc},closed_time.gte.${start_utc}`);
+            // Bounded history range: only deals that already existed before its end
+            if (end_utc) q = q.lt('created_time', end_utc);
         }
+        if (since) q = q.or(`created_time.gt.${since},modified_time.gt.${since}`);
+        return q;
+    };
+    return { leads, deals };
+}
 
-        const [leadsRes, dealsRes, metricsRes, aiRes] = await Promise.all([
-            leads_q,
-            deals_q,
-            supabase.from('daily_metrics_summary').select('*').limit(1),
-            supabase.from('ai_summaries').select('id,payload,created_at').order('created_at', { ascending: false }).limit(1)
-        ]);
+function sideTables() {
+    return Promise.all([
+        supabase.from('daily_metrics_summary').select('*').limit(1),
+        supabase.from('ai_summaries').select('id,payload,created_at').order('created_at', { ascending: false }).limit(1)
+    ]);
+}
 
-        if (leadsRes.error) throw leadsRes.error;
-        if (dealsRes.error) throw dealsRes.error;
+router.get('/data', async (req, res) => {
+    const { range_label, end_utc, since } = req.query;
+
+    try {
+        console.log(`[Dashboard Proxy] Fetching data for: ${range_label}`);
+
+        // Every page of both tables: one plain select stops at PostgREST's row cap
+        const queries = rowQueries(req.query);
+        const [leads, deals, [metricsRes, aiRes]] = await Promise.all([
+            fetchAllPages(queries.leads, 'created_time', 'lead_id'),
+            fetchAllPages(queries.deals, 'created_time', 'deal_id'),
+            sideTables()
+        ]);
 
         const payload = {
-            leads: leadsRes.data,
-            deals: dealsRes.data,
+            leads,
+            deals,
             metrics: metricsRes.data,
             ai_table: aiRes.data,
             timestamp: new Date().toISOString()
         };
+        const etag = payloadEtag([payload.leads, payload.deals, payload.metrics, payload.ai_table]);
 
-        // Cache successful fetch
-        fs.writeFileSync(SNAPSHOT_PATH, JSON.stringify(payload, null, 2));
-        console.log(`[Dashboard Proxy] Snapshot saved to ${SNAPSHOT_PATH}`);
+        // Cache successful full fetch (a delta or bounded range would overwrite the snapshot with a partial set)
+        if (!since && !end_utc && etag !== snapshotEtag) {
+            fs.writeFileSync(SNAPSHOT_PATH, JSON.stringify(payload));
+            snapshotEtag = etag;
+            console.log(`[Dashboard Proxy] Snapshot saved to ${SNAPSHOT_PATH}`);
+        } else if (since) {
+            console.log(`[Dashboard Proxy] Delta since ${since}: ${leads.length} leads, ${deals.length} deals`);
+        }
 
-        res.json({ ...payload, source: 'live' });
+        // Lets the dashboard tell which pipeline run these rows belong to
+        res.set('X-Data-Version', pipelineStatus.dataVersion);
+
+        // Binary columnar mode for clients that ask for it; JSON otherwise
+        if (wantsColumnar(req)) {
+            const body = encodeColumnar(
+                {
+                    leads: { rows: payload.leads, schema: LEAD_SCHEMA },
+                    deals: { rows: payload.deals, schema: DEAL_SCHEMA }
+                },
+                { metrics: payload.metrics, ai_table: payload.ai_table, timestamp: payload.timestamp, source: 'live', since: since || null }
+            );
+            return sendConditional(req, res, body, etag.replace(/"$/, '-c"'), COLUMNAR_TYPE);
+        }
+
+        sendConditionalJson(req, res, { ...payload, source: 'live', since: since || null }, etag);
 
     } catch (error) {
         console.error('[Dashboard Proxy] Fetch Error:', error.message);
 
-        // Fallback to cache
-        if (fs.existsSync(SNAPSHOT_PATH)) {
+        // Fallback to cache (full fetches only — the dashboard keeps its frames on a failed delta or range)
+        if (!since && !end_utc && fs.existsSync(SNAPSHOT_PATH)) {
             console.log('[Dashboard Proxy] Serving from cache...');
             const cache = JSON.parse(fs.readFileSync(SNAPSHOT_PATH, 'utf-8'));
             return res.json({ ...cache, source: 'cache', error: error.message });
@@ -64,4 +118,152 @@ router.get('/data', async (req, res) => {
     }
 });
 
+// NDJSON stream of the same rows, one line per page as it arrives from Supabase:
+//   {"type":"meta", metrics, ai_table, timestamp}
+//   {"type":"page", "frame":"leads"|"deals", "rows":[...]}   (leads first, then deals)
+//   {"type":"end", "leads":n, "deals":n}  or  {"type":"error", "error":...}
+// The dashboard types and aggregates each page on arrival, so its first KPI
+// cards render long before a large superset has finished downloading.
+router.get('/stream', async (req, res) => {
+    const { range_label } = req.query;
+    let closed = false;
+    req.on('close', () => { closed = true; });
+
+    res.set('Content-Type', 'application/x-ndjson');
+    res.set('Cache-Control', 'no-cache');
+    // Lets the dashboard tell which pipeline run these rows belong to
+    res.set('X-Data-Version', pipelineStatus.dataVersion);
+    const send = (line) => res.write(JSON.stringify(line) + '\n');
+
+    const counts = { leads: 0, deals: 0 };
+    try {
+        console.log(`[Dashboard Proxy] Streaming data for: ${range_label}`);
+        const [metricsRes, aiRes] = await sideTables();
+        send({ type: 'meta', metrics: metricsRes.data, ai_table: aiRes.data, timestamp: new Date().toISOString(), source: 'live' });
+
+        const queries = rowQueries(req.query);
+        for (const [frame, id] of [['leads', 'lead_id'], ['deals', 'deal_id']]) {
+            for await (const rows of keysetPages(queries[frame], 'created_time', id)) {
+                if (closed) return;
+                counts[frame] += rows.length;
+                send({ type: 'page', frame, rows });
+            }
+        }
+        send({ type: 'end', ...counts });
+        console.log(`[Dashboard Proxy] Streamed ${counts.leads} leads, ${counts.deals} deals`);
+    } catch (error) {
+        // Headers are already out: report in-band, the dashboard falls back to its snapshots
+        console.error('[Dashboard Proxy] Stream Error:', error.message);
+        if (!closed) send({ type: 'error', error: error.message });
+    } finally {
+        res.end();
+    }
+});
+
+// Day-level aggregates for the KPI cards and charts, computed in Postgres by the
+// dashboard_rollup function (see utils/schema.sql): one row per IST day × stage ×
+// source × owner, so the body stays the same size however many records the CRM holds.
+// Raw rows are only requested for drill-downs (/data, /stream).
+router.get('/rollup', async (req, res) => {
+    const { start_utc, end_utc } = req.query;
+
+    try {
+        console.log(`[Dashboard Proxy] Rollup from ${start_utc} to ${end_utc || 'now'}`);
+        const [rollupRes, [metricsRes, aiRes]] = await Promise.all([
+            supabase.rpc('dashboard_rollup', { start_utc, end_utc: end_utc || null }),
+            sideTables()
+        ]);
+        if (rollupRes.error) throw rollupRes.error;
+
+        const payload = { ...rollupRes.data, metrics: metricsRes.data, ai_table: aiRes.data };
+        res.set('X-Data-Version', pipelineStatus.dataVersion);
+        sendConditionalJson(req, res, { ...payload, source: 'live' }, payloadEtag([payload]));
+    } catch (error) {
+        console.error('[Dashboard Proxy] Rollup Error:', error.message);
+        res.status(502).json({ error: 'Rollup unavailable', details: error.message });
+    }
+});
+
+// One page of the deal explorer, filtered and sorted in Postgres. In aggregate mode the
+// dashboard holds no deal rows, so the explorer asks for exactly the page it shows.
+const DEAL_SORTS = { newest: 'created_time', updated: 'modified_time', largest: 'amount' };
+const MAX_DEAL_PAGE = 200;
+
+router.get('/deals', async (req, res) => {
+    const { start_utc, search } = req.query;
+    // Filters repeat the parameter (?stage=a&stage=b): stage names may contain commas
+    const stages = [].concat(req.query.stage || []);
+    const sources = [].concat(req.query.source || []);
+    const sort = DEAL_SORTS[req.query.sort] || DEAL_SORTS.newest;
+    const pageSize = Math.min(parseInt(req.query.page_size, 10) || 50, MAX_DEAL_PAGE);
+    const from = Math.max(parseInt(req.query.page, 10) || 0, 0) * pageSize;
+
+    try {
+        let q = supabase.from('crm_deals').select(DEAL_FIELDS, { count: 'exact' });
+        // Same window as the row store: deals created, modified or closed since the start
+        if (start_utc) q = q.or(`created_time.gte.${start_utc},modified_time.gte.${start_utc},closed_time.gte.${start_utc}`);
+        if (stages.length) q = q.in('stage', stages);
+        if (sources.length) q = q.in('source', sources);
+        // PostgREST filter syntax characters cannot be escaped inside or(): drop them
+        const text = (search || '').replace(/[,()*%\\]/g, ' ').trim();
+        if (text) q = q.or(`deal_name.ilike.*${text}*,owner_name.ilike.*${text}*`);
+
+        const { data, count, error } = await q
+            .order(sort, { ascending: false, nullsFirst: false })
+            .order('deal_id', { ascending: true })
+            .range(from, from + pageSize - 1);
+        if (error) throw error;
+        res.json({ rows: data, total: count || 0 });
+    } catch (error) {
+        console.error('[Dashboard Proxy] Deals Page Error:', error.message);
+        res.status(502).json({ error: 'Deals page unavailable', details: error.message });
+    }
+});
+
+// Daily metrics history, oldest first. The dashboard keeps its own copy and only
+// asks for the days from its last stored date on (that day may have been updated).
+router.get('/metrics/history', async (req, res) => {
+    const { since } = req.query;
+
+    try {
+        const query = () => {
+            const q = supabase.from('daily_metrics_history').select('*');
+            return since ? q.gte('metric_date', since) : q;
+        };
+        const rows = await fetchAllPages(query, 'metric_date', 'metric_date');
+        sendConditionalJson(req, res, { rows }, payloadEtag([rows]));
+    } catch (error) {
+        console.error('[Dashboard Proxy] Metrics History Error:', error.message);
+        res.status(502).json({ error: 'Metrics history unavailable', details: error.message });
+    }
+});
+
+// Server-Sent Events: every change ingestion publishes (see utils/changeFeed.js).
+// A reconnect with Last-Event-ID gets the events it missed replayed; when that is
+// impossible the "ready" event says resumed=false and the dashboard catches up
+// with one delta fetch instead.
+router.get('/changes', (req, res) => {
+    res.set({
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+
+    const send = (event) => res.write(`id: ${event.id}\nevent: change\ndata: ${JSON.stringify(event)}\n\n`);
+    const missed = changesSince(req.get('Last-Event-ID'));
+    res.write(`event: ready\ndata: ${JSON.stringify({ feed: FEED_ID, resumed: missed !== null, version: pipelineStatus.dataVersion })}\n\n`);
+    (missed || []).forEach(send);
+
+    const unsubscribe = onChange(send);
+    const heartbeat = setInterval(() => res.write(': ping\n\n'), HEARTBEAT_MS);
+    console.log(`[Dashboard Proxy] Change feed subscriber connected (resumed: ${missed !== null})`);
+
+    req.on('close', () => {
+        clearInterval(heartbeat);
+        unsubscribe();
+    });
+});
+
 export default router;
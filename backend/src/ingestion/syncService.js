@@ -1,5 +1,6 @@
 import { fetchModifiedRecords } from './zohoClient.js';
 import { supabase } from '../utils/supabaseClient.js';
+import { publishChange } from '../utils/changeFeed.js';
 
 export async function getLastSyncTime(moduleName) {
     // Use ISO8601 format but Zoho expects it WITHOUT milliseconds (e.g. 2026-02-21T08:32:12Z or +05:30)
@@ -50,6 +51,7 @@ export async function syncLeads() {
 
     const { error } = await supabase.from('crm_leads').upsert(uniqueRecords, { onConflict: 'lead_id' });
     if (error) throw new Error(`Failed to upsert Leads: ${error.message}`);
+    publishChange({ leads: uniqueRecords });
 
     const maxModified = [...leads].sort((a, b) => new Date(b.Modified_Time).getTime() - new Date(a.Modified_Time).getTime())[0].Modified_Time;
     await setLastSyncTime('Leads', maxModified);
@@ -81,6 +83,7 @@ export async function syncDeals() {
 
     const { error } = await supabase.from('crm_deals').upsert(uniqueRecords, { onConflict: 'deal_id' });
     if (error) throw new Error(`Failed to upsert Deals: ${error.message}`);
+    publishChange({ deals: uniqueRecords });
 
     const maxModified = [...deals].sort((a, b) => new Date(b.Modified_Time).getTime() - new Date(a.Modified_Time).getTime())[0].Modified_Time;
     await setLastSyncTime('Deals', maxModified);
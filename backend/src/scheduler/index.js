@@ -4,23 +4,85 @@ import { syncLeads, syncDeals, resetSyncCursors } from '../ingestion/syncService
 import { getDailyMetrics, getSourceDistribution, getFunnelMetrics, getLeadsTrend, getHistoricalAverages, syncDailyMetricsSummary } from '../analytics/metrics.js';
 import { generateInsights, generateVizInsights, generateWhatsAppSummary } from '../ai/ollamaClient.js';
 import { sendWhatsAppMessage } from '../whatsapp/twilioClient.js';
+import { publishChange } from '../utils/changeFeed.js';
+
+const PIPELINE_STEPS = [
+    'Resetting sync cursors',
+    'Syncing leads',
+    'Syncing deals',
+    'Gathering analytics',
+    'Generating AI insights',
+    'Saving AI insights',
+    'Delivering WhatsApp summary'
+];
+
+// Progress of the current / last run, polled by the dashboard's Sync button.
+// dataVersion changes whenever the data the dashboard reads has been rewritten.
+export const pipelineStatus = {
+    runId: 0,
+    state: 'idle',
+    step: null,
+    stepIndex: 0,
+    totalSteps: PIPELINE_STEPS.length,
+    startedAt: null,
+    finishedAt: null,
+    error: null,
+    counts: {},
+    dataVersion: new Date().toISOString()
+};
+
+let currentRun = null;
+
+function setStep(index) {
+    pipelineStatus.stepIndex = index;
+    pipelineStatus.step = PIPELINE_STEPS[index];
+}
+
+function publishDataVersion() {
+    pipelineStatus.dataVersion = new Date().toISOString();
+    // Follows the row changes on the feed: a dashboard that applied them is now at this version
+    publishChange({ version: pipelineStatus.dataVersion });
+    console.log(`[Pipeline] Data version ${pipelineStatus.dataVersion} published`);
+}
+
+// Single-flight: a trigger while a run is in progress joins that run
+export function runPipeline(options = {}) {
+    if (!currentRun) {
+        currentRun = executePipeline(options).finally(() => { currentRun = null; });
+    }
+    return currentRun;
+}
 
-export async function runPipeline({ sendWhatsApp = false } = {}) {
+async function executePipeline({ sendWhatsApp = false } = {}) {
     console.log(`--- Starting Daily CRM Pipeline (WhatsApp: ${sendWhatsApp}) ---`);
+    Object.assign(pipelineStatus, {
+        runId: pipelineStatus.runId + 1,
+        state: 'running',
+        startedAt: new Date().toISOString(),
+        finishedAt: null,
+        error: null,
+        counts: {}
+    });
 
     try {
         console.log('0. Resetting Sync Cursors for Fresh Download...');
+        setStep(0);
         await resetSyncCursors();
 
         console.log('1. Syncing Fresh Leads...');
+        setStep(1);
         const leadsCount = await syncLeads();
+        pipelineStatus.counts.leads = leadsCount;
         console.log(`-> Synced ${leadsCount} leads.`);
 
         console.log('2. Syncing Deals...');
+        setStep(2);
         const dealsCount = await syncDeals();
+        pipelineStatus.counts.deals = dealsCount;
         console.log(`-> Synced ${dealsCount} deals.`);
 
         console.log('3. Gathering Analytics...');
+        setStep(3);
         const [metricsPayload, sourceDistribution, funnelMetrics, leadsTrend, historicalAvg] = await Promise.all([
             getDailyMetrics(),
             getSourceDistribution(),
@@ -30,6 +92,9 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
             syncDailyMetricsSummary()
         ]);
 
+        // Leads, deals and the daily summary are rewritten — dashboards can refresh now
+        publishDataVersion();
+
         // Safe math helper to compute 7-day change accurately
         const calculatePercentChange = (today, avg) => {
             if (avg === 0 || avg === null || avg === undefined || today === undefined) return 0;
@@ -64,6 +129,7 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
         };
 
         console.log('4. Generating AI Insights with Ollama ...');
+        setStep(4);
         const summaryJSON = await generateInsights(fullPayload);
 
         const vizPayload = { funnel: funnelMetrics, sources: sourceDistribution };
@@ -73,6 +139,7 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
         const whatsappJSON = await generateWhatsAppSummary(fullPayload);
 
         console.log('5. Saving Structured AI Insights to Database...');
+        setStep(5);
         const { supabase } = await import('../utils/supabaseClient.js');
         const fs = await import('fs');
         const path = await import('path');
@@ -121,9 +188,14 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
             }
         };
 
-        const { error: dbError } = await supabase.from('ai_summaries').insert([{ payload: dbPayload }]);
+        const { data: savedSummary, error: dbError } = await supabase
+            .from('ai_summaries')
+            .insert([{ payload: dbPayload }])
+            .select('id,payload,created_at');
         if (dbError) {
             console.error('[Database] Failed to save AI summary:', dbError.message);
+        } else {
+            publishChange({ ai_table: savedSummary });
         }
 
         // Local fallback for Dashboard (if user hasn't created the SQL table)
@@ -135,8 +207,12 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
             console.error('[Fallback] Failed to write local cache:', fsErr);
         }
 
+        // ai_summaries changed too
+        publishDataVersion();
+
         if (sendWhatsApp) {
             console.log('6. Delivering via WhatsApp...');
+            setStep(6);
             const whatsappText = whatsappJSON.text || "⚠️ AI status update: Successful. Dashboard is refreshed.";
             await sendWhatsAppMessage(whatsappText);
         } else {
@@ -144,9 +220,14 @@ export async function runPipeline({ sendWhatsApp = false } = {}) {
         }
 
         console.log('--- Pipeline Execution Completed Successfully ---');
+        pipelineStatus.state = 'done';
     } catch (error) {
         console.error('--- Pipeline Execution Failed ---');
         console.error(error);
+        pipelineStatus.state = 'failed';
+        pipelineStatus.error = error.message;
+    } finally {
+        pipelineStatus.finishedAt = new Date().toISOString();
     }
 }
 
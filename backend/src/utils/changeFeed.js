@@ -0,0 +1,47 @@
+import { EventEmitter } from 'events';
+import crypto from 'crypto';
+
+// In-process change feed for the dashboard
+//
+// Ingestion and analytics publish the rows they have just written (leads,
+// deals, the daily_metrics_summary row, a new ai_summaries entry, or a new
+// data version); GET /api/dashboard/changes relays them to every connected
+// dashboard as Server-Sent Events, so screens update within seconds of a sync
+// instead of on the next poll.
+//
+// Event ids are "<feed>:<seq>". `feed` is new on every server start, so a
+// reconnecting client can tell whether it missed anything: a Last-Event-ID
+// from another feed, or older than the retained backlog, cannot be resumed.
+
+const RETAIN = 500;
+
+export const FEED_ID = crypto.randomBytes(4).toString('hex');
+
+const emitter = new EventEmitter();
+emitter.setMaxListeners(0);
+
+const backlog = [];
+let seq = 0;
+
+export function publishChange(change) {
+    const event = { id: `${FEED_ID}:${++seq}`, seq, at: new Date().toISOString(), ...change };
+    backlog.push(event);
+    if (backlog.length > RETAIN) backlog.shift();
+    emitter.emit('change', event);
+    return event;
+}
+
+// Events after `lastEventId`, or null when the gap cannot be replayed
+export function changesSince(lastEventId) {
+    if (!lastEventId) return null;
+    const [feed, last] = String(lastEventId).split(':');
+    const after = Number(last);
+    if (feed !== FEED_ID || !Number.isInteger(after) || after > seq) return null;
+    if (after < seq && (!backlog.length || backlog[0].seq > after + 1)) return null;
+    return backlog.filter(e => e.seq > after);
+}
+
+export function onChange(listener) {
+    emitter.on('change', listener);
+    return () => emitter.off('change', listener);
+}
@@ -0,0 +1,116 @@
+// Columnar binary wire format for the dashboard proxy ("AHA columnar", v1)
+//
+// Layout: "AHAC" | uint32 LE header length | UTF-8 JSON header | column buffers.
+// Every buffer starts on an 8-byte boundary so the reader can view it in place.
+//   time    int64 LE epoch microseconds, INT64_MIN for null
+//   float64 float64 LE, NaN for null
+//   bool    uint8 (0/1)
+//   dict    int32 LE codes into header `dictionary`, -1 for null
+//   int64   int64 LE, INT64_MIN for null (`id` columns whose values are all numeric; else dict)
+
+export const COLUMNAR_TYPE = 'application/vnd.aha.columnar';
+
+const MAGIC = Buffer.from('AHAC');
+const NULL_TIME = -(2n ** 63n);  // also the null sentinel for int64 ids
+
+export const LEAD_SCHEMA = {
+    lead_id: 'id', owner_name: 'dict', status: 'dict', source: 'dict',
+    is_converted: 'bool', created_time: 'time', modified_time: 'time'
+};
+
+export const DEAL_SCHEMA = {
+    deal_id: 'id', lead_id: 'id', deal_name: 'dict', owner_name: 'dict', stage: 'dict', source: 'dict',
+    amount: 'float64', created_time: 'time', modified_time: 'time', closed_time: 'time'
+};
+
+export function wantsColumnar(req) {
+    return (req.headers.accept || '').includes(COLUMNAR_TYPE);
+}
+
+function toMicros(value) {
+    if (!value) return NULL_TIME;
+    const ms = Date.parse(value);
+    if (Number.isNaN(ms)) return NULL_TIME;
+    // Date.parse keeps milliseconds; recover Postgres' extra microsecond digits
+    const frac = /\.(\d+)/.exec(value);
+    const extra = frac ? parseInt(frac[1].padEnd(6, '0').slice(3, 6), 10) : 0;
+    return BigInt(ms) * 1000n + BigInt(extra);
+}
+
+function encodeColumn(rows, name, type) {
+    const n = rows.length;
+    if (type === 'time') {
+        const out = new BigInt64Array(n);
+        for (let i = 0; i < n; i++) out[i] = toMicros(rows[i][name]);
+        return { buffer: out, type };
+    }
+    if (type === 'float64') {
+        const out = new Float64Array(n);
+        for (let i = 0; i < n; i++) {
+            const v = rows[i][name];
+            out[i] = v === null || v === undefined ? NaN : Number(v);
+        }
+        return { buffer: out, type };
+    }
+    if (type === 'bool') {
+        const out = new Uint8Array(n);
+        for (let i = 0; i < n; i++) out[i] = rows[i][name] ? 1 : 0;
+        return { buffer: out, type };
+    }
+    if (type === 'id') {
+        // Zoho ids are 18-digit integers; anything else travels as a dictionary
+        const numeric = rows.every(r => r[name] === null || r[name] === undefined || /^\d{1,18}$/.test(String(r[name])));
+        if (!numeric) return encodeColumn(rows, name, 'dict');
+        const out = new BigInt64Array(n);
+        for (let i = 0; i < n; i++) {
+            const v = rows[i][name];
+            out[i] = v === null || v === undefined ? NULL_TIME : BigInt(v);
+        }
+        return { buffer: out, type: 'int64' };
+    }
+    const codes = new Int32Array(n);
+    const lookup = new Map();
+    const dictionary = [];
+    for (let i = 0; i < n; i++) {
+        const v = rows[i][name];
+        if (v === null || v === undefined) { codes[i] = -1; continue; }
+        const key = String(v);
+        let code = lookup.get(key);
+        if (code === undefined) {
+            code = dictionary.length;
+            lookup.set(key, code);
+            dictionary.push(key);
+        }
+        codes[i] = code;
+    }
+    return { buffer: codes, dictionary, type: 'dict' };
+}
+
+export function encodeColumnar(frames, meta = {}) {
+    const header = { version: 1, frames: {}, meta };
+    const buffers = [];
+    let offset = 0;
+
+    for (const [frameName, { rows, schema }] of Object.entries(frames)) {
+        const columns = [];
+        for (const [name, type] of Object.entries(schema)) {
+            const { buffer, dictionary, type: wireType } = encodeColumn(rows, name, type);
+            const bytes = Buffer.from(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+            const column = { name, type: wireType, offset, length: bytes.length };
+            if (dictionary) column.dictionary = dictionary;
+            columns.push(column);
+            buffers.push(bytes);
+            const pad = (8 - (bytes.length % 8)) % 8;
+            if (pad) buffers.push(Buffer.alloc(pad));
+            offset += bytes.length + pad;
+        }
+        header.frames[frameName] = { rows: rows.length, columns };
+    }
+
+    const headerBytes = Buffer.from(JSON.stringify(header), 'utf-8');
+    const prefix = Buffer.alloc(8);
+    MAGIC.copy(prefix, 0);
+    prefix.writeUInt32LE(headerBytes.length, 4);
+    const headerPad = Buffer.alloc((8 - ((8 + headerBytes.length) % 8)) % 8);
+    return Buffer.concat([prefix, headerBytes, headerPad, ...buffers]);
+}
@@ -0,0 +1,32 @@
+import crypto from 'crypto';
+import zlib from 'zlib';
+
+// Strong validator for a JSON-able payload (excluding volatile fields like timestamps)
+export function payloadEtag(parts) {
+    const hash = crypto.createHash('sha1').update(JSON.stringify(parts)).digest('base64url');
+    return `"${hash}"`;
+}
+
+// Send a body with an ETag, answering If-None-Match with 304 and gzipping larger bodies
+export function sendConditional(req, res, body, etag, contentType) {
+    res.set('ETag', etag);
+    res.set('Cache-Control', 'no-cache');
+    res.vary('Accept');
+    res.vary('Accept-Encoding');
+
+    const ifNoneMatch = req.headers['if-none-match'];
+    if (ifNoneMatch && ifNoneMatch.split(',').map(t => t.trim()).includes(etag)) {
+        return res.status(304).end();
+    }
+
+    res.type(contentType);
+    if (body.length > 1024 && /\bgzip\b/.test(req.headers['accept-encoding'] || '')) {
+        res.set('Content-Encoding', 'gzip');
+        return res.send(zlib.gzipSync(body));
+    }
+    return res.send(typeof body === 'string' ? Buffer.from(body) : body);
+}
+
+export function sendConditionalJson(req, res, body, etag) {
+    return sendConditional(req, res, JSON.stringify(body), etag, 'application/json');
+}
@@ -0,0 +1,40 @@
+// Keyset pagination over PostgREST selects
+//
+// PostgREST caps every response at its max-rows setting (1,000 on Supabase by
+// default), so a single select silently drops everything past the cap. Pages
+// are read in (time, id) order; each one resumes strictly after the last row
+// of the previous page, which stays correct while rows are being inserted
+// (offsets would skip or repeat rows) and costs one index range scan per page.
+
+export const PAGE_SIZE = 1000;
+
+// `makeQuery` returns a fresh filtered select; builders are single-use
+export async function* keysetPages(makeQuery, timeColumn, idColumn, pageSize = PAGE_SIZE) {
+    let cursor = null;
+    while (true) {
+        let q = makeQuery()
+            .order(timeColumn, { ascending: true })
+            .order(idColumn, { ascending: true })
+            .limit(pageSize);
+        if (cursor) {
+            q = q.or(`${timeColumn}.gt."${cursor.time}",and(${timeColumn}.eq."${cursor.time}",${idColumn}.gt."${cursor.id}")`);
+        }
+
+        const { data, error } = await q;
+        if (error) throw error;
+        // Stop on an empty page, not a short one: the server cap may be below pageSize
+        if (!data.length) return;
+        yield data;
+
+        const last = data[data.length - 1];
+        cursor = { time: last[timeColumn], id: last[idColumn] };
+    }
+}
+
+export async function fetchAllPages(makeQuery, timeColumn, idColumn, pageSize = PAGE_SIZE) {
+    const rows = [];
+    for await (const page of keysetPages(makeQuery, timeColumn, idColumn, pageSize)) {
+        for (const row of page) rows.push(row);
+    }
+    return rows;
+}
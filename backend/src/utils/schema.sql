@@ -125,4 +125,88 @@ INSERT INTO public.sync_state (module_name, last_sync_time)
 VALUES 
     ('Leads', '2026-01-01T00:00:00Z'),
     ('Deals', '2026-01-01T00:00:00Z')
-ON CONFLICT (module_name) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (module_name) DO NOTHING;
+
+-- ==========================================
+-- 6️⃣ DASHBOARD ROLLUP (server-side aggregation)
+-- The dashboard's KPI cards and charts read a day-level cube
+-- (crm_engine/cube.py). This returns the same three tables for
+-- [start_utc, end_utc) so no raw rows leave the database:
+--   leads   (day, source, owner_name)          → leads
+--   active  (day, stage, source, owner_name)   → deals, amount
+--   closed  (day, stage, source, owner_name)   → closed, closed_amount
+-- day = days since 1970-01-01 on the IST calendar. A deal is active on
+-- the day of its latest activity, closed on the day of closed_time.
+-- ==========================================
+CREATE OR REPLACE FUNCTION public.dashboard_rollup(start_utc TIMESTAMPTZ, end_utc TIMESTAMPTZ DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE sql STABLE
+AS $$
+    WITH lead_days AS (
+        SELECT (created_time AT TIME ZONE 'Asia/Kolkata')::date - DATE '1970-01-01' AS day, source, owner_name
+        FROM public.crm_leads
+        WHERE created_time >= start_utc AND (end_utc IS NULL OR created_time < end_utc)
+    ),
+    deal_times AS (
+        SELECT GREATEST(created_time, modified_time, closed_time) AS last_time, closed_time,
+               stage, source, owner_name, COALESCE(amount, 0) AS amount
+        FROM public.crm_deals
+        -- Any of the three times in range (served by the indexes below); refined on last_time
+        WHERE created_time >= start_utc OR modified_time >= start_utc OR closed_time >= start_utc
+    ),
+    active AS (
+        SELECT (last_time AT TIME ZONE 'Asia/Kolkata')::date - DATE '1970-01-01' AS day,
+               stage, source, owner_name, COUNT(*) AS deals, SUM(amount) AS amount
+        FROM deal_times
+        WHERE last_time >= start_utc AND (end_utc IS NULL OR last_time < end_utc)
+        GROUP BY 1, 2, 3, 4
+    ),
+    closed AS (
+        SELECT (closed_time AT TIME ZONE 'Asia/Kolkata')::date - DATE '1970-01-01' AS day,
+               stage, source, owner_name, COUNT(*) AS closed, SUM(amount) AS closed_amount
+        FROM deal_times
+        WHERE closed_time >= start_utc AND (end_utc IS NULL OR closed_time < end_utc)
+        GROUP BY 1, 2, 3, 4
+    ),
+    leads AS (
+        SELECT day, source, owner_name, COUNT(*) AS leads
+        FROM lead_days
+        GROUP BY 1, 2, 3
+    )
+    SELECT jsonb_build_object(
+        'leads',  COALESCE((SELECT jsonb_agg(l ORDER BY l.day) FROM leads l), '[]'::jsonb),
+        'active', COALESCE((SELECT jsonb_agg(a ORDER BY a.day) FROM active a), '[]'::jsonb),
+        'closed', COALESCE((SELECT jsonb_agg(c ORDER BY c.day) FROM closed c), '[]'::jsonb)
+    );
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_deals_created
+ON public.crm_deals (created_time);
+
+CREATE INDEX IF NOT EXISTS idx_deals_modified
+ON public.crm_deals (modified_time);
+
+
+-- ==========================================
+-- 7️⃣ DAILY METRICS HISTORY
+-- One row per day: the last daily_metrics_summary snapshot taken that day
+-- ==========================================
+CREATE TABLE IF NOT EXISTS public.daily_metrics_history (
+    metric_date DATE PRIMARY KEY,
+
+    new_leads_today INTEGER DEFAULT 0,
+    leads_contacted INTEGER DEFAULT 0,
+    qualified_leads INTEGER DEFAULT 0,
+    demos_scheduled INTEGER DEFAULT 0,
+    demos_held INTEGER DEFAULT 0,
+    proposals_sent INTEGER DEFAULT 0,
+    negotiations_active INTEGER DEFAULT 0,
+
+    deals_closed INTEGER DEFAULT 0,
+
+    deal_amount_won NUMERIC(15,2) DEFAULT 0,
+    deal_amount_lost NUMERIC(15,2) DEFAULT 0,
+    total_revenue NUMERIC(15,2) DEFAULT 0,
+
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
@@ -0,0 +1,35 @@
+# crm_engine — Data layer behind the Streamlit dashboard
+#
+# Names are resolved on first use (PEP 562), so importing one submodule, e.g.
+# crm_engine.kpis for a batch job, does not pull in pyarrow, SQLite or the
+# sync thread machinery.
+
+import importlib
+
+_EXPORTS = {
+    "CircuitBreaker": ".breaker",
+    "CoverageIndex": ".coverage",
+    "CRMDataStore": ".store",
+    "DeltaSync": ".sync",
+    "SharedCache": ".sharedcache",
+    "SortedTimeIndex": ".timeindex",
+    "load_latest_store": ".snapshots",
+    "load_store": ".sync",
+    "read_snapshot": ".snapshots",
+    "write_snapshot": ".snapshots",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,64 @@
+# crm_engine/__main__.py — KPI report on the command line, as JSON
+#
+# Same numbers as the Strategic Pulse cards, without starting Streamlit:
+#
+#   python -m crm_engine --period Today
+#   python -m crm_engine --period "Custom Range" --from 2025-01-01 --to 2025-03-31
+#   python -m crm_engine --period "This Month" --offline   # newest local snapshot only
+
+import argparse
+import json
+import sys
+from datetime import date
+
+from .kpis import get_date_range, period_report
+from .periods import CUSTOM_RANGE, PERIODS, SUPERSET_LABELS
+
+
+def load(start, offline=False):
+    # Backend → snapshots → legacy JSON, or snapshots only when offline
+    if offline:
+        from .snapshots import load_latest_store
+
+        store = load_latest_store(start)
+        if store is None:
+            raise ConnectionError("No local snapshot found")
+        return store
+    from .sync import load_store
+
+    return load_store(start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m crm_engine", description="Compute dashboard KPIs as JSON")
+    parser.add_argument("--period", default="Today", choices=PERIODS)
+    parser.add_argument("--from", dest="first", type=date.fromisoformat, help="first day of a custom range")
+    parser.add_argument("--to", dest="last", type=date.fromisoformat, help="last day of a custom range (included)")
+    parser.add_argument("--offline", action="store_true", help="read the newest local snapshot, skip the backend")
+    parser.add_argument("--indent", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    custom = None
+    if args.period == CUSTOM_RANGE:
+        if not args.first:
+            parser.error("--period 'Custom Range' needs --from (and optionally --to)")
+        custom = (args.first, args.last or date.today())
+
+    # The superset, widened to the custom range if it starts earlier
+    start = min(get_date_range(label)[2] for label in SUPERSET_LABELS)
+    if custom:
+        start = min(start, get_date_range(CUSTOM_RANGE, custom)[2])
+
+    try:
+        store = load(start, args.offline)
+    except ConnectionError as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return 1
+
+    json.dump(period_report(store, args.period, custom), sys.stdout, indent=args.indent, ensure_ascii=False)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# crm_engine/aggregate.py — Server-side aggregation mode
+#
+# The KPI cards and charts only read the rollup cube (crm_engine.cube), so in
+# aggregate mode the dashboard fetches the cube instead of the rows. The
+# proxy's /api/dashboard/rollup calls the dashboard_rollup function (see
+# backend/src/utils/schema.sql), which groups leads and deals by IST day,
+# stage, source and owner inside Postgres. The payload grows with days ×
+# dimensions, not with the number of CRM records. Raw rows are only fetched
+# for drill-downs (deal explorer, funnel), through DeltaSync as before.
+#
+# Stage buckets are still assigned here (STAGE_BUCKET_RULES lives in the
+# dashboard's environment), so the server only groups by stage name.
+#
+# SQLiteRollup runs the same grouping over an in-memory SQLite database: a
+# local stand-in for the Postgres function that takes typed frames (e.g. from
+# crm_engine.synthetic) and answers in the proxy's payload shape.
+
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .breaker import CircuitBreaker
+from .client import NOT_MODIFIED, client
+from .coverage import CoverageIndex
+from .cube import DAY_NS, DEAL_KEYS, IST_OFFSET_NS, LEAD_KEYS, RollupCube
+from .stages import stage_codes
+from .store import CubeStore, next_version, to_utc_iso
+from .telemetry import telemetry
+from .timeindex import NAT, time_values, to_ns
+
+ROLLUP_PATH = "/api/dashboard/rollup"
+MEASURES = {"leads": ["leads"], "active": ["deals", "amount"], "closed": ["closed", "closed_amount"]}
+# Span starts kept per process (the superset start, plus custom ranges reaching further back)
+MAX_SPANS = 8
+
+
+def _table(records, keys, measures):
+    # One cube table from JSON records, in the dtypes RollupCube.build produces
+    columns = [k for k in keys if k != "bucket"] + measures
+    df = pd.DataFrame(records or [], columns=columns)
+    df["day"] = df["day"].astype("int64")
+    for col in measures:
+        df[col] = pd.to_numeric(df[col]).astype("float64" if "amount" in col else "int64")
+    if "stage" in df.columns:
+        df["stage"] = df["stage"].fillna("Unknown")
+        df.insert(keys.index("bucket"), "bucket", stage_codes(df["stage"]))
+    return df.sort_values("day", kind="stable").reset_index(drop=True)
+
+
+def cube_from_payload(data):
+    return RollupCube(
+        _table(data.get("leads"), LEAD_KEYS, MEASURES["leads"]),
+        _table(data.get("active"), DEAL_KEYS, MEASURES["active"]),
+        _table(data.get("closed"), DEAL_KEYS, MEASURES["closed"]),
+    )
+
+
+def fetch_rollup(start, end=None, conditional=False):
+    # The proxy's aggregates for [start, end); NOT_MODIFIED when the ETag still matches
+    params = {"start_utc": to_utc_iso(start), "end_utc": to_utc_iso(end)}
+    return client.get_payload(ROLLUP_PATH, params, conditional=conditional)
+
+
+class AggregateStore(CubeStore):
+    """KPI cards and chart data for [start, now) from server-side aggregates, without rows."""
+
+    aggregated = True
+
+    def __init__(self, cube, metrics, ai_table, source="live", coverage_start=None):
+        self.cube = cube
+        self.metrics = metrics
+        self.ai_table = ai_table
+        self.source = source
+        self.coverage_start = coverage_start
+        self.coverage = CoverageIndex.of(coverage_start)
+        self.version = next_version()
+        self.side_version = self.version
+        self._memo = {}
+
+    @classmethod
+    def from_payload(cls, data, coverage_start=None):
+        with telemetry.span("typing.rollup", rows=sum(len(data.get(name) or []) for name in MEASURES)):
+            cube = cube_from_payload(data)
+        return cls(
+            cube,
+            pd.DataFrame(data.get("metrics") or []),
+            pd.DataFrame(data.get("ai_table") or []),
+            data.get("source", "live"),
+            coverage_start,
+        )
+
+
+class AggregateSource:
+    """Aggregate stores per span start, revalidated with conditional GETs every max_age seconds."""
+
+    def __init__(self, fetch=None, max_age=30, breaker=None):
+        self.fetch = fetch or fetch_rollup
+        self.max_age = max_age
+        self.breaker = breaker or CircuitBreaker()
+        self.last_error = None
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def current(self, start):
+        with self._lock:
+            checked_at, store = self._stores.get(start, (None, None))
+        if store is not None and time.monotonic() - checked_at < self.max_age:
+            telemetry.count("rollup_cache", result="hit")
+            return store
+        # The request runs outside the lock, so other spans keep being served meanwhile
+        try:
+            with telemetry.span("rollup.fetch", conditional=store is not None):
+                data = self.breaker.call(self.fetch, start, None, conditional=store is not None)
+        except Exception as e:
+            self.last_error = str(e)
+            if store is None:
+                raise
+            # Keep serving the last good aggregates; max_age and the breaker pace the retries
+            telemetry.count("rollup_cache", result="error")
+        else:
+            self.last_error = None
+            if data is NOT_MODIFIED:
+                telemetry.count("rollup_cache", result="not_modified")
+            else:
+                telemetry.count("rollup_cache", result="miss")
+                store = AggregateStore.from_payload(data, start)
+        with self._lock:
+            self._stores.pop(start, None)
+            self._stores[start] = (time.monotonic(), store)
+            while len(self._stores) > MAX_SPANS:
+                self._stores.pop(next(iter(self._stores)))
+        return store
+
+    def expire(self):
+        # Revalidate every span on its next read (e.g. after a pipeline run)
+        with self._lock:
+            self._stores = {start: (-float("inf"), store) for start, (_, store) in self._stores.items()}
+
+
+class SQLiteRollup:
+    """In-memory SQLite stand-in for the dashboard_rollup function behind the proxy."""
+
+    LEADS_SQL = """
+        SELECT (created_time + :offset) / :day AS day, source, owner_name, COUNT(*) AS leads
+        FROM leads
+        WHERE created_time >= :start AND (:end IS NULL OR created_time < :end)
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    """
+    ACTIVE_SQL = """
+        SELECT (last_time + :offset) / :day AS day, stage, source, owner_name,
+               COUNT(*) AS deals, SUM(amount) AS amount
+        FROM deals
+        WHERE last_time >= :start AND (:end IS NULL OR last_time < :end)
+        GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+    """
+    CLOSED_SQL = """
+        SELECT (closed_time + :offset) / :day AS day, stage, source, owner_name,
+               COUNT(*) AS closed, SUM(amount) AS closed_amount
+        FROM deals
+        WHERE closed_time >= :start AND (:end IS NULL OR closed_time < :end)
+        GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+    """
+
+    def __init__(self, leads, deals, metrics=None, ai_table=None):
+        self.metrics = [] if metrics is None else metrics.to_dict("records")
+        self.ai_table = [] if ai_table is None else ai_table.to_dict("records")
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+
+        def text(series):
+            return series.astype(object).where(series.notna(), None).to_numpy()
+
+        def ns(values):
+            # NaT as NULL; times as epoch nanoseconds, like the cube
+            return pd.Series(values, dtype="Int64").mask(values == NAT)
+
+        pd.DataFrame({
+            "created_time": ns(time_values(leads["created_time"])),
+            "source": text(leads["source"]),
+            "owner_name": text(leads["owner_name"]),
+        }).to_sql("leads", self.db, index=False)
+        times = [time_values(deals[col]) for col in ("created_time", "modified_time", "closed_time")]
+        pd.DataFrame({
+            # GREATEST(created, modified, closed) in Postgres; NaT is the smallest int64
+            "last_time": ns(np.maximum.reduce(times)),
+            "closed_time": ns(times[2]),
+            "stage": text(deals["stage"]),
+            "source": text(deals["source"]),
+            "owner_name": text(deals["owner_name"]),
+            "amount": deals["amount"].to_numpy(),
+        }).to_sql("deals", self.db, index=False)
+
+    def __call__(self, start, end=None, conditional=False):
+        params = {
+            "offset": IST_OFFSET_NS,
+            "day": DAY_NS,
+            "start": to_ns(start) if start is not None else -2**63,
+            "end": to_ns(end) if end is not None else None,
+        }
+        with self._lock:
+            tables = {
+                name: pd.read_sql_query(sql, self.db, params=params).to_dict("records")
+                for name, sql in (("leads", self.LEADS_SQL), ("active", self.ACTIVE_SQL), ("closed", self.CLOSED_SQL))
+            }
+        return {**tables, "metrics": self.metrics, "ai_table": self.ai_table, "source": "local"}
@@ -0,0 +1,249 @@
+# crm_engine/bench.py — Stage-by-stage benchmark of the dashboard data pipeline
+#
+# Builds synthetic payloads at each size and times every stage the dashboard
+# runs between the proxy response and the charts, reporting throughput and
+# the peak memory each stage allocates (tracemalloc, measured on a separate
+# pass so tracing overhead does not skew the timings).
+#
+#   python -m crm_engine.bench                          # 10k, 100k, 1M rows
+#   python -m crm_engine.bench --rows 100000 --save bench.json
+#   python -m crm_engine.bench --rows 100000 --compare bench.json
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from .cube import RollupCube
+from .downsample import downsample
+from .funnel import LeadDealIndex, conversion_velocity, funnel
+from .periods import SUPERSET_LABELS, period_bounds
+from .snapshots import read_snapshot, write_snapshot
+from .stages import bucket_summary
+from .store import DEAL_COLUMNS, IST, LEAD_COLUMNS, CRMDataStore, to_utc_iso, type_frame
+from .synthetic import generate_payload
+from .warmup import warm
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+# Share of deals touched by the simulated delta sync
+DELTA_SHARE = 0.01
+# A stage this much slower than the baseline counts as a regression
+TOLERANCE = 0.25
+
+
+# =====================================================
+# STAGES
+# =====================================================
+def stage_decode(ctx):
+    ctx["data"] = json.loads(ctx["body"])
+
+
+def stage_typing(ctx):
+    data = ctx["data"]
+    ctx["leads"] = type_frame(data["leads"], LEAD_COLUMNS)
+    ctx["deals"] = type_frame(data["deals"], DEAL_COLUMNS)
+
+
+def stage_store(ctx):
+    # Sort, time indexes and rollup cube
+    data = ctx["data"]
+    ctx["store"] = CRMDataStore(ctx["leads"], ctx["deals"], pd.DataFrame(data["metrics"]), pd.DataFrame(data["ai_table"]))
+
+
+def stage_cube(ctx):
+    RollupCube.build(ctx["store"].leads, ctx["store"].deals)
+
+
+def stage_filter(ctx):
+    store = ctx["store"]
+    for start, end in ctx["windows"].values():
+        store.leads_between(start, end)
+        store.deals_between(start, end)
+
+
+def stage_kpis_rows(ctx):
+    store = ctx["store"]
+    for start, end in ctx["windows"].values():
+        len(store.leads_between(start, end))
+        bucket_summary(store.deals_between(start, end), start, end)
+
+
+def stage_kpis_cube(ctx):
+    for start, end in ctx["windows"].values():
+        ctx["store"].cube.kpis(start, end)
+
+
+def stage_charts(ctx):
+    cube = ctx["store"].cube
+    month_start, _ = ctx["windows"]["This Month"]
+    today_start, _ = ctx["windows"]["Today"]
+    superset_start, _ = ctx["windows"]["Last Year"]
+    cube.leads_per_day(month_start)
+    downsample(cube.leads_per_day(superset_start), "day", "Leads")
+    cube.lead_sources(today_start)
+    cube.amount_by_stage(month_start)
+
+
+def stage_funnel(ctx):
+    # Lead → deal hash join, then funnel and velocity tables per period
+    store = ctx["store"]
+    LeadDealIndex(store.leads, store.deals)
+    for start, end in ctx["windows"].values():
+        funnel(store, start, end)
+        conversion_velocity(store, start, end)
+
+
+def stage_warmup(ctx):
+    # Every selectable period, partner and chart dataset into a fresh store's memos
+    warm(ctx["store"])
+
+
+def stage_delta(ctx):
+    ctx["store"].with_delta(ctx["delta"])
+
+
+def stage_snapshot_write(ctx):
+    ctx["snapshot"] = write_snapshot(ctx["store"], directory=ctx["tmp"], keep=1)
+
+
+def stage_snapshot_read(ctx):
+    read_snapshot(ctx["snapshot"])
+
+
+STAGES = [
+    ("decode", stage_decode),
+    ("typing", stage_typing),
+    ("store", stage_store),
+    ("cube", stage_cube),
+    ("filter", stage_filter),
+    ("kpis (rows)", stage_kpis_rows),
+    ("kpis (cube)", stage_kpis_cube),
+    ("charts", stage_charts),
+    ("funnel", stage_funnel),
+    ("warmup", stage_warmup),
+    ("delta", stage_delta),
+    ("snapshot write", stage_snapshot_write),
+    ("snapshot read", stage_snapshot_read),
+]
+
+
+# =====================================================
+# HARNESS
+# =====================================================
+def make_delta(data, now):
+    # Re-send a slice of the deals as modified now, like a poll after CRM edits
+    n = max(1, int(len(data["deals"]) * DELTA_SHARE))
+    stamp = to_utc_iso(now)
+    deals = [dict(row, stage="Closed Won", modified_time=stamp, closed_time=stamp) for row in data["deals"][:n]]
+    return {"leads": [], "deals": deals, "metrics": data["metrics"], "ai_table": data["ai_table"]}
+
+
+def prepare(rows, seed):
+    now = datetime.now(IST)
+    data = generate_payload(rows, seed, end=now)
+    return {
+        "rows": rows,
+        "body": json.dumps(data).encode(),
+        "windows": {label: period_bounds(label, now) for label in SUPERSET_LABELS},
+        "delta": make_delta(data, now),
+    }
+
+
+def run_pass(ctx, trace=False):
+    results = {}
+    for name, fn in STAGES:
+        if trace:
+            tracemalloc.start()
+            fn(ctx)
+            results[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            started = time.perf_counter()
+            fn(ctx)
+            results[name] = time.perf_counter() - started
+    return results
+
+
+def bench(rows, seed=0, repeat=1, memory=True):
+    ctx = prepare(rows, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx["tmp"] = tmp
+        timings = [run_pass(ctx) for _ in range(repeat)]
+        peaks = run_pass(ctx, trace=True) if memory else {}
+
+    report = {}
+    for name, _ in STAGES:
+        seconds = min(t[name] for t in timings)
+        report[name] = {
+            "seconds": seconds,
+            "rows_per_s": rows / seconds if seconds > 0 else None,
+            "peak_mb": peaks[name] / 1e6 if name in peaks else None,
+        }
+    return report
+
+
+def print_report(rows, report, baseline=None):
+    print(f"\n{rows:,} rows")
+    print(f"  {'stage':<16}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}{'vs base':>10}")
+    for name, r in report.items():
+        rate = f"{r['rows_per_s']:,.0f}" if r["rows_per_s"] else "-"
+        peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+        change = ""
+        if baseline and name in baseline:
+            change = f"{r['seconds'] / baseline[name]['seconds'] - 1:+.0%}"
+        print(f"  {name:<16}{r['seconds']:>10.4f}{rate:>14}{peak:>10}{change:>10}")
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    found = []
+    for rows, report in results.items():
+        base = baseline.get(rows, {})
+        for name, r in report.items():
+            if name in base and r["seconds"] > base[name]["seconds"] * (1 + tolerance):
+                found.append(f"{rows} rows / {name}: {base[name]['seconds']:.4f}s -> {r['seconds']:.4f}s")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="leads + deals per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="timing passes; the fastest is reported")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from --save; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for rows in args.rows:
+        report = bench(rows, args.seed, args.repeat, memory=not args.no_memory)
+        results[str(rows)] = report
+        print_report(rows, report, baseline.get(str(rows)) if baseline else None)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        found = regressions(results, baseline, args.tolerance)
+        if found:
+            print(f"\n{len(found)} stage(s) slower than baseline by more than {args.tolerance:.0%}:")
+            for line in found:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
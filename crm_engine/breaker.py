@@ -0,0 +1,63 @@
+# crm_engine/breaker.py — Circuit breaker for backend calls
+#
+# After `failure_threshold` consecutive failures the circuit opens and calls
+# are skipped for `cooldown` seconds. The first call after the cool-down is a
+# trial: success closes the circuit, failure opens it again.
+
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == HALF_OPEN:
+                # Let exactly one trial through; re-arm until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            raise ConnectionError(f"Backend circuit open — retrying in {self.retry_in():.0f}s")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,116 @@
+# crm_engine/client.py — Shared HTTP client for the dashboard's backend calls
+#
+# One pooled keep-alive session per process, gzip negotiation, and
+# conditional GETs: the last ETag per (path, params) is replayed as
+# If-None-Match so an unchanged dataset comes back as an empty 304. Delta
+# polls carry a new `since` each time, so only the MAX_ETAGS most recently
+# used ETags are kept.
+#
+# The proxy labels row responses with X-Data-Version (the pipeline run they
+# reflect); served_version() reports it for the calling thread's last
+# request, 304s included, so a sync labels its frames with what was actually
+# served rather than with what it asked for.
+
+import json
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .telemetry import telemetry
+from .wire import COLUMNAR_TYPE, decode_columnar
+
+BASE_URL = "http://localhost:3001"
+# (connect, read) — a dead proxy fails fast instead of holding a worker for 10s
+TIMEOUT = (3.05, 10)
+MAX_ETAGS = 32
+
+NOT_MODIFIED = object()
+VERSION_HEADER = "X-Data-Version"
+
+
+class BackendClient:
+    def __init__(self, base_url=BASE_URL, pool_size=8, timeout=TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+        self._etags = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def get_payload(self, path, params=None, conditional=True, timeout=None):
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        # List values go out as repeated parameters; tuples keep the ETag key hashable
+        key = (path, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())))
+        headers = {"Accept": f"{COLUMNAR_TYPE}, application/json;q=0.9"}
+        with self._lock:
+            etag = self._etags.get(key) if conditional else None
+            if etag:
+                self._etags.move_to_end(key)
+        if etag:
+            headers["If-None-Match"] = etag
+
+        self._local.version = None
+        with telemetry.span("proxy.fetch", path=path, conditional=bool(etag)) as span:
+            res = self.session.get(self.url(path), params=params, headers=headers, timeout=timeout or self.timeout)
+            span["status"] = res.status_code
+            span["bytes"] = len(res.content)
+            span["wire_bytes"] = int(res.headers.get("Content-Length") or len(res.content))
+        telemetry.count("http_responses", path=path, status=res.status_code)
+        self._local.version = res.headers.get(VERSION_HEADER)
+        if res.status_code == 304:
+            return NOT_MODIFIED
+        res.raise_for_status()
+        telemetry.gauge("payload_bytes", len(res.content), path=path)
+        telemetry.gauge("payload_wire_bytes", span["wire_bytes"], path=path)
+        columnar = res.headers.get("Content-Type", "").startswith(COLUMNAR_TYPE)
+        with telemetry.span("decode", format="columnar" if columnar else "json", bytes=len(res.content)):
+            data = decode_columnar(res.content) if columnar else res.json()
+        if conditional and res.headers.get("ETag"):
+            with self._lock:
+                self._etags[key] = res.headers["ETag"]
+                self._etags.move_to_end(key)
+                while len(self._etags) > MAX_ETAGS:
+                    self._etags.popitem(last=False)
+        return data
+
+    def iter_ndjson(self, path, params=None, timeout=None):
+        # One decoded object per line, yielded as the body arrives (no buffering of the whole response)
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        headers = {"Accept": "application/x-ndjson"}
+        self._local.version = None
+        with telemetry.span("proxy.stream", path=path) as span:
+            with self.session.get(self.url(path), params=params, headers=headers, stream=True,
+                                  timeout=timeout or self.timeout) as res:
+                span["status"] = res.status_code
+                self._local.version = res.headers.get(VERSION_HEADER)
+                telemetry.count("http_responses", path=path, status=res.status_code)
+                res.raise_for_status()
+                span["bytes"] = 0
+                for line in res.iter_lines(chunk_size=64 * 1024):
+                    if line:
+                        span["bytes"] += len(line)
+                        yield json.loads(line)
+
+    def served_version(self):
+        # X-Data-Version of this thread's last get_payload / iter_ndjson response (None if absent)
+        return getattr(self._local, "version", None)
+
+    def get_json(self, path, params=None, timeout=None):
+        res = self.session.get(self.url(path), params=params, timeout=timeout or self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    def post(self, path, timeout=None, **kwargs):
+        return self.session.post(self.url(path), timeout=timeout or self.timeout, **kwargs)
+
+
+client = BackendClient()
@@ -0,0 +1,96 @@
+# crm_engine/coverage.py — Which time spans the loaded frames cover
+#
+# The session superset covers [start of last year, now). Custom ranges can
+# reach further back; instead of refetching a whole new superset, the store
+# records its loaded spans here, a range is checked against them, and only
+# the missing sub-intervals are fetched and merged into the frames.
+#
+# Spans are half-open [start, end) in epoch nanoseconds; an open bound
+# (None) extends to the beginning of history or up to now.
+
+import math
+
+import pandas as pd
+
+from .timeindex import to_ns
+
+
+def _lo(value):
+    return -math.inf if value is None else to_ns(value)
+
+
+def _hi(value):
+    return math.inf if value is None else to_ns(value)
+
+
+def _to_time(ns):
+    return None if math.isinf(ns) else pd.Timestamp(ns, tz="UTC").to_pydatetime()
+
+
+def _merge(spans):
+    # Sorted, disjoint spans; touching or overlapping ones are joined
+    merged = []
+    for lo, hi in sorted(s for s in spans if s[0] < s[1]):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+class CoverageIndex:
+    """Sorted, disjoint [start, end) spans of loaded history."""
+
+    def __init__(self, spans=()):
+        self.spans = _merge(spans)
+
+    @classmethod
+    def of(cls, start=None, end=None):
+        return cls([(_lo(start), _hi(end))])
+
+    def add(self, start=None, end=None):
+        # A new index; stores are immutable, so the old one stays valid for readers
+        return CoverageIndex(self.spans + [(_lo(start), _hi(end))])
+
+    def missing(self, start=None, end=None):
+        # Sub-intervals of [start, end) that are not loaded, as UTC datetimes
+        lo, hi = _lo(start), _hi(end)
+        gaps = []
+        for s, e in self.spans:
+            if e <= lo:
+                continue
+            if s >= hi:
+                break
+            if s > lo:
+                gaps.append((lo, s))
+            lo = max(lo, e)
+            if lo >= hi:
+                break
+        if lo < hi:
+            gaps.append((lo, hi))
+        return [(_to_time(a), _to_time(b)) for a, b in gaps]
+
+    def minus(self, other):
+        # Spans held here but not in `other`, as UTC datetimes
+        return [gap for lo, hi in self.spans for gap in other.missing(_to_time(lo), _to_time(hi))]
+
+    def clip(self, start=None, end=None):
+        # Only the parts inside [start, end), e.g. after reading part of a snapshot
+        lo, hi = _lo(start), _hi(end)
+        return CoverageIndex([(max(s, lo), min(e, hi)) for s, e in self.spans])
+
+    def covers(self, start=None, end=None):
+        return not self.missing(start, end)
+
+    # -------------------------------------------------
+    # Snapshot manifests
+    # -------------------------------------------------
+    def to_list(self):
+        return [[None if math.isinf(lo) else int(lo), None if math.isinf(hi) else int(hi)] for lo, hi in self.spans]
+
+    @classmethod
+    def from_list(cls, spans):
+        return cls([(-math.inf if lo is None else lo, math.inf if hi is None else hi) for lo, hi in spans])
+
+    def __repr__(self):
+        return f"CoverageIndex({[(_to_time(lo), _to_time(hi)) for lo, hi in self.spans]})"
@@ -0,0 +1,165 @@
+# crm_engine/cube.py — Day-level rollup cube behind the KPI cards and charts
+#
+# Three small aggregates keyed by IST day, kept sorted by day:
+#   leads   (day, source, owner_name)                 → leads
+#   active  (day, stage, bucket, source, owner_name)  → deals, amount
+#   closed  (day, stage, bucket, source, owner_name)  → closed, closed_amount
+#
+# A deal is counted as active on the IST day of its latest activity
+# (max of created/modified/closed) and as closed on the day of closed_time.
+# Any midnight-aligned window is answered by slicing the day range and
+# summing, so render cost scales with days × dimensions rather than rows.
+# For open-ended windows (Today, This Month, This Year) this matches the
+# row-level "created, modified or closed in period" rule exactly.
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from .stages import LOST, NEGOTIATION, PROPOSAL, WON
+from .timeindex import NAT, time_values, to_ns
+
+DAY_NS = 86_400 * 10**9
+IST_OFFSET_NS = int(timedelta(hours=5, minutes=30).total_seconds()) * 10**9
+
+LEAD_KEYS = ["day", "source", "owner_name"]
+DEAL_KEYS = ["day", "stage", "bucket", "source", "owner_name"]
+
+
+def ist_day(ns):
+    # Days since 1970-01-01 on the IST calendar
+    return (ns + IST_OFFSET_NS) // DAY_NS
+
+
+def _day_bound(value):
+    # First IST day at or after a window bound
+    if value is None:
+        return None
+    return int(-((-(to_ns(value) + IST_OFFSET_NS)) // DAY_NS))
+
+
+def _rollup(rows, keys, measures):
+    if rows.empty:
+        return pd.DataFrame({col: pd.Series(dtype="int64" if col == "day" else object) for col in keys + measures})
+    out = rows.groupby(keys, observed=True, sort=True)[measures].sum().reset_index()
+    for col in keys[1:]:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(object)
+    return out[out[measures[0]] != 0].reset_index(drop=True)
+
+
+def _lead_rows(leads, sign=1):
+    return pd.DataFrame({
+        "day": ist_day(time_values(leads["created_time"])),
+        "source": leads["source"].to_numpy(),
+        "owner_name": leads["owner_name"].to_numpy(),
+        "leads": np.full(len(leads), sign, dtype=np.int64),
+    })
+
+
+def _deal_rows(deals, sign=1):
+    times = [time_values(deals[col]) for col in ("created_time", "modified_time", "closed_time")]
+    closed = times[2]
+    base = {
+        "stage": deals["stage"].to_numpy(),
+        "bucket": deals["stage_bucket"].to_numpy(),
+        "source": deals["source"].to_numpy(),
+        "owner_name": deals["owner_name"].to_numpy(),
+    }
+    active = pd.DataFrame({
+        "day": ist_day(np.maximum.reduce(times)),
+        **base,
+        "deals": np.full(len(deals), sign, dtype=np.int64),
+        "amount": deals["amount"].to_numpy() * sign,
+    })
+    has_close = closed != NAT
+    closed_rows = pd.DataFrame({
+        "day": ist_day(closed[has_close]),
+        **{k: v[has_close] for k, v in base.items()},
+        "closed": np.full(int(has_close.sum()), sign, dtype=np.int64),
+        "closed_amount": deals["amount"].to_numpy()[has_close] * sign,
+    })
+    return active, closed_rows
+
+
+class RollupCube:
+    def __init__(self, leads, active, closed):
+        self.leads = leads
+        self.active = active
+        self.closed = closed
+
+    @classmethod
+    def build(cls, leads, deals):
+        active, closed = _deal_rows(deals)
+        return cls(
+            _rollup(_lead_rows(leads), LEAD_KEYS, ["leads"]),
+            _rollup(active, DEAL_KEYS, ["deals", "amount"]),
+            _rollup(closed, DEAL_KEYS, ["closed", "closed_amount"]),
+        )
+
+    def with_changes(self, old_leads, new_leads, old_deals, new_deals):
+        # Subtract the replaced rows' contributions, add the new versions, re-aggregate
+        old_active, old_closed = _deal_rows(old_deals, -1)
+        new_active, new_closed = _deal_rows(new_deals)
+        return RollupCube(
+            _rollup(pd.concat([self.leads, _lead_rows(old_leads, -1), _lead_rows(new_leads)]),
+                    LEAD_KEYS, ["leads"]),
+            _rollup(pd.concat([self.active, old_active, new_active]), DEAL_KEYS, ["deals", "amount"]),
+            _rollup(pd.concat([self.closed, old_closed, new_closed]), DEAL_KEYS, ["closed", "closed_amount"]),
+        )
+
+    @staticmethod
+    def _slice(cube, start=None, end=None):
+        days = cube["day"].to_numpy()
+        lo = 0 if start is None else int(np.searchsorted(days, _day_bound(start), side="left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, _day_bound(end), side="left"))
+        return cube.iloc[lo:max(lo, hi)]
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def kpis(self, start, end=None):
+        leads = self._slice(self.leads, start, end)
+        active = self._slice(self.active, start, end)
+        closed = self._slice(self.closed, start, end)
+
+        deals_by_bucket = active.groupby("bucket")["deals"].sum()
+        closed_by_bucket = closed.groupby("bucket")[["closed", "closed_amount"]].sum()
+
+        def closed_value(bucket, col):
+            return closed_by_bucket[col].get(bucket, 0)
+
+        won_count = int(closed_value(WON, "closed"))
+        rw = float(closed_value(WON, "closed_amount"))
+        rl = float(closed_value(LOST, "closed_amount"))
+        return {
+            "leads": int(leads["leads"].sum()),
+            "won_count": won_count,
+            "rev_won": rw,
+            "rev_lost": rl,
+            "rev_touched": float(active["amount"].sum()),
+            "win_rate": (rw / (rw + rl) * 100) if (rw + rl) > 0 else 0,
+            "nego": int(deals_by_bucket.get(NEGOTIATION, 0)),
+            "prop": int(deals_by_bucket.get(PROPOSAL, 0)),
+            "avg_deal": (rw / won_count) if won_count else 0,
+        }
+
+    def leads_per_day(self, start, end=None):
+        # Daily lead counts with empty days filled in, indexed by calendar date
+        per_day = self._slice(self.leads, start, end).groupby("day")["leads"].sum()
+        first = _day_bound(start)
+        last = (_day_bound(end) - 1) if end is not None else int(ist_day(to_ns(pd.Timestamp.now(tz="UTC"))))
+        days = np.arange(first, last + 1)
+        counts = per_day.reindex(days, fill_value=0).to_numpy()
+        dates = pd.to_datetime(days, unit="D").date
+        return pd.DataFrame({"day": dates, "Leads": counts})
+
+    def lead_sources(self, start, end=None):
+        src = self._slice(self.leads, start, end).groupby("source")["leads"].sum()
+        src = src[src > 0].sort_values(ascending=False)
+        return pd.DataFrame({"Source": src.index, "Count": src.to_numpy()})
+
+    def amount_by_stage(self, start, end=None):
+        pv = self._slice(self.active, start, end).groupby("stage")["amount"].sum().reset_index()
+        return pv.sort_values("amount", ascending=True)
@@ -0,0 +1,64 @@
+# crm_engine/downsample.py — Bounded point counts for time-series charts
+#
+# Daily series grow with history, but a chart only needs enough points to
+# fill its width. Additive series (counts, amounts) are re-bucketed to the
+# finest grain that fits the budget: day, then week, then month. Whatever
+# still exceeds it, and series that cannot be summed, go through
+# Largest-Triangle-Three-Buckets, which keeps the peaks and troughs that
+# give a line its shape.
+
+import numpy as np
+import pandas as pd
+
+# Points per series sent to the browser
+MAX_POINTS = 120
+# Coarser grains tried in order; weeks start on Monday
+GRAINS = [("week", "W-SUN"), ("month", "M")]
+
+
+def rebucket(frame, x, y, freq):
+    # Sum y into calendar buckets labelled by their first day
+    dates = pd.to_datetime(frame[x])
+    start = dates.dt.to_period(freq).dt.start_time.dt.date
+    out = frame[y].groupby(start.to_numpy(), sort=True).sum()
+    return pd.DataFrame({x: out.index, y: out.to_numpy()})
+
+
+def lttb(x, y, threshold):
+    # Positions of the points kept by Largest-Triangle-Three-Buckets
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        if nlo >= nhi:
+            nlo, nhi = n - 1, n
+        bx, by = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - bx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (by - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(frame, x, y, max_points=MAX_POINTS, additive=True):
+    # (frame, grain) with at most max_points rows; x holds dates, one row per day
+    if len(frame) <= max_points:
+        return frame, "day"
+    grain = "day"
+    if additive:
+        for grain, freq in GRAINS:
+            bucketed = rebucket(frame, x, y, freq)
+            if len(bucketed) <= max_points:
+                return bucketed, grain
+        frame = bucketed
+    ticks = pd.to_datetime(frame[x]).to_numpy().astype("datetime64[D]").astype("int64")
+    keep = lttb(ticks, frame[y].to_numpy(), max_points)
+    return frame.iloc[keep].reset_index(drop=True), grain
@@ -0,0 +1,120 @@
+# crm_engine/explorer.py — Paged, filtered deal listings for the deal explorer
+#
+# A page of deals is answered without sorting the window on every rerun:
+#   Newest / Recently updated  walk the store's presorted time indexes
+#                              (SortedTimeIndex.order) newest first and keep
+#                              the rows that pass the filters
+#   Largest                    top-k selection (np.argpartition) of the
+#                              matching rows, sorting only the k needed
+# Filters are masks over the whole deals frame: stage/source compare
+# categorical codes, and text search runs over lowercased deal and owner
+# names computed once per store.
+#
+# In aggregate mode the dashboard holds no deal rows: remote_deal_page asks
+# the proxy's /api/dashboard/deals for the one page shown, filtered, sorted
+# and counted in Postgres, with the same window and sort semantics.
+
+import numpy as np
+import pandas as pd
+
+from .client import client
+from .store import DEAL_COLUMNS, to_utc_iso, type_frame
+from .timeindex import NAT
+
+SORTS = ["Newest", "Recently updated", "Largest"]
+SORT_COLUMNS = {"Newest": "created_time", "Recently updated": "modified_time"}
+COLUMNS = ["created_time", "deal_name", "owner_name", "stage", "source", "amount", "modified_time", "closed_time"]
+PAGE_SIZE = 50
+DEALS_PATH = "/api/dashboard/deals"
+REMOTE_SORTS = {"Newest": "newest", "Recently updated": "updated", "Largest": "largest"}
+
+
+def newest_first(store, column):
+    # Row positions ordered by `column`, newest first; rows without a time go last
+    def compute():
+        index = store.deal_index[column]
+        missing = np.flatnonzero(index.values == NAT)
+        return np.concatenate([index.order[::-1], missing])
+    return store.memo(("deal_order", column), compute)
+
+
+def deal_text(store):
+    # Lowercased deal names (and owner categories) for case-insensitive search
+    def compute():
+        names = store.deals["deal_name"].fillna("").astype(str).str.lower().to_numpy()
+        owners = store.deals["owner_name"]
+        return names, owners.cat.categories.astype(str).str.lower(), owners.cat.codes.to_numpy()
+    return store.memo(("deal_text",), compute)
+
+
+def _category_mask(series, values):
+    codes = series.cat.categories.get_indexer(list(values))
+    return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+
+
+def matching(store, start, end=None, search="", stages=(), sources=()):
+    # Mask over store.deals: active in [start, end) and passing every filter
+    deals = store.deals
+    mask = np.zeros(len(deals), dtype=bool)
+    mask[store.window(start, end)[1].index.to_numpy()] = True
+    if stages:
+        mask &= _category_mask(deals["stage"], stages)
+    if sources:
+        mask &= _category_mask(deals["source"], sources)
+
+    query = search.strip().lower()
+    if query:
+        names, owners, owner_codes = deal_text(store)
+        rows = np.flatnonzero(mask)
+        owner_hit = np.flatnonzero(owners.str.contains(query, regex=False))
+        hit = pd.Series(names[rows]).str.contains(query, regex=False).to_numpy() | np.isin(owner_codes[rows], owner_hit)
+        mask[:] = False
+        mask[rows[hit]] = True
+    return mask
+
+
+def deal_page(store, start, end=None, search="", stages=(), sources=(), sort="Newest", page=0, page_size=PAGE_SIZE):
+    # (frame of one page, total matching deals)
+    mask = matching(store, start, end, search, stages, sources)
+    total = int(mask.sum())
+    first, last = page * page_size, min((page + 1) * page_size, total)
+    if first >= total:
+        return store.deals.iloc[:0][COLUMNS], total
+
+    if sort == "Largest":
+        rows = np.flatnonzero(mask)
+        amount = store.deals["amount"].to_numpy()[rows]
+        # Only the top `last` amounts are ordered; the rest stay unsorted
+        top = np.argpartition(-amount, last - 1)[:last] if last < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(-amount[top], kind="stable")]
+        page_rows = rows[top[first:last]]
+    else:
+        order = newest_first(store, SORT_COLUMNS[sort])
+        page_rows = order[mask[order]][first:last]
+    return store.deals.iloc[page_rows][COLUMNS], total
+
+
+def filter_options(store):
+    # Stage and source choices: the frame's categories, or the cube's values in aggregate mode
+    def compute():
+        if store.aggregated:
+            tables = [store.cube.active, store.cube.closed]
+            return tuple(sorted({v for t in tables for v in t[col].dropna().unique()}) for col in ("stage", "source"))
+        return tuple(list(store.deals[col].cat.categories) for col in ("stage", "source"))
+    return store.memo(("deal_filters",), compute)
+
+
+def remote_deal_page(start, search="", stages=(), sources=(), sort="Newest", page=0, page_size=PAGE_SIZE):
+    # deal_page answered by the proxy: (frame of one page, total matching deals)
+    params = {
+        "start_utc": to_utc_iso(start),
+        "search": search.strip() or None,
+        # Sent as repeated parameters (?stage=a&stage=b)
+        "stage": list(stages) or None,
+        "source": list(sources) or None,
+        "sort": REMOTE_SORTS[sort],
+        "page": page,
+        "page_size": page_size,
+    }
+    data = client.get_payload(DEALS_PATH, params, conditional=False)
+    return type_frame(data.get("rows") or [], DEAL_COLUMNS)[COLUMNS], int(data.get("total") or 0)
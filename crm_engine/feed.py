@@ -0,0 +1,139 @@
+# crm_engine/feed.py — Push-based change feed from the proxy
+#
+# The proxy relays every row the backend writes (leads, deals, the daily
+# metrics row, new AI summaries, data version bumps) as Server-Sent Events on
+# /api/dashboard/changes. ChangeFeed keeps one connection open on a daemon
+# thread and hands each change to DeltaSync.apply_change, which upserts it
+# into the cached frames; while connected, DeltaSync stops polling on a
+# short max_age and only revalidates as a rare safety net.
+#
+# Reconnects send Last-Event-ID. If the proxy cannot replay the gap (it was
+# restarted, or the gap is older than its backlog) it says so in the "ready"
+# event and the sync catches up with one delta fetch.
+#
+# LocalFeed is an in-process stand-in for the proxy stream: tests and offline
+# demos publish changes into it and they flow through the same code path.
+
+import json
+import queue
+import threading
+
+from .client import client
+from .telemetry import telemetry
+
+FEED_PATH = "/api/dashboard/changes"
+# The proxy sends a heartbeat every 15s; this long without a byte means the connection is dead
+READ_TIMEOUT = 45
+# Reconnect backoff (seconds)
+RETRY_MIN, RETRY_MAX = 1, 30
+
+
+def parse_sse(lines):
+    # (event, id, data) per Server-Sent Events block; comments (heartbeats) are skipped
+    event, event_id, data = "message", None, []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, event_id, "\n".join(data)
+            event, event_id, data = "message", None, []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "id":
+            event_id = value
+        elif field == "data":
+            data.append(value)
+
+
+def http_events(last_event_id=None):
+    # The proxy's change stream, decoded; returns when the connection closes
+    headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+    timeout = (client.timeout[0], READ_TIMEOUT)
+    with client.session.get(client.url(FEED_PATH), headers=headers, stream=True, timeout=timeout) as res:
+        res.raise_for_status()
+        # chunk_size=None hands over bytes as they arrive; the default buffers 512 bytes
+        lines = res.iter_lines(chunk_size=None, decode_unicode=True)
+        for event, event_id, data in parse_sse(lines):
+            yield event, event_id, json.loads(data)
+
+
+class LocalFeed:
+    """In-process stand-in for the proxy's change stream."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, **change):
+        # Same shape as the proxy's events: leads / deals / metrics / ai_table rows, or version
+        with self._lock:
+            self._seq += 1
+            event_id = f"local:{self._seq}"
+        self._queue.put(("change", event_id, {"id": event_id, **change}))
+
+    def __call__(self, last_event_id=None):
+        yield "ready", None, {"feed": "local", "resumed": last_event_id is not None}
+        while True:
+            try:
+                yield self._queue.get(timeout=1)
+            except queue.Empty:
+                yield "ping", None, {}
+
+
+class ChangeFeed:
+    """Background subscriber applying pushed changes to a DeltaSync."""
+
+    def __init__(self, sync, source=None):
+        self.sync = sync
+        self.source = source or http_events
+        self.last_event_id = None
+        self.connected = False
+        self.applied = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="crm-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = RETRY_MIN
+        while not self._stop.is_set():
+            try:
+                for event, event_id, data in self.source(self.last_event_id):
+                    if self._stop.is_set():
+                        return
+                    self._handle(event, event_id, data)
+                    delay = RETRY_MIN
+            except Exception as e:
+                self.last_error = str(e)
+                telemetry.count("change_feed", result="error")
+            if self.connected:
+                self.connected = False
+                self.sync.feed_lost()
+            self._stop.wait(delay)
+            delay = min(delay * 2, RETRY_MAX)
+
+    def _handle(self, event, event_id, data):
+        if event == "ready":
+            self.connected = True
+            self.last_error = None
+            telemetry.count("change_feed", result="connected" if data.get("resumed") else "catch_up")
+            self.sync.feed_connected(resumed=data.get("resumed", False))
+        elif event == "change":
+            self.sync.apply_change(data)
+            self.applied += 1
+        if event_id:
+            self.last_event_id = event_id
@@ -0,0 +1,158 @@
+# crm_engine/funnel.py — Lead → deal conversion funnel and velocity
+#
+# Deals point at their lead through lead_id. LeadDealIndex resolves every
+# deal's lead_id to a lead row with one hash lookup (pd.Index.get_indexer)
+# and folds the deals into per-lead arrays: how far down the funnel the lead
+# got, when its first deal was created and when it was first won. It is
+# built once per store, in a single linear pass, and kept in the store's memo.
+#
+# Leads are physically sorted by created_time, so a period's cohort (leads
+# created in [start, end)) is a contiguous slice of those arrays; funnel and
+# velocity tables for any period are then reductions over that slice.
+#
+# A lead's step is the furthest of its own status and its deals' stages.
+# Status names are matched like deal stages (see crm_engine.stages); to map
+# new Zoho statuses set FUNNEL_STATUS_RULES to a JSON list of [step, regex].
+
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .stages import NEGOTIATION, PROPOSAL, WON
+from .timeindex import NAT, time_values
+
+FUNNEL_STEPS = ["Leads", "Contacted", "Demo", "Proposal", "Negotiation", "Won"]
+LEAD, CONTACTED, DEMO, PROPOSAL_STEP, NEGOTIATION_STEP, WON_STEP = range(len(FUNNEL_STEPS))
+STEPS = {name.lower(): step for step, name in enumerate(FUNNEL_STEPS)}
+# Deal stage buckets that place a lead further down the funnel
+BUCKET_STEPS = {PROPOSAL: PROPOSAL_STEP, NEGOTIATION: NEGOTIATION_STEP, WON: WON_STEP}
+
+DEFAULT_RULES = [
+    ("leads", "not contacted|not picked|junk"),
+    ("demo", "demo (done|held|scheduled)|visit|walkthrough"),
+    ("contacted", "contact|call back|qualif|follow ?up|dropped"),
+]
+
+DAY_NS = 86_400 * 10**9
+NO_TIME = np.iinfo(np.int64).max
+
+
+def load_rules():
+    raw = os.environ.get("FUNNEL_STATUS_RULES")
+    rules = json.loads(raw) if raw else DEFAULT_RULES
+    return tuple((STEPS[step], re.compile(pattern, re.IGNORECASE)) for step, pattern in rules)
+
+
+RULES = load_rules()
+
+
+@lru_cache(maxsize=None)
+def classify_status(status, default=LEAD, rules=RULES):
+    if status is None:
+        return default
+    for step, pattern in rules:
+        if pattern.search(status):
+            return step
+    return default
+
+
+def status_steps(values, default=LEAD):
+    # One classification per category, then a vectorized take (like stages.stage_codes)
+    cat = values.astype("category").cat
+    lookup = np.array([classify_status(str(s), default) for s in cat.categories] + [default], dtype=np.int8)
+    return lookup[cat.codes.to_numpy()]
+
+
+class LeadDealIndex:
+    """Per-lead funnel step and conversion times, folded from the lead's deals."""
+
+    def __init__(self, leads, deals):
+        n = len(leads)
+        keys = pd.Index(leads["lead_id"])
+        rows = np.arange(n)
+        if not keys.is_unique:
+            # lead_id is the table's key upstream; keep the first row rather than fail
+            first = ~keys.duplicated()
+            keys, rows = keys[first], rows[first]
+        lead_row = np.full(len(deals), -1, dtype=np.int64)
+        if len(keys) and len(deals):
+            found = keys.get_indexer(deals["lead_id"])
+            lead_row[found >= 0] = rows[found[found >= 0]]
+
+        linked = np.flatnonzero(lead_row >= 0)
+        self.linked = len(linked)
+
+        # Furthest step per deal: its stage bucket, else its stage name, else "Contacted"
+        deal_step = status_steps(deals["stage"], CONTACTED) if len(deals) else np.empty(0, dtype=np.int8)
+        buckets = deals["stage_bucket"].to_numpy() if len(deals) else np.empty(0, dtype=np.int8)
+        for bucket, step in BUCKET_STEPS.items():
+            deal_step = np.where(buckets == bucket, step, deal_step)
+        deal_step = np.maximum(deal_step, CONTACTED)
+
+        created = time_values(deals["created_time"])
+        closed = time_values(deals["closed_time"])
+        at = lead_row[linked]
+        self.step = status_steps(leads["status"]) if n else np.empty(0, dtype=np.int8)
+        np.maximum.at(self.step, at, deal_step[linked].astype(self.step.dtype))
+
+        self.first_deal = np.full(n, NO_TIME, dtype=np.int64)
+        np.minimum.at(self.first_deal, at, np.where(created[linked] == NAT, NO_TIME, created[linked]))
+        won = (buckets[linked] == WON) & (closed[linked] != NAT)
+        self.first_won = np.full(n, NO_TIME, dtype=np.int64)
+        np.minimum.at(self.first_won, at[won], closed[linked][won])
+        self.lead_created = time_values(leads["created_time"])
+
+    def days_to(self, times, lo, hi):
+        # Days from lead creation to `times` over lead rows [lo, hi); NaN where never reached
+        reached = times[lo:hi] != NO_TIME
+        days = np.full(hi - lo, np.nan)
+        days[reached] = np.maximum(times[lo:hi][reached] - self.lead_created[lo:hi][reached], 0) / DAY_NS
+        return days
+
+
+def lead_deal_index(store):
+    return store.memo(("lead_deal_index",), lambda: LeadDealIndex(store.leads, store.deals))
+
+
+def funnel(store, start, end=None):
+    # Leads created in [start, end) reaching each step (at that step or beyond)
+    def compute():
+        index = lead_deal_index(store)
+        lo, hi = store.lead_index.bounds(start, end)
+        reached = np.bincount(index.step[lo:hi], minlength=len(FUNNEL_STEPS))[::-1].cumsum()[::-1]
+        total = max(int(reached[0]), 1)
+        previous = np.maximum(np.concatenate([[reached[0]], reached[:-1]]), 1)
+        return pd.DataFrame({
+            "step": FUNNEL_STEPS,
+            "leads": reached,
+            "of_total": reached / total * 100,
+            "of_previous": reached / previous * 100,
+        })
+    return store.memo(("funnel", start, end), compute)
+
+
+def conversion_velocity(store, start, end=None, by="source"):
+    # Per source / owner: cohort size, leads with a deal, conversion rate and median days to deal / win
+    def compute():
+        index = lead_deal_index(store)
+        lo, hi = store.lead_index.bounds(start, end)
+        rows = pd.DataFrame({
+            by: store.leads[by].iloc[lo:hi].to_numpy(),
+            "to_deal": index.days_to(index.first_deal, lo, hi),
+            "to_won": index.days_to(index.first_won, lo, hi),
+        })
+        grouped = rows.groupby(by, observed=True, dropna=False)
+        out = pd.DataFrame({
+            "leads": grouped.size(),
+            "converted": grouped["to_deal"].count(),
+            "won": grouped["to_won"].count(),
+            "median_days_to_deal": grouped["to_deal"].median(),
+            "median_days_to_won": grouped["to_won"].median(),
+        })
+        out.insert(2, "conversion", out["converted"] / out["leads"] * 100)
+        return out.sort_values("leads", ascending=False).reset_index()
+    return store.memo(("velocity", by, start, end), compute)
@@ -0,0 +1,267 @@
+# crm_engine/history.py — Local daily metrics history
+#
+# The backend keeps one daily_metrics_history row per day (the day's last
+# daily_metrics_summary snapshot). The dashboard mirrors it in an append-only
+# columnar store: one raw little-endian file per column under
+# metrics_history/, so a new row costs a few bytes per file and a read is one
+# np.fromfile per column. A day updated by a later sync is simply appended
+# again; the last row written for a date wins, and compact() rewrites the
+# files once superseded rows outnumber the live ones.
+#
+# Rows arrive from the change feed (DeltaSync appends pushed metrics and
+# metrics_history rows) and from GET /api/dashboard/metrics/history for the
+# days since the last stored date (sync), which also backfills a fresh
+# install. refresh() runs that sync on a background thread behind a circuit
+# breaker, so rendering never waits on it. Period reads are a binary
+# search over the sorted dates plus a slice, so cards, deltas and sparklines
+# for any period cost O(days in the period):
+#   flow metrics   (what happened that day) are summed over the period
+#   level metrics  (pipeline counts as of that day) take the period's last day
+#
+# Writers in several worker processes serialize on a lock file (fcntl, where
+# available); readers notice other workers' appends by the date file's size.
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .breaker import CircuitBreaker
+from .client import NOT_MODIFIED, client
+from .store import IST, ROOT
+from .telemetry import telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+HISTORY_DIR = os.path.join(ROOT, "metrics_history")
+HISTORY_PATH = "/api/dashboard/metrics/history"
+# Seconds between history requests to the proxy (the side table covers the latest row in between)
+SYNC_EVERY = 300
+
+FLOW_METRICS = ["new_leads_today", "deals_closed", "deal_amount_won", "total_revenue"]
+LEVEL_METRICS = ["leads_contacted", "qualified_leads", "demos_scheduled", "demos_held",
+                 "proposals_sent", "negotiations_active", "deal_amount_lost"]
+AMOUNT_METRICS = {"deal_amount_won", "deal_amount_lost", "total_revenue"}
+METRICS = FLOW_METRICS + LEVEL_METRICS
+# metric_date as days since 1970-01-01, updated_at as epoch nanoseconds
+COLUMNS = {"metric_date": "<i4", "updated_at": "<i8",
+           **{m: "<f8" if m in AMOUNT_METRICS else "<i8" for m in METRICS}}
+# Superseded rows tolerated before compact() (and at least this many)
+COMPACT_MIN = 64
+
+
+def _day(value):
+    # Days since epoch of a date, an IST datetime, or an ISO string
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif hasattr(value, "astimezone"):
+        value = value.astimezone(IST).date()
+    return (value - date(1970, 1, 1)).days
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MetricsHistory:
+    """Append-only columnar history of daily metric rows, one file per column."""
+
+    def __init__(self, directory=HISTORY_DIR, breaker=None):
+        self.directory = directory
+        self.breaker = breaker or CircuitBreaker()
+        self.synced_at = None
+        self.refreshing = False
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._size = None
+        self._raw = {col: np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()}
+        self._daily = None
+        self._memo = {}
+
+    def _path(self, col):
+        return os.path.join(self.directory, f"{col}.{np.dtype(COLUMNS[col]).str[1:]}")
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, ".lock"), "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    # -------------------------------------------------
+    # Reading
+    # -------------------------------------------------
+    def _load(self):
+        # Re-read the columns when the files grew or were compacted (by any worker)
+        path = self._path("metric_date")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == self._size:
+            return
+        raw = {col: np.fromfile(self._path(col), dtype=dtype) if os.path.exists(self._path(col))
+               else np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()}
+        # A write cut short leaves some files a row ahead: read the complete rows only
+        rows = min(len(a) for a in raw.values())
+        self._raw = {col: a[:rows] for col, a in raw.items()}
+        self._size = size
+        self._daily = None
+        self._memo = {}
+
+    def _dedup(self):
+        # One row per metric_date (the last written), sorted by date; callers hold self._lock
+        if self._daily is None:
+            dates = self._raw["metric_date"]
+            # np.unique on the reversed dates keeps each date's last occurrence
+            _, first = np.unique(dates[::-1], return_index=True)
+            rows = len(dates) - 1 - first
+            self._daily = {col: a[rows] for col, a in self._raw.items()}
+        return self._daily
+
+    def daily(self):
+        with self._lock:
+            self._load()
+            return self._dedup()
+
+    def __len__(self):
+        return len(self.daily()["metric_date"])
+
+    def last_date(self):
+        dates = self.daily()["metric_date"]
+        return pd.Timestamp(int(dates[-1]), unit="D").date() if len(dates) else None
+
+    def _bounds(self, start, end=None):
+        dates = self.daily()["metric_date"]
+        lo = 0 if start is None else int(np.searchsorted(dates, _day(start), side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, _day(end), side="left"))
+        return lo, max(lo, hi)
+
+    def window(self, start, end=None):
+        # Daily rows in [start, end) as a frame (dates on the IST calendar)
+        daily = self.daily()
+        lo, hi = self._bounds(start, end)
+        frame = pd.DataFrame({col: a[lo:hi] for col, a in daily.items() if col in METRICS})
+        frame.insert(0, "metric_date", pd.to_datetime(daily["metric_date"][lo:hi], unit="D").date)
+        frame["updated_at"] = pd.to_datetime(daily["updated_at"][lo:hi], utc=True).tz_convert(IST)
+        return frame
+
+    def summary(self, start, end=None):
+        # Period totals: flows summed, levels as of the last recorded day; None without data
+        daily = self.daily()
+        lo, hi = self._bounds(start, end)
+        if lo == hi:
+            return None
+        key = (lo, hi, len(daily["metric_date"]))
+        value = self._memo.get(key)
+        if value is None:
+            value = {m: daily[m][lo:hi].sum() for m in FLOW_METRICS}
+            value.update({m: daily[m][hi - 1] for m in LEVEL_METRICS})
+            value = {m: float(v) if m in AMOUNT_METRICS else int(v) for m, v in value.items()}
+            value["days"] = hi - lo
+            value["updated_at"] = pd.Timestamp(int(daily["updated_at"][hi - 1]), tz="UTC").tz_convert(IST)
+            self._memo[key] = value
+        return value
+
+    # -------------------------------------------------
+    # Writing
+    # -------------------------------------------------
+    def append(self, rows):
+        # Store rows (backend dicts) that are newer than what is held for their date; returns how many
+        rows = [r for r in rows if r and (r.get("metric_date") or r.get("updated_at"))]
+        if not rows:
+            return 0
+        updated = pd.to_datetime([r.get("updated_at") for r in rows], utc=True, format="ISO8601")
+        # Oldest first, so the latest row of a date in this batch is the one written last
+        order = np.argsort(updated.to_numpy(), kind="stable")
+        rows, updated = [rows[i] for i in order], updated[order]
+        batch = {
+            "metric_date": np.array([_day(r.get("metric_date") or u) for r, u in zip(rows, updated)], dtype="<i4"),
+            "updated_at": np.array([u.value if u is not pd.NaT else time.time_ns() for u in updated], dtype="<i8"),
+            **{m: np.array([_number(r.get(m)) for r in rows], dtype=COLUMNS[m]) for m in METRICS},
+        }
+
+        with self._file_lock():
+            self._load()
+            held = dict(zip(self._raw["metric_date"].tolist(), self._raw["updated_at"].tolist()))
+            keep = np.array([u > held.get(d, np.iinfo(np.int64).min)
+                             for d, u in zip(batch["metric_date"].tolist(), batch["updated_at"].tolist())])
+            if not keep.any():
+                return 0
+            rows_held = len(self._raw["metric_date"])
+            for col, dtype in COLUMNS.items():
+                with open(self._path(col), "ab") as f:
+                    # Drop a torn row left by an interrupted write before appending
+                    f.truncate(rows_held * np.dtype(dtype).itemsize)
+                    f.write(batch[col][keep].astype(dtype).tobytes())
+            self._size = None
+            self._load()
+            added = int(keep.sum())
+            superseded = len(self._raw["metric_date"]) - len(np.unique(self._raw["metric_date"]))
+        telemetry.count("metrics_history_rows", added)
+        if superseded > max(COMPACT_MIN, len(self)):
+            self.compact()
+        return added
+
+    def record(self, metrics):
+        # The store's daily_metrics_summary side table (a frame of at most one row)
+        if metrics is None or metrics.empty:
+            return 0
+        return self.append(metrics.to_dict("records"))
+
+    def compact(self):
+        # Rewrite the files with one row per date; the date file is swapped last, since
+        # readers only reload when its size changes. Read under the lock, so rows
+        # appended by another worker in the meantime are not dropped.
+        with self._file_lock():
+            self._load()
+            daily = self._dedup()
+            for col in sorted(COLUMNS, key=lambda c: c == "metric_date"):
+                path = self._path(col)
+                daily[col].astype(COLUMNS[col]).tofile(path + ".tmp")
+                os.replace(path + ".tmp", path)
+            self._size = None
+        telemetry.count("metrics_history_compactions")
+
+    def sync(self, max_age=SYNC_EVERY):
+        # Days since the last stored date from the proxy (all of them on a fresh install)
+        if self.synced_at is not None and time.monotonic() - self.synced_at < max_age:
+            return 0
+        self.synced_at = time.monotonic()
+        last = self.last_date()
+        with telemetry.span("metrics_history.sync", since=str(last)):
+            data = self.breaker.call(client.get_payload, HISTORY_PATH, {"since": last.isoformat() if last else None})
+        if data is NOT_MODIFIED:
+            return 0
+        return self.append(data.get("rows") or [])
+
+    def refresh(self, metrics=None):
+        # Non-blocking sync for the render path: at most one background run per
+        # SYNC_EVERY, which also records the side-table row; reads keep what is stored
+        with self._lock:
+            due = self.synced_at is None or time.monotonic() - self.synced_at >= SYNC_EVERY
+            if self.refreshing or not due:
+                return False
+            self.refreshing = True
+        threading.Thread(target=self._run_refresh, args=(metrics,), name="crm-history", daemon=True).start()
+        return True
+
+    def _run_refresh(self, metrics):
+        try:
+            self.record(metrics)
+            self.sync()
+            self.last_error = None
+        except Exception as e:
+            # The breaker and SYNC_EVERY pace the retries
+            self.last_error = str(e)
+            telemetry.count("metrics_history_errors", error=type(e).__name__)
+        finally:
+            self.refreshing = False
@@ -0,0 +1,104 @@
+# crm_engine/kpis.py — Headless KPI engine
+#
+# Everything the Strategic Pulse cards compute, without Streamlit, Plotly or
+# Supabase: period resolution, KPI comparison, delta captions and number
+# formatting. The dashboard renders these results; batch
+# jobs (the daily WhatsApp pulse, cron reports) call them directly or through
+#
+#   python -m crm_engine --period Today
+
+from datetime import datetime, timedelta, timezone
+
+from .periods import COMPARISON_SUFFIX, CUSTOM_RANGE, IST, comparison_period, period_bounds
+
+# How each KPI card is formatted (everything else is a plain count)
+CURRENCY_KPIS = {"rev_won", "rev_lost", "rev_touched", "avg_deal"}
+PERCENT_KPIS = {"win_rate"}
+
+
+def human_format(num, is_currency=False):
+    if num is None: return "0"
+    prefix = "₹ " if is_currency else ""
+
+    magnitude = 0
+    while abs(num) >= 1000 and magnitude < 4:
+        magnitude += 1
+        num /= 1000.0
+
+    suffix = ['', 'k', 'M', 'B', 'T'][magnitude]
+
+    if magnitude == 0:
+        return f"{prefix}{int(num):,}" if num % 1 == 0 else f"{prefix}{num:,.2f}"
+
+    # 1.2k, 15.4M, etc.
+    return f"{prefix}{num:.1f}{suffix}"
+
+
+def format_kpi(key, value):
+    return f"{value:.1f}%" if key in PERCENT_KPIS else human_format(value, key in CURRENCY_KPIS)
+
+
+def get_date_range(option, custom=None, now=None):
+    # Resolved to absolute IST bounds on every call: caches are keyed by the interval, never the label
+    start, end = period_bounds(option, now or datetime.now(IST), custom)
+
+    # Convert to UTC ISO for Supabase
+    start_utc = start.astimezone(timezone.utc).isoformat() if start else None
+    end_utc = end.astimezone(timezone.utc).isoformat() if end else None
+    return start_utc, end_utc, start, end
+
+
+def period_title(option, bounds):
+    if option != CUSTOM_RANGE:
+        return option
+    start, end = bounds
+    return f"{start:%d %b %Y} – {end - timedelta(days=1):%d %b %Y}"
+
+
+def get_comparison(store, start, end=None):
+    # KPIs come from the pre-aggregated rollup cube, not the raw rows (memoized per store)
+    return store.kpis(start, end)
+
+
+def get_delta(curr, prev, key, comp_range, is_percent=False):
+    # Caption against the comparison period, or None without one
+    if not prev:
+        return None
+
+    suffix = COMPARISON_SUFFIX.get(comp_range, "vs prev")
+
+    c_val = curr[key]
+    p_val = prev[key]
+
+    if p_val == 0:
+        return f"+{c_val} {suffix}" if c_val > 0 else f"0% {suffix}"
+
+    diff = c_val - p_val
+    if is_percent:
+        return f"{diff:+.1f}% {suffix}"
+
+    perc = (diff / p_val) * 100
+    return f"{perc:+.1f}% {suffix}"
+
+
+def period_report(store, option, custom=None, now=None):
+    # Current and comparison KPIs for one period, as plain JSON-ready values
+    _, _, start, end = get_date_range(option, custom, now)
+    curr = get_comparison(store, start, end)
+
+    comp_range = comparison_period(option)
+    prev = None
+    if comp_range:
+        _, _, p_start, p_end = get_date_range(comp_range, now=now)
+        prev = get_comparison(store, p_start, p_end)
+
+    return {
+        "period": period_title(option, (start, end)),
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "source": store.source,
+        "kpis": curr,
+        "formatted": {key: format_kpi(key, value) for key, value in curr.items()},
+        "comparison": {"period": comp_range, "kpis": prev} if prev else None,
+        "deltas": {key: get_delta(curr, prev, key, comp_range, key in PERCENT_KPIS) for key in curr},
+    }
@@ -0,0 +1,80 @@
+# crm_engine/periods.py — Selectable periods and their comparison partners
+#
+# Every fixed period the dashboard offers is compared against the one before
+# it. The superset covers both sides of each pair, so the partner is a local
+# slice of the same frames rather than a second request to the backend.
+# Rolling windows and custom ranges resolve to absolute IST intervals too;
+# a custom range reaching past the superset is backfilled by DeltaSync.ensure.
+
+from datetime import datetime, timedelta, timezone
+
+# The CRM's business timezone; every period, window and daily bucket is on the IST calendar
+IST = timezone(timedelta(hours=5, minutes=30))
+
+PERIOD_COMPARISONS = {
+    "Today": "Yesterday",
+    "Yesterday": "Day Before Yesterday",
+    "This Month": "Last Month",
+    "This Year": "Last Year",
+}
+
+# Delta caption suffix per comparison partner
+COMPARISON_SUFFIX = {
+    "Yesterday": "vs prev day",
+    "Day Before Yesterday": "vs prev day",
+    "Last Month": "vs last month",
+    "Last Year": "vs last year",
+}
+
+# Rolling windows: the last N IST days, today included
+ROLLING_WINDOWS = {
+    "Last 7 Days": 7,
+    "Last 30 Days": 30,
+    "Last 90 Days": 90,
+}
+CUSTOM_RANGE = "Custom Range"
+
+# Lead trend spans offered on the Pipeline tab (all inside the session superset)
+TREND_WINDOWS = {"This Month": "This Month", "This Year": "This Year", "Since Last Year": "Last Year"}
+
+PERIODS = list(PERIOD_COMPARISONS) + list(ROLLING_WINDOWS) + [CUSTOM_RANGE]
+SUPERSET_LABELS = list(dict.fromkeys(list(PERIOD_COMPARISONS) + list(PERIOD_COMPARISONS.values())))
+
+
+def comparison_period(label):
+    return PERIOD_COMPARISONS.get(label)
+
+
+def day_start(day):
+    return datetime(day.year, day.month, day.day, tzinfo=IST)
+
+
+def period_bounds(label, now=None, custom=None):
+    # [start, end) in IST; end is None for periods running up to now.
+    # `custom` is the (first, last) calendar day of a custom range, both included.
+    now = now or datetime.now(IST)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month = today.replace(day=1)
+    start = None
+    end = None
+
+    if label in ROLLING_WINDOWS:
+        start = today - timedelta(days=ROLLING_WINDOWS[label] - 1)
+    elif label == CUSTOM_RANGE and custom:
+        first, last = custom[0], custom[-1]
+        start, end = day_start(first), day_start(last) + timedelta(days=1)
+    elif label == "Today":
+        start = today
+    elif label == "Yesterday":
+        start, end = today - timedelta(days=1), today
+    elif label == "Day Before Yesterday":
+        start, end = today - timedelta(days=2), today - timedelta(days=1)
+    elif label == "This Month":
+        start = month
+    elif label == "Last Month":
+        start, end = (month - timedelta(days=1)).replace(day=1), month
+    elif label == "This Year":
+        start = month.replace(month=1)
+    elif label == "Last Year":
+        start, end = month.replace(year=now.year - 1, month=1), month.replace(month=1)
+    return start, end
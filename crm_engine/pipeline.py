@@ -0,0 +1,45 @@
+# crm_engine/pipeline.py — Trigger the backend sync pipeline and follow its progress
+#
+# POST /api/ai/trigger starts (or joins) a run and answers at once;
+# /api/ai/trigger/status reports the current step and the data version the
+# backend publishes once leads, deals and the daily summary are rewritten.
+
+import time
+
+from .client import client
+
+TRIGGER_PATH = "/api/ai/trigger"
+STATUS_PATH = "/api/ai/trigger/status"
+POLL_INTERVAL = 1.0
+# Steps before this one rewrite leads, deals and the daily summary; the rest is AI
+DATA_READY_STEP = 4
+# Zoho sync + analytics normally finish in well under this; the AI steps run on after it
+FOLLOW_TIMEOUT = 300
+
+
+def start_pipeline():
+    res = client.post(TRIGGER_PATH, timeout=5)
+    res.raise_for_status()
+    return res.json()
+
+
+def pipeline_status():
+    return client.get_json(STATUS_PATH, timeout=5)
+
+
+def data_ready(status):
+    return status.get("state") == "done" or status.get("stepIndex", 0) >= DATA_READY_STEP
+
+
+def follow_pipeline(run, poll=POLL_INTERVAL, timeout=FOLLOW_TIMEOUT):
+    # Yield status snapshots of `run` until it stops running (or the timeout passes)
+    deadline = time.monotonic() + timeout
+    status = run
+    while True:
+        yield status
+        if status.get("runId") != run.get("runId") or status.get("state") != "running":
+            return
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(poll)
+        status = pipeline_status()
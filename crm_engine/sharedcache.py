@@ -0,0 +1,210 @@
+# crm_engine/sharedcache.py — Cross-process cache of typed frames
+#
+# Streamlit workers behind a load balancer share one cache tier: published
+# stores are written once as Arrow snapshots and indexed in SQLite by key and
+# generation. Each publish bumps the key's generation; workers compare it
+# against the one they hold and adopt newer frames from disk instead of
+# fetching the backend themselves. The saving is the fetch: one worker calls
+# the backend per generation. Each adopting worker still converts the frames
+# into its own pandas copy (type_frame) and builds its own indexes and cube.
+#
+# A lease row lets exactly one worker revalidate a key at a time, and the
+# data version published by the backend pipeline makes "Sync AI / Cache"
+# reach every worker: frames labelled with an older version are stale.
+# Each key keeps its newest KEEP_SNAPSHOTS generations, as a single worker's
+# snapshot directory does. Entries are also sized on write, and older
+# generations are evicted least-recently-used once the total exceeds the byte
+# budget; the newest generation of a key is never evicted.
+
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+
+import pyarrow as pa
+
+from .snapshots import KEEP_SNAPSHOTS, SNAPSHOT_DIR, load_snapshot_store, write_snapshot
+from .telemetry import telemetry
+
+CACHE_DB = "index.sqlite"
+# Total bytes of snapshots kept on disk across all keys
+BUDGET_BYTES = int(float(os.getenv("SHARED_CACHE_BUDGET_MB", "512")) * 1e6)
+LEASE_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_keys (
+    key TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    data_version TEXT,
+    lease_holder TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS cache_entries (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    data_version TEXT,
+    bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_key ON cache_entries (key, generation);
+"""
+
+
+def dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class SharedCache:
+    def __init__(self, directory=SNAPSHOT_DIR, budget_bytes=BUDGET_BYTES, keep=KEEP_SNAPSHOTS):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.keep = keep
+        self.db_path = os.path.join(directory, CACHE_DB)
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+            self._migrate(db)
+
+    def _connect(self):
+        # Autocommit connection; writers take BEGIN IMMEDIATE so workers serialize on the file lock
+        db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _migrate(self, db):
+        # Indexes written before entries carried a data version
+        for table in ("cache_keys", "cache_entries"):
+            columns = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+            if "data_version" not in columns:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN data_version TEXT")
+
+    def _key_row(self, db, key):
+        db.execute("INSERT OR IGNORE INTO cache_keys (key) VALUES (?)", (key,))
+        return db.execute(
+            "SELECT generation, data_version, lease_holder, lease_expires FROM cache_keys WHERE key = ?", (key,)
+        ).fetchone()
+
+    # -------------------------------------------------
+    # Versions
+    # -------------------------------------------------
+    def generation(self, key):
+        # (generation, data version) currently published for a key
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT generation, data_version FROM cache_keys WHERE key = ?", (key,)).fetchone()
+        return row if row else (0, None)
+
+    def invalidate(self, key, version):
+        # Every worker holding frames of another version treats them as stale;
+        # False if that version was already requested (nothing to rebuild)
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._key_row(db, key)
+            changed = db.execute(
+                "UPDATE cache_keys SET data_version = ? WHERE key = ? AND data_version IS NOT ?", (version, key, version)
+            ).rowcount
+            db.execute("COMMIT")
+        return changed > 0
+
+    # -------------------------------------------------
+    # Revalidation lease
+    # -------------------------------------------------
+    def acquire(self, key, holder, ttl=LEASE_SECONDS):
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            _, _, current, expires = self._key_row(db, key)
+            if current not in (None, holder) and expires > now:
+                db.execute("ROLLBACK")
+                return False
+            db.execute(
+                "UPDATE cache_keys SET lease_holder = ?, lease_expires = ? WHERE key = ?", (holder, now + ttl, key)
+            )
+            db.execute("COMMIT")
+        return True
+
+    def release(self, key, holder):
+        with closing(self._connect()) as db:
+            db.execute(
+                "UPDATE cache_keys SET lease_holder = NULL, lease_expires = 0 WHERE key = ? AND lease_holder = ?",
+                (key, holder),
+            )
+
+    # -------------------------------------------------
+    # Entries
+    # -------------------------------------------------
+    def put(self, key, store, version=None):
+        # Write outside the lock, then register and bump the generation atomically;
+        # retention is per key here (evict), not across the whole directory
+        path = write_snapshot(store, self.directory, keep=None)
+        size = dir_size(path)
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            generation = self._key_row(db, key)[0] + 1
+            db.execute("UPDATE cache_keys SET generation = ? WHERE key = ?", (generation, key))
+            db.execute(
+                "INSERT INTO cache_entries (path, key, generation, data_version, bytes, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, key, generation, version, size, now, now),
+            )
+            db.execute("COMMIT")
+        telemetry.count("shared_cache_writes")
+        self.evict()
+        return generation
+
+    def get(self, key, start=None):
+        # Newest readable entry as (generation, data version, store, created_at), or None.
+        # Only live frames are published, so entries load as "live" whatever their age:
+        # the caller judges staleness from created_at and revalidates with a delta.
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT path, generation, data_version, created_at FROM cache_entries "
+                "WHERE key = ? ORDER BY generation DESC",
+                (key,),
+            ).fetchall()
+            for path, generation, version, created_at in rows:
+                try:
+                    store = load_snapshot_store(path, start, "live")
+                except (OSError, ValueError, pa.ArrowException):
+                    db.execute("DELETE FROM cache_entries WHERE path = ?", (path,))
+                    continue
+                db.execute("UPDATE cache_entries SET accessed_at = ? WHERE path = ?", (time.time(), path))
+                telemetry.count("shared_cache", result="hit")
+                return generation, version, store, created_at
+        telemetry.count("shared_cache", result="miss")
+        return None
+
+    def evict(self):
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Older generations of each key with their rank (1 = newest), least recently used first
+            entries = db.execute(
+                "SELECT path, bytes, rank FROM (SELECT path, bytes, accessed_at, "
+                "ROW_NUMBER() OVER (PARTITION BY key ORDER BY generation DESC) AS rank FROM cache_entries) "
+                "WHERE rank > 1 ORDER BY accessed_at"
+            ).fetchall()
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM cache_entries").fetchone()[0]
+            evicted = []
+            for path, size, rank in entries:
+                if rank <= self.keep and total <= self.budget_bytes:
+                    continue
+                db.execute("DELETE FROM cache_entries WHERE path = ?", (path,))
+                evicted.append(path)
+                total -= size
+            db.execute("COMMIT")
+        # Readers that still map an evicted file keep their pages until they drop it
+        for path in evicted:
+            shutil.rmtree(path, ignore_errors=True)
+        telemetry.count("shared_cache_evictions", len(evicted))
+        telemetry.gauge("shared_cache_bytes", total)
+        return evicted
+
+    def entries(self):
+        with closing(self._connect()) as db:
+            return db.execute(
+                "SELECT key, generation, data_version, bytes, created_at, accessed_at, path FROM cache_entries "
+                "ORDER BY key, generation DESC"
+            ).fetchall()
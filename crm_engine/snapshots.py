@@ -0,0 +1,190 @@
+# crm_engine/snapshots.py — Versioned columnar snapshots of the typed frames
+#
+# Each snapshot is a directory of uncompressed Arrow IPC files (one per frame)
+# plus a manifest. Timestamps are stored as int64 epoch nanoseconds, rows are
+# written in time order and split into record batches so a reader can
+# memory-map the files and only read the batches a time range needs. The
+# batches it does read are converted into pandas copies (to_pandas and
+# type_frame), so a loaded store costs the same memory as a fetched one.
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .coverage import CoverageIndex
+from .store import DEAL_COLUMNS, IST, LEAD_COLUMNS, ROOT, TIME_COLUMNS, CRMDataStore, type_frame
+from .timeindex import NAT, time_values, to_ns
+
+FORMAT_VERSION = 1
+SNAPSHOT_DIR = os.path.join(ROOT, "snapshots")
+KEEP_SNAPSHOTS = 5
+BATCH_ROWS = 65536
+
+FRAMES = ["leads", "deals", "metrics", "ai_table"]
+
+
+# =====================================================
+# ENCODING
+# =====================================================
+def _sort_key(name, df):
+    # Leads are windowed on created_time; deals on their latest activity
+    if df.empty:
+        return np.empty(0, dtype=np.int64)
+    if name == "leads":
+        return time_values(df["created_time"])
+    if name == "deals":
+        return np.maximum.reduce([time_values(df[col]) for col in TIME_COLUMNS])
+    return None
+
+
+def _to_table(df):
+    arrays, names, time_cols, json_cols = [], [], [], []
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.DatetimeTZDtype) or col in TIME_COLUMNS:
+            values = time_values(pd.to_datetime(series, utc=True))
+            arrays.append(pa.array(values, type=pa.int64()))
+            time_cols.append(col)
+        elif series.dtype == object and not series.map(lambda v: v is None or isinstance(v, str)).all():
+            # Nested payloads (ai_table) and mixed columns travel as JSON text
+            arrays.append(pa.array(series.map(lambda v: None if v is None else json.dumps(v)), type=pa.string()))
+            json_cols.append(col)
+        else:
+            arrays.append(pa.array(series, from_pandas=True))
+        names.append(col)
+    return pa.Table.from_arrays(arrays, names=names), time_cols, json_cols
+
+
+def _write_frame(path, name, df):
+    key = _sort_key(name, df)
+    if key is not None and len(key):
+        order = np.argsort(key, kind="stable")
+        df, key = df.iloc[order], key[order]
+
+    table, time_cols, json_cols = _to_table(df)
+    batches = []
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        for offset in range(0, max(len(df), 1), BATCH_ROWS):
+            writer.write_table(table.slice(offset, BATCH_ROWS))
+            if key is not None and len(key):
+                chunk = key[offset:offset + BATCH_ROWS]
+                batches.append([int(chunk.min()), int(chunk.max())])
+
+    return {
+        "file": os.path.basename(path),
+        "rows": len(df),
+        "time_columns": time_cols,
+        "json_columns": json_cols,
+        "batches": batches,
+    }
+
+
+def write_snapshot(store, directory=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    final = os.path.join(directory, f"snap-{stamp}")
+    staging = os.path.join(directory, f".tmp-{stamp}")
+    os.makedirs(staging)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": stamp,
+        "coverage_start": to_ns(store.coverage_start),
+        "coverage": store.coverage.to_list(),
+        "frames": {},
+    }
+    for name in FRAMES:
+        path = os.path.join(staging, f"{name}.arrow")
+        manifest["frames"][name] = _write_frame(path, name, getattr(store, name))
+
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    # Publish atomically, then prune everything past the newest `keep`
+    # (keep=None leaves retention to the caller, e.g. the shared cache's LRU)
+    os.replace(staging, final)
+    if keep is not None:
+        for old in list_snapshots(directory)[keep:]:
+            shutil.rmtree(old, ignore_errors=True)
+    return final
+
+
+# =====================================================
+# DECODING
+# =====================================================
+def list_snapshots(directory=SNAPSHOT_DIR):
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((n for n in os.listdir(directory) if n.startswith("snap-")), reverse=True)
+    return [os.path.join(directory, n) for n in names]
+
+
+def _wanted(name, bounds, start, end):
+    lo, hi = bounds
+    if start is not None and hi < to_ns(start):
+        return False
+    # Deals stay active past their creation, so only leads can be cut on `end`
+    if name == "leads" and end is not None and lo >= to_ns(end):
+        return False
+    return True
+
+
+def _read_frame(path, name, spec, start=None, end=None):
+    # Only the picked batches are paged in; to_pandas copies them out of the mapping
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    if spec["batches"]:
+        picks = [i for i, b in enumerate(spec["batches"]) if _wanted(name, b, start, end)]
+    else:
+        picks = range(reader.num_record_batches)
+    table = pa.Table.from_batches([reader.get_batch(i) for i in picks], schema=reader.schema)
+
+    # Int64 keeps nullable Zoho ids exact (the default would widen them to float64)
+    df = table.to_pandas(split_blocks=True, types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    for col in spec["time_columns"]:
+        values = df[col].to_numpy(dtype=np.int64, na_value=NAT)
+        df[col] = pd.Series(values.view("datetime64[ns]"), index=df.index).dt.tz_localize("UTC").dt.tz_convert(IST)
+    for col in spec["json_columns"]:
+        df[col] = df[col].map(lambda v: None if v is None else json.loads(v))
+    return df
+
+
+def read_snapshot(path, start=None, end=None):
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {path}")
+
+    frames = {
+        name: _read_frame(os.path.join(path, spec["file"]), name, spec, start, end)
+        for name, spec in manifest["frames"].items()
+    }
+    return frames, manifest
+
+
+def load_snapshot_store(path, start=None, source="cache"):
+    frames, manifest = read_snapshot(path, start=start)
+    coverage = manifest.get("coverage_start")
+    coverage_start = pd.Timestamp(coverage, tz="UTC").tz_convert(IST) if coverage else start
+    coverage_start = max(coverage_start, start) if start else coverage_start
+    # Snapshots written before coverage was recorded hold the superset only
+    spans = CoverageIndex.from_list(manifest["coverage"]) if "coverage" in manifest else CoverageIndex.of(coverage_start)
+    return CRMDataStore(
+        type_frame(frames["leads"], LEAD_COLUMNS), type_frame(frames["deals"], DEAL_COLUMNS),
+        frames["metrics"], frames["ai_table"],
+        source, coverage_start, coverage=spans.clip(start),
+    )
+
+
+def load_latest_store(start=None, directory=SNAPSHOT_DIR):
+    # Newest readable snapshot as a store, or None if there is nothing on disk
+    for path in list_snapshots(directory):
+        try:
+            return load_snapshot_store(path, start)
+        except (OSError, ValueError, pa.ArrowException):
+            continue
+    return None
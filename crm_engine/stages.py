@@ -0,0 +1,73 @@
+# crm_engine/stages.py — Deal stage → KPI bucket classification
+#
+# Zoho stage names are matched against an ordered rule list once per distinct
+# stage value; deals then carry a small integer bucket code so KPI counts and
+# sums are plain bincount reductions instead of regex scans per rerun.
+#
+# New Zoho stages can be mapped without a code change by setting
+# STAGE_BUCKET_RULES to a JSON list of [bucket, regex] pairs (first match wins).
+
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from .timeindex import NAT, time_values, to_ns
+
+OPEN, WON, LOST, NEGOTIATION, PROPOSAL = range(5)
+BUCKETS = {"open": OPEN, "won": WON, "lost": LOST, "negotiation": NEGOTIATION, "proposal": PROPOSAL}
+N_BUCKETS = len(BUCKETS)
+
+DEFAULT_RULES = [
+    ("won", "closed won"),
+    ("lost", "closed lost"),
+    ("negotiation", "negotiation"),
+    ("proposal", "proposal|quote"),
+]
+
+
+def load_rules():
+    raw = os.environ.get("STAGE_BUCKET_RULES")
+    rules = json.loads(raw) if raw else DEFAULT_RULES
+    return tuple((BUCKETS[bucket], re.compile(pattern, re.IGNORECASE)) for bucket, pattern in rules)
+
+
+RULES = load_rules()
+
+
+@lru_cache(maxsize=None)
+def classify_stage(stage, rules=RULES):
+    if stage is None:
+        return OPEN
+    for code, pattern in rules:
+        if pattern.search(stage):
+            return code
+    return OPEN
+
+
+def stage_codes(stages, rules=RULES):
+    # One classification per category, then a vectorized take over the codes
+    cat = stages.astype("category").cat
+    lookup = np.array([classify_stage(str(s), rules) for s in cat.categories] + [OPEN], dtype=np.int8)
+    return lookup[cat.codes.to_numpy()]  # null code -1 picks the trailing OPEN
+
+
+def bucket_summary(deals, start=None, end=None):
+    # Per-bucket counts over all deals, plus counts/amounts of deals closed in [start, end)
+    codes = deals["stage_bucket"].to_numpy()
+    amount = deals["amount"].to_numpy()
+    closed = time_values(deals["closed_time"])
+
+    in_window = closed != NAT
+    if start is not None:
+        in_window &= closed >= to_ns(start)
+    if end is not None:
+        in_window &= closed < to_ns(end)
+
+    return {
+        "count": np.bincount(codes, minlength=N_BUCKETS),
+        "closed_count": np.bincount(codes[in_window], minlength=N_BUCKETS),
+        "closed_amount": np.bincount(codes[in_window], weights=amount[in_window], minlength=N_BUCKETS),
+    }
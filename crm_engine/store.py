@@ -0,0 +1,312 @@
+# crm_engine/store.py — Superset data store for the dashboard
+#
+# The dashboard pulls one superset covering every selectable period and its
+# comparison partner, types it once, and slices each period out locally.
+
+import copy
+import json
+import os
+from datetime import timezone
+from itertools import count
+
+import numpy as np
+import pandas as pd
+
+from .client import NOT_MODIFIED, client
+from .coverage import CoverageIndex
+from .cube import RollupCube
+from .periods import IST
+from .stages import stage_codes
+from .telemetry import telemetry
+from .timeindex import SortedTimeIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = "/api/dashboard/data"
+# Legacy JSON snapshot written by the proxy (superseded by crm_engine.snapshots)
+LEGACY_SNAPSHOT_PATH = os.path.join(ROOT, 'data_snapshot.json')
+
+LEAD_COLUMNS = ["lead_id", "owner_name", "status", "source", "is_converted", "created_time", "modified_time"]
+DEAL_COLUMNS = ["deal_id", "lead_id", "deal_name", "owner_name", "stage", "source", "amount",
+                "created_time", "modified_time", "closed_time"]
+TIME_COLUMNS = ["created_time", "closed_time", "modified_time"]
+ID_COLUMNS = {"leads": "lead_id", "deals": "deal_id"}
+# Low-cardinality dimensions are held as categoricals; Zoho ids as int64
+CATEGORY_COLUMNS = ["owner_name", "status", "source", "stage"]
+TEXT_COLUMNS = ["deal_name"]
+DEAL_TIME_COLUMNS = ["created_time", "modified_time", "closed_time"]
+# Process-wide token per built store: the key for anything memoized from its frames
+_store_versions = count(1)
+
+
+def next_version():
+    return next(_store_versions)
+
+
+# =====================================================
+# FETCH & TYPING
+# =====================================================
+def to_utc_iso(value):
+    return value.astimezone(timezone.utc).isoformat() if value is not None else None
+
+
+def fetch_payload(start):
+    # Full superset; always a complete body so a fresh store can be built
+    params = {"range_label": "Superset", "start_utc": to_utc_iso(start)}
+    return client.get_payload(DATA_PATH, params, conditional=False)
+
+
+def fetch_range(start, end):
+    # One bounded span outside the loaded coverage: leads created in it, deals active in it
+    params = {"range_label": "Range", "start_utc": to_utc_iso(start), "end_utc": to_utc_iso(end)}
+    return client.get_payload(DATA_PATH, params, conditional=False)
+
+
+def load_legacy_snapshot():
+    if not os.path.exists(LEGACY_SNAPSHOT_PATH):
+        return None
+    with open(LEGACY_SNAPSHOT_PATH, 'r') as f:
+        return json.load(f)
+
+
+def fetch_delta(start, since):
+    # Rows created/modified after the high-water mark, or None if the proxy answers 304
+    params = {"range_label": "Superset", "start_utc": to_utc_iso(start), "since": to_utc_iso(since)}
+    data = client.get_payload(DATA_PATH, params)
+    return None if data is NOT_MODIFIED else data
+
+
+def type_frame(records, columns):
+    # JSON records, or a frame already decoded from the columnar wire format
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    for col in columns:
+        if col not in df.columns:
+            df[col] = None
+
+    # Ensure proper typing and IST conversion
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            if not isinstance(df[col].dtype, pd.DatetimeTZDtype):
+                df[col] = pd.to_datetime(df[col], utc=True)
+            df[col] = df[col].dt.tz_convert(IST).dt.as_unit("ns")
+    if "amount" in df.columns:
+        df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0).astype("float64")
+    if "stage" in df.columns and df["stage"].isna().any():
+        df["stage"] = df["stage"].astype(object).fillna("Unknown")
+    if "is_converted" in df.columns:
+        df["is_converted"] = df["is_converted"].fillna(False).astype(bool)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in TEXT_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    for col in ("lead_id", "deal_id"):
+        if col in df.columns:
+            df[col] = to_id(df[col])
+    if "stage" in df.columns:
+        df["stage_bucket"] = stage_codes(df["stage"])
+    return df
+
+
+def to_id(series):
+    # Zoho record ids are 18-digit integers: int64, or nullable Int64 for foreign keys
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series if series.dtype == "int64" or series.isna().any() else series.astype("int64")
+    if series.isna().all():
+        return pd.Series(pd.NA, index=series.index, dtype="Int64")
+    # numpy_nullable parses straight to Int64 — the float64 path would round 18 digits
+    ids = pd.to_numeric(series, errors="coerce", dtype_backend="numpy_nullable")
+    if (ids.isna() & series.notna()).any() or not pd.api.types.is_integer_dtype(ids.dtype):
+        return series  # non-numeric ids: keep them as strings
+    if ids.isna().any() or series.empty:
+        return ids.astype("Int64")
+    return ids.astype("int64")
+
+
+def align_categories(frames):
+    # Give every frame the same categories so concat keeps the categorical dtype
+    for col in CATEGORY_COLUMNS:
+        dtypes = [f[col].dtype for f in frames if col in f.columns]
+        if not dtypes or not all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            continue
+        categories = dtypes[0].categories
+        for d in dtypes[1:]:
+            categories = categories.union(d.categories)
+        for f in frames:
+            f[col] = f[col].cat.set_categories(categories)
+    return frames
+
+
+# =====================================================
+# STORE
+# =====================================================
+class CubeStore:
+    """Memoized KPI and chart queries over a rollup cube."""
+
+    # Whether the store holds only aggregates (crm_engine.aggregate), no rows
+    aggregated = False
+
+    def render_token(self):
+        # Changes whenever anything a screen shows changes: the frames, or a side table
+        return self.version, self.side_version
+
+    def with_side_change(self):
+        # Same frames and memos under a new render token (e.g. the metrics history grew)
+        store = copy.copy(self)
+        store.side_version = next_version()
+        return store
+
+    def memo(self, key, compute):
+        # Computed once per store; concurrent callers may race, but compute the same value
+        value = self._memo.get(key)
+        if value is None:
+            value = self._memo[key] = compute()
+        return value
+
+    def kpis(self, start, end=None):
+        return self.memo(("kpis", start, end), lambda: self.cube.kpis(start, end))
+
+    def chart_data(self, name, start, end=None):
+        # A cube query behind a chart (leads_per_day, lead_sources, amount_by_stage); read-only
+        return self.memo(("chart", name, start, end), lambda: getattr(self.cube, name)(start, end))
+
+
+class CRMDataStore(CubeStore):
+    """Typed leads/deals superset with sorted time indexes for period slicing."""
+
+    def __init__(self, leads, deals, metrics, ai_table, source="live", coverage_start=None, cube=None, coverage=None):
+        with telemetry.span("store.index", leads=len(leads), deals=len(deals)):
+            # Physically order by created_time so lead windows are contiguous slices
+            self.leads = leads.sort_values("created_time", kind="stable").reset_index(drop=True)
+            self.deals = deals.sort_values("created_time", kind="stable").reset_index(drop=True)
+            self.lead_index = SortedTimeIndex(self.leads["created_time"])
+            self.deal_index = {col: SortedTimeIndex(self.deals[col]) for col in DEAL_TIME_COLUMNS}
+        self.metrics = metrics
+        self.ai_table = ai_table
+        self.source = source
+        self.coverage_start = coverage_start
+        # Time spans the frames hold completely (the superset runs from coverage_start up to now)
+        self.coverage = coverage or CoverageIndex.of(coverage_start)
+        self.version = next_version()
+        # Bumped on its own when only metrics / ai_table change (the frames and memos stay)
+        self.side_version = self.version
+        # Period slices, KPIs and chart data are memoized per store; a store's frames
+        # never change after build. Filled on demand, or ahead of time by crm_engine.warmup.
+        self._memo = {}
+
+        # Day-level aggregates for KPI cards and charts (maintained incrementally by with_delta)
+        if cube is None:
+            with telemetry.span("cube.build"):
+                cube = RollupCube.build(self.leads, self.deals)
+        self.cube = cube
+        telemetry.gauge("rows", len(self.leads), frame="leads")
+        telemetry.gauge("rows", len(self.deals), frame="deals")
+
+    @classmethod
+    def from_payload(cls, data, source="live", coverage_start=None):
+        with telemetry.span("typing.leads", rows=len(data.get("leads", []))):
+            leads = type_frame(data.get("leads", []), LEAD_COLUMNS)
+        with telemetry.span("typing.deals", rows=len(data.get("deals", []))):
+            deals = type_frame(data.get("deals", []), DEAL_COLUMNS)
+        return cls(
+            leads,
+            deals,
+            pd.DataFrame(data.get("metrics", [])),
+            pd.DataFrame(data.get("ai_table", [])),
+            source,
+            coverage_start,
+        )
+
+    def watermarks(self):
+        # Per-module high-water marks, mirroring the backend's sync_state cursors
+        marks = {}
+        for name, df in (("leads", self.leads), ("deals", self.deals)):
+            seen = pd.concat([df["modified_time"], df["created_time"]]).dropna()
+            marks[name] = seen.max() if not seen.empty else None
+        return marks
+
+    def with_delta(self, data):
+        with telemetry.span("delta.apply", leads=len(data.get("leads", [])), deals=len(data.get("deals", []))):
+            return self._apply_delta(data)
+
+    def with_history(self, data, start, end):
+        # Merge rows fetched for a span outside the coverage and record the span as loaded
+        with telemetry.span("history.apply", leads=len(data.get("leads", [])), deals=len(data.get("deals", []))):
+            store = self._apply_delta(data)
+        store.coverage = self.coverage.add(start, end)
+        return store
+
+    def _apply_delta(self, data):
+        # Upsert changed rows by id and return a new store (readers keep the old one)
+        frames, replaced, added = {}, {}, {}
+        for name, columns in (("leads", LEAD_COLUMNS), ("deals", DEAL_COLUMNS)):
+            current = getattr(self, name)
+            changed = type_frame(data.get(name, []), columns)
+            key = ID_COLUMNS[name]
+            if not changed.empty:
+                # Rows re-read from the overlap window carry the same modified_time — skip them
+                prior = changed[key].map(current.set_index(key)["modified_time"])
+                changed = changed[prior.isna() | (changed["modified_time"] > prior)]
+            replaced[name], added[name] = current.iloc[:0], changed
+            if changed.empty:
+                frames[name] = current
+                continue
+            hit = current[key].isin(changed[key])
+            kept, replaced[name] = current[~hit], current[hit]
+            frames[name] = pd.concat(align_categories([kept, changed]), ignore_index=True)
+
+        metrics = pd.DataFrame(data["metrics"]) if data.get("metrics") else self.metrics
+        ai_table = pd.DataFrame(data["ai_table"]) if data.get("ai_table") else self.ai_table
+
+        if frames["leads"] is self.leads and frames["deals"] is self.deals:
+            # Nothing changed — keep the sorted frames, indexes, version and memoized slices
+            store = copy.copy(self)
+            store.metrics, store.ai_table = metrics, ai_table
+            # Polls re-send the side tables each time: only new content counts as a change
+            if not (metrics.equals(self.metrics) and ai_table.equals(self.ai_table)):
+                store.side_version = next_version()
+            return store
+        with telemetry.span("cube.update"):
+            cube = self.cube.with_changes(replaced["leads"], added["leads"], replaced["deals"], added["deals"])
+        return CRMDataStore(
+            frames["leads"], frames["deals"], metrics, ai_table, "live", self.coverage_start, cube, self.coverage
+        )
+
+    def memory_report(self, windows):
+        # Deep footprint of the superset and of each period's slice (bytes)
+        rows = [{
+            "period": "Superset",
+            "leads": len(self.leads),
+            "deals": len(self.deals),
+            "bytes": int(self.leads.memory_usage(deep=True).sum() + self.deals.memory_usage(deep=True).sum()),
+        }]
+        for label, (start, end) in windows.items():
+            leads, deals = self.window(start, end)
+            rows.append({
+                "period": label,
+                "leads": len(leads),
+                "deals": len(deals),
+                "bytes": int(leads.memory_usage(deep=True).sum() + deals.memory_usage(deep=True).sum()),
+            })
+        return pd.DataFrame(rows)
+
+    def window(self, start, end=None):
+        # (leads, deals) active in [start, end), sliced once per store
+        return self.memo(("window", start, end), lambda: (self.leads_between(start, end), self.deals_between(start, end)))
+
+    def leads_between(self, start, end=None):
+        lo, hi = self.lead_index.bounds(start, end)
+        return self.leads.iloc[lo:hi]
+
+    def deals_between(self, start, end=None):
+        # A deal is "active" in a period if created, modified, or closed then.
+        # One vectorised pass over the three columns: for long windows this beats
+        # merging the sorted-index positions, which needs a sort of ~3x the rows.
+        idx = self.deal_index
+        keep = np.ones(len(self.deals), dtype=bool)
+        if start is not None:
+            keep &= idx["created_time"].since(start) | idx["modified_time"].since(start) | idx["closed_time"].since(start)
+        if end is not None:
+            keep &= idx["created_time"].before(end) & (idx["modified_time"].before(end) | idx["closed_time"].before(end))
+        return self.deals.iloc[np.flatnonzero(keep)]
+
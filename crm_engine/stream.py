@@ -0,0 +1,86 @@
+# crm_engine/stream.py — Superset download as a stream of typed pages
+#
+# The proxy's /api/dashboard/stream endpoint sends the rows as NDJSON, one
+# keyset page (up to 1,000 rows, in created_time order) per line. Each page is
+# typed and folded into the rollup cube as it arrives, so KPIs are available
+# before the download ends: iter_stores yields a provisional store every
+# PROGRESS_EVERY seconds and a complete one last. Nothing is truncated at
+# PostgREST's row cap; a stream that stops without its "end" line is an error.
+
+import time
+
+import pandas as pd
+
+from .client import client
+from .cube import RollupCube
+from .store import DEAL_COLUMNS, LEAD_COLUMNS, CRMDataStore, align_categories, to_utc_iso, type_frame
+from .telemetry import telemetry
+
+STREAM_PATH = "/api/dashboard/stream"
+COLUMNS = {"leads": LEAD_COLUMNS, "deals": DEAL_COLUMNS}
+# Minimum gap between provisional stores (each one re-sorts the rows so far)
+PROGRESS_EVERY = 0.5
+
+
+def _concat(chunks, columns):
+    if not chunks:
+        return type_frame([], columns)
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(align_categories(chunks), ignore_index=True)
+
+
+def iter_stores(start, end=None):
+    # Provisional stores while pages arrive (store.complete is False), then the full one
+    params = {"range_label": "Superset", "start_utc": to_utc_iso(start), "end_utc": to_utc_iso(end)}
+    chunks = {"leads": [], "deals": []}
+    empty = {name: type_frame([], columns) for name, columns in COLUMNS.items()}
+    cube = RollupCube.build(empty["leads"], empty["deals"])
+    meta = {}
+    last_progress = time.monotonic()
+
+    def build(complete):
+        store = CRMDataStore(
+            _concat(chunks["leads"], LEAD_COLUMNS),
+            _concat(chunks["deals"], DEAL_COLUMNS),
+            pd.DataFrame(meta.get("metrics") or []),
+            pd.DataFrame(meta.get("ai_table") or []),
+            meta.get("source", "live"),
+            start,
+            cube,
+        )
+        store.complete = complete
+        return store
+
+    for line in client.iter_ndjson(STREAM_PATH, params):
+        kind = line.get("type")
+        if kind == "meta":
+            meta = line
+        elif kind == "page":
+            name = line["frame"]
+            with telemetry.span("typing." + name, rows=len(line["rows"]), streamed=True):
+                page = type_frame(line["rows"], COLUMNS[name])
+            chunks[name].append(page)
+            if name == "leads":
+                cube = cube.with_changes(empty["leads"], page, empty["deals"], empty["deals"])
+            else:
+                cube = cube.with_changes(empty["leads"], empty["leads"], empty["deals"], page)
+            if time.monotonic() - last_progress >= PROGRESS_EVERY:
+                yield build(False)
+                last_progress = time.monotonic()
+        elif kind == "end":
+            telemetry.count("stream_pages", sum(len(c) for c in chunks.values()))
+            yield build(True)
+            return
+        elif kind == "error":
+            raise ConnectionError(f"Backend stream failed: {line.get('error')}")
+    raise ConnectionError("Backend stream ended before all pages arrived")
+
+
+def stream_store(start, end=None, progress=None):
+    # The complete store; `progress` sees each provisional one (e.g. to render early KPI cards)
+    for store in iter_stores(start, end):
+        if store.complete:
+            return store
+        if progress is not None:
+            progress(store)
@@ -0,0 +1,364 @@
+# crm_engine/sync.py — Incremental, stale-while-revalidate sync for the dashboard
+#
+# The first load pulls the full superset; afterwards only rows created or
+# modified after the last seen watermark are requested and upserted by id,
+# the same high-water-mark approach the backend uses against Zoho.
+#
+# Reads never wait on the network once frames exist: a stale store is served
+# as-is while a background thread revalidates it, and a circuit breaker stops
+# hitting the backend for a cool-down after repeated failures.
+#
+# With persistence on, workers coordinate through the shared cache: one
+# worker holds the revalidation lease and publishes a new generation, the
+# others adopt it from disk on their next read.
+#
+# Every store installed here (fetched, adopted or backfilled) is warmed on a
+# background thread, so sessions find its period slices and KPIs computed.
+#
+# With follow(), changes pushed by the proxy (crm_engine.feed) are upserted
+# as they happen, and polling relaxes to FEED_MAX_AGE while the feed is up.
+# Pushed daily metrics rows are also appended to the local history
+# (crm_engine.history) when one is attached.
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .breaker import CircuitBreaker
+from .client import client
+from .feed import ChangeFeed
+from .sharedcache import SharedCache
+from .snapshots import SNAPSHOT_DIR, load_latest_store
+from .store import IST, CRMDataStore, fetch_delta, fetch_payload, fetch_range, load_legacy_snapshot
+from .stream import stream_store
+from .telemetry import telemetry
+from .warmup import warm
+
+# Re-read a small overlap behind the watermark; upserts make this idempotent
+DELTA_OVERLAP = timedelta(minutes=2)
+# While a peer rebuilds a requested version, re-check the shared cache this often
+PEER_RECHECK = timedelta(seconds=0.5)
+# Safety-net revalidation while the change feed is connected
+FEED_MAX_AGE = timedelta(minutes=15)
+
+
+def load_store(start, breaker=None, progress=None):
+    # 1. Backend proxy, streamed page by page → 2. columnar snapshot → 3. legacy JSON snapshot.
+    # `progress` is handed provisional stores while the stream is still arriving.
+    try:
+        if breaker is not None:
+            return breaker.call(stream_store, start, progress=progress)
+        return stream_store(start, progress=progress)
+    except Exception as e:
+        store = load_latest_store(start)
+        if store is not None:
+            return store
+        legacy = load_legacy_snapshot()
+        if legacy is not None:
+            return CRMDataStore.from_payload(legacy, "cache", start)
+        raise ConnectionError(f"Backend unreachable and no local cache found. {str(e)}")
+
+
+class DeltaSync:
+    def __init__(self, coverage_start, max_age=30, persist=True, breaker=None, cache=None, prewarm=True, history=None):
+        self.coverage_start = coverage_start
+        self.max_age = timedelta(seconds=max_age)
+        self.persist = persist
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache or (SharedCache() if persist else None)
+        self.key = f"superset:{coverage_start.date().isoformat()}"
+        self.holder = f"{os.getpid()}-{id(self):x}"
+        self.generation = 0
+        # Backend data version the frames reflect, and the one last requested
+        self.data_version = None
+        self.target_version = None
+        self.store = None
+        self.checked_at = None
+        self.refreshing = False
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        # One backfill at a time; reads keep being served while it runs
+        self._backfill = threading.Lock()
+        # One adoption of a peer's snapshot at a time (see current)
+        self._adopting = threading.Lock()
+        self.prewarm = prewarm
+        self._warmed = None
+        # Push-based changes (see follow)
+        self.feed = None
+        self.feed_live = False
+        self.history = history
+
+    def since(self):
+        marks = [m for m in self.store.watermarks().values() if m is not None]
+        return (min(marks) - DELTA_OVERLAP) if marks else None
+
+    def current(self, progress=None):
+        # `progress` only matters on a cold start with nothing on disk: it sees
+        # provisional stores while the superset streams in
+        with self._lock:
+            shared = self.cache.generation(self.key) if self.cache else None
+            if shared and shared[1] is not None:
+                self.target_version = shared[1]
+            missed = self.store is None
+            if missed:
+                telemetry.count("data_cache", result="miss")
+                self._cold_start(progress)
+            newer = bool(shared) and shared[0] > self.generation
+        # Another worker published newer frames — read them instead of fetching
+        adopted = newer and self._adopt_shared()
+        with self._lock:
+            if adopted:
+                telemetry.count("data_cache", result="adopt")
+            elif not missed:
+                telemetry.count("data_cache", result="stale" if self._stale() else "hit")
+            if self._stale() and not self.refreshing:
+                self.refreshing = True
+                threading.Thread(target=self._revalidate, name="crm-revalidate", daemon=True).start()
+            return self.store
+
+    def ensure(self, start, end=None, progress=None):
+        # Frames covering [start, end). Spans the store already holds are answered
+        # locally; only the missing sub-intervals are fetched and merged in.
+        store = self.current(progress)
+        if store.coverage.covers(start, end):
+            telemetry.count("coverage", result="hit")
+            return store
+        with self._backfill:
+            fetched = []
+            try:
+                for lo, hi in self.store.coverage.missing(start, end):
+                    with telemetry.span("sync.backfill", start=str(lo), end=str(hi)):
+                        fetched.append((lo, hi, self.breaker.call(fetch_range, lo, hi)))
+            except Exception:
+                # Serve what is loaded; the caller can see the gap in store.coverage
+                telemetry.count("coverage", result="error")
+            with self._lock:
+                store = self.store
+                for lo, hi, data in fetched:
+                    store = store.with_history(data, lo, hi)
+                self._publish(store)
+        if fetched:
+            telemetry.count("coverage", result="backfill")
+        return store
+
+    def invalidate(self, version=None):
+        # Frames not labelled with `version` are stale, in every worker sharing the
+        # cache. Repeating a version already requested is a no-op, so many sessions
+        # reacting to the same pipeline run cause a single rebuild.
+        version = version or datetime.now(IST).isoformat()
+        if version == self.target_version:
+            return False
+        self.target_version = version
+        if self.cache:
+            return self.cache.invalidate(self.key, version)
+        return True
+
+    def wait_for(self, version, timeout=60):
+        # Block until the frames reflect `version`; concurrent callers share one rebuild
+        self.invalidate(version)
+        deadline = time.monotonic() + timeout
+        while True:
+            store = self.current()
+            remaining = deadline - time.monotonic()
+            if self.data_version == version or remaining <= 0:
+                return store
+            with self._settled:
+                self._settled.wait(min(remaining, 0.5))
+
+    def follow(self, source=None):
+        # Subscribe to the proxy's change feed (or a stand-in source) once per sync
+        if self.feed is None:
+            self.feed = ChangeFeed(self, source).start()
+        return self.feed
+
+    def feed_connected(self, resumed):
+        self.feed_live = True
+        if not resumed:
+            # Events may have been missed (first connect, proxy restart): one delta fetch catches up
+            self.checked_at = None
+
+    def feed_lost(self):
+        # Back to polling on max_age until the feed reconnects
+        self.feed_live = False
+
+    def apply_change(self, change):
+        # Upsert pushed rows into the frames; a version event marks the frames current
+        rows = {name: len(change.get(name) or []) for name in ("leads", "deals", "metrics", "ai_table")}
+        # History first, so the rerun the new store triggers already reads it
+        recorded = self._record_history(change)
+        with self._lock:
+            if self.store is None:
+                return
+            store = self.store
+            if any(rows.values()):
+                with telemetry.span("feed.apply", **rows):
+                    store = store.with_delta(change)
+            if recorded:
+                store = store.with_side_change()
+            # Every worker follows the feed itself, so these are not written to the shared cache
+            self._publish(store, share=False)
+            if change.get("version"):
+                self.data_version = change["version"]
+        telemetry.count("change_feed", result="applied")
+        with self._settled:
+            self._settled.notify_all()
+
+    def _record_history(self, change):
+        # Daily metrics rows (today's summary and history upserts) into the local history
+        rows = (change.get("metrics_history") or []) + (change.get("metrics") or [])
+        if self.history is None or not rows:
+            return 0
+        try:
+            return self.history.append(rows)
+        except Exception as e:
+            telemetry.count("metrics_history_errors", error=type(e).__name__)
+            return 0
+
+    def _stale(self):
+        max_age = FEED_MAX_AGE if self.feed_live else self.max_age
+        if self.checked_at is None or datetime.now(IST) - self.checked_at >= max_age:
+            return True
+        # A newer requested version forces a rebuild, unless the last attempt failed
+        # (then the breaker and max_age pace the retries as usual)
+        if self.last_error is None and self.target_version not in (None, self.data_version):
+            return datetime.now(IST) - self.checked_at >= PEER_RECHECK
+        return False
+
+    def _adopt(self):
+        # Read and install a peer's snapshot in one go (cold start, under self._lock)
+        return self._install(self._read_shared())
+
+    def _adopt_shared(self):
+        # Typing the snapshot and building its cube happens outside self._lock, so other
+        # sessions keep being served the current store; one session does the read
+        if not self._adopting.acquire(blocking=False):
+            return False
+        try:
+            entry = self._read_shared()
+            with self._lock:
+                return self._install(entry)
+        finally:
+            self._adopting.release()
+
+    def _read_shared(self):
+        with telemetry.span("snapshot.read", shared=True):
+            # Whole snapshot: a peer's backfilled history comes along with the superset
+            return self.cache.get(self.key)
+
+    def _install(self, entry):
+        if entry is None:
+            # Nothing readable on disk for that generation: stop waiting on it
+            self.generation = self.cache.generation(self.key)[0]
+            return False
+        if entry[0] <= self.generation:
+            # This worker published (or adopted) a newer one while the read ran
+            return False
+        self.generation, self.data_version, self.store, created_at = entry
+        self._warm(self.store)
+        # Staleness runs from when the publishing worker fetched the data
+        self.checked_at = datetime.fromtimestamp(created_at, IST)
+        return True
+
+    def _cold_start(self, progress=None):
+        # A local snapshot renders instantly; the live superset follows in the background
+        if self.cache and self._adopt():
+            return
+        with telemetry.span("snapshot.read"):
+            store = load_latest_store(self.coverage_start, self.cache.directory if self.cache else SNAPSHOT_DIR)
+        if store is not None:
+            self.store = store
+            self._warm(store)
+            return
+        store = load_store(self.coverage_start, self.breaker, progress)
+        served = client.served_version() if store.source == "live" else None
+        self.data_version = served or self.target_version
+        self._publish(store)
+        self.checked_at = datetime.now(IST)
+
+    def _revalidate(self):
+        result = "error"
+        leased = False
+        target = self.target_version
+        try:
+            if self.cache:
+                # A peer already published newer frames, or is fetching right now: adopt theirs
+                if self.cache.generation(self.key)[0] > self.generation:
+                    result = "peer"
+                    return
+                leased = self.cache.acquire(self.key, self.holder)
+                if not leased:
+                    result = "peer"
+                    return
+            with telemetry.span("sync.revalidate") as span:
+                # Network and typing happen outside the lock; feed pushes and backfills
+                # published meanwhile are kept by rebasing onto self.store under it
+                fresh = delta = None
+                since = self.since() if self.store.source == "live" else None
+                if since is None:
+                    # No watermark, or an offline snapshot: fetch the full superset
+                    data = self.breaker.call(fetch_payload, self.coverage_start)
+                    fresh = CRMDataStore.from_payload(data, "live", self.coverage_start)
+                    result = "full"
+                else:
+                    delta = self.breaker.call(fetch_delta, self.coverage_start, since)
+                    # 304: nothing changed since the last poll — keep the current store
+                    result = "delta" if delta is not None else "not_modified"
+                span["result"] = result
+                with self._lock:
+                    if fresh is None:
+                        fresh = self.store.with_delta(delta) if delta is not None else self.store
+                    else:
+                        fresh = self._carry_backfill(fresh)
+                    # The version the proxy says it served; a slow response may predate `target`,
+                    # in which case _stale() asks again shortly
+                    self.data_version = client.served_version() or target
+                    self._publish(fresh)
+            self.last_error = None
+        except Exception as e:
+            # Keep serving the frames we have; the breaker decides when to try again
+            self.last_error = str(e)
+        finally:
+            if leased:
+                self.cache.release(self.key, self.holder)
+            telemetry.count("sync", result=result)
+            self.checked_at = datetime.now(IST)
+            self.refreshing = False
+            with self._settled:
+                self._settled.notify_all()
+
+    def _carry_backfill(self, fresh):
+        # A full reload covers the superset only: spans backfilled by ensure() keep
+        # the rows already loaded for them (fresher superset rows win the upsert)
+        previous = self.store
+        for lo, hi in previous.coverage.minus(fresh.coverage):
+            leads, deals = previous.window(lo, hi)
+            fresh = fresh.with_history({"leads": leads, "deals": deals}, lo, hi)
+        return fresh
+
+    def _warm(self, store):
+        # Fill the store's memos off the request path; a store keeps its version
+        # (and memos) when a sync brings no changes, so each version is warmed once
+        if not self.prewarm or store.version == self._warmed:
+            return
+        self._warmed = store.version
+        threading.Thread(target=self._run_warmup, args=(store,), name="crm-warmup", daemon=True).start()
+
+    def _run_warmup(self, store):
+        try:
+            warm(store)
+        except Exception:
+            telemetry.count("warmup", result="error")
+
+    def _publish(self, store, share=True):
+        previous, self.store = self.store, store
+        if store is previous:
+            return
+        self._warm(store)
+        changed = previous is None or store.leads is not previous.leads or store.deals is not previous.deals
+        # Backfilled spans are shared too, even when they held no new rows
+        changed = changed or store.coverage is not previous.coverage
+        if self.cache and share and store.source == "live" and changed:
+            with telemetry.span("snapshot.write", leads=len(store.leads), deals=len(store.deals)):
+                self.generation = self.cache.put(self.key, store, self.data_version)
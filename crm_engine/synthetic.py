@@ -0,0 +1,146 @@
+# crm_engine/synthetic.py — Reproducible synthetic leads/deals payloads
+#
+# Generates proxy-shaped payloads (the same JSON the /api/dashboard/data route
+# returns) at any size, following the schema and the status/stage/source mix
+# of the production snapshot. Used by crm_engine.bench, and to feed a local
+# proxy stand-in when profiling the dashboard beyond the real data volume.
+#
+#   python -m crm_engine.synthetic --rows 100000 --out synthetic.json
+
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from .stages import LOST, WON, classify_stage
+
+# Observed shares in the production snapshot; the long tail is folded into the last entries
+OWNERS = {"Kushal Kalambi": 0.97, "James Xavier": 0.03}
+LEAD_STATUSES = {
+    "Not Picked 1": 0.26, "Contacted": 0.137, "Not Qualified Lead": 0.125, "Junk Lead": 0.11,
+    "Not Contacted": 0.095, "Followup For Demo": 0.091, "Lead Dropped": 0.047, "Not Picked 2": 0.046,
+    "Asked to Call Back": 0.04, "Demo Done": 0.023, "Demo Scheduled": 0.015, "Not Picked 3": 0.009,
+    "Visit Request": 0.002,
+}
+LEAD_SOURCES = {
+    "Facebook Ads": 0.575, "Google_Ads": 0.209, "Exotel": 0.125, "Periskope Chat": 0.032,
+    "Internal Referral / Friend": 0.009, "WATI": 0.009, "Architect / Team Member": 0.008,
+    "AHA_Main_Website": 0.006, "Unknown": 0.006, "Walk In": 0.004, "Customer Referral": 0.004,
+    "AHA_Landing_Page": 0.004, "Architect Referral": 0.009,
+}
+DEAL_STAGES = {
+    "Closed Lost": 0.369, "Closed Won": 0.352, "Awaiting Electric Plan": 0.149, "Proposal Shared": 0.074,
+    "Walkthrough Completed": 0.029, "Negotiation/Review": 0.021, "Closed and Advance Pending": 0.006,
+}
+DEAL_SOURCES = {
+    "Facebook Ads": 0.325, "Exotel": 0.128, "Architect Referral": 0.099, "Customer Referral": 0.081,
+    "Google_Ads": 0.08, "WATI": 0.043, "AHA_Main_Website": 0.04, "Unknown": 0.037,
+    "Architect / Team Member": 0.023, "Internal Referral / Friend": 0.019, "Walk In": 0.017,
+    "WATI - Google_Ads": 0.013, "Facebook_Ads_Web": 0.012, "Incoming Call": 0.083,
+}
+# Deal values are quoted in lakh steps: median ₹4L, long tail to ₹45L
+AMOUNT_STEP = 100_000
+AMOUNT_MEDIAN_STEPS = 4
+AMOUNT_SIGMA = 0.7
+AMOUNT_MAX_STEPS = 45
+
+# The snapshot holds ~1.85 deals per lead (deals live longer than leads)
+DEAL_SHARE = 0.65
+# Mean days between a deal's creation and its last modification
+MEAN_ACTIVITY_DAYS = 100
+ID_BASE = 364067000000000000
+SPAN_DAYS = 730
+
+
+def _pick(rng, shares, n):
+    names = list(shares)
+    p = np.array([shares[k] for k in names], dtype="float64")
+    return np.array(names, dtype=object)[rng.choice(len(names), size=n, p=p / p.sum())]
+
+
+def _iso(ns):
+    # Supabase renders timestamptz as "2026-02-16T09:10:58+00:00"
+    text = np.datetime_as_string(ns.astype("datetime64[s]"), unit="s").astype(object)
+    return text + "+00:00"
+
+
+def split_rows(rows):
+    deals = int(round(rows * DEAL_SHARE))
+    return rows - deals, deals
+
+
+def generate_frames(n_leads, n_deals, seed=0, end=None, span_days=SPAN_DAYS):
+    # Raw (untyped) frames with string timestamps and ids, as the proxy sends them
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now(timezone.utc)
+    end_s = int(end.timestamp())
+    start_s = end_s - span_days * 86400
+
+    lead_created = np.sort(rng.integers(start_s, end_s, n_leads)).astype("datetime64[s]")
+    leads = pd.DataFrame({
+        "lead_id": (ID_BASE + np.arange(n_leads)).astype(str),
+        "owner_name": _pick(rng, OWNERS, n_leads),
+        "status": _pick(rng, LEAD_STATUSES, n_leads),
+        "source": _pick(rng, LEAD_SOURCES, n_leads),
+        "is_converted": np.zeros(n_leads, dtype=bool),
+        "created_time": _iso(lead_created),
+        "modified_time": _iso(lead_created),
+    })
+
+    created = rng.integers(start_s, end_s, n_deals)
+    modified = np.minimum(created + rng.exponential(MEAN_ACTIVITY_DAYS * 86400, n_deals).astype("int64"), end_s)
+    stages = _pick(rng, DEAL_STAGES, n_deals)
+    closed_stage = np.isin(stages, [s for s in DEAL_STAGES if classify_stage(s) in (WON, LOST)])
+    closed_time = np.where(closed_stage, _iso(modified.astype("datetime64[s]")), None)
+    steps = np.exp(rng.normal(np.log(AMOUNT_MEDIAN_STEPS), AMOUNT_SIGMA, n_deals))
+    amount = np.clip(np.rint(steps), 0, AMOUNT_MAX_STEPS) * AMOUNT_STEP
+    deals = pd.DataFrame({
+        "deal_id": (ID_BASE + n_leads + np.arange(n_deals)).astype(str),
+        "lead_id": None,
+        "deal_name": np.char.add("Deal ", np.arange(n_deals).astype(str)).astype(object),
+        "owner_name": _pick(rng, OWNERS, n_deals),
+        "stage": stages,
+        "source": _pick(rng, DEAL_SOURCES, n_deals),
+        "amount": amount,
+        "created_time": _iso(created.astype("datetime64[s]")),
+        "modified_time": _iso(modified.astype("datetime64[s]")),
+        "closed_time": closed_time,
+    })
+    return leads, deals
+
+
+def generate_payload(rows, seed=0, end=None, span_days=SPAN_DAYS):
+    n_leads, n_deals = split_rows(rows)
+    leads, deals = generate_frames(n_leads, n_deals, seed, end, span_days)
+    end = end or datetime.now(timezone.utc)
+    return {
+        "leads": leads.to_dict("records"),
+        "deals": deals.to_dict("records"),
+        "metrics": [{
+            "id": 1,
+            "new_leads_today": 0,
+            "leads_contacted": int((leads["status"] == "Contacted").sum()),
+            "qualified_leads": 0,
+            "demos_scheduled": int((leads["status"] == "Demo Scheduled").sum()),
+            "demos_held": int((leads["status"] == "Demo Done").sum()),
+            "updated_at": end.isoformat(),
+            "metric_date": (end - timedelta(days=1)).date().isoformat(),
+        }],
+        "ai_table": [],
+        "timestamp": end.isoformat(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic proxy payload")
+    parser.add_argument("--rows", type=int, default=10_000, help="leads + deals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic.json")
+    args = parser.parse_args()
+
+    payload = generate_payload(args.rows, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(payload, f)
+    print(f"Wrote {len(payload['leads'])} leads and {len(payload['deals'])} deals to {args.out}")
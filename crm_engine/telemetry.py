@@ -0,0 +1,127 @@
+# crm_engine/telemetry.py — Spans, counters and gauges for the dashboard hot path
+#
+# Every phase of a run (proxy call, decode, typing, filtering, KPIs, figure
+# building) is recorded as a timed span. Counters track cache hits/misses and
+# sync outcomes; gauges hold the latest payload sizes and row counts.
+#
+# Recent spans stay in memory for the ?debug=1 panel. Two optional exports:
+#   TELEMETRY_LOG        — append every span as one JSON line
+#   TELEMETRY_PROM_FILE  — Prometheus text exposition, rewritten on flush()
+#                          (node_exporter textfile-collector style)
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+PREFIX = "crm_dashboard"
+KEEP_SPANS = 500
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in key)
+    return "{" + body + "}"
+
+
+class Telemetry:
+    def __init__(self, keep=KEEP_SPANS, log_path=None, prom_path=None):
+        self.spans = deque(maxlen=keep)
+        self.span_totals = defaultdict(lambda: [0, 0.0])
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.log_path = log_path if log_path is not None else os.getenv("TELEMETRY_LOG")
+        self.prom_path = prom_path if prom_path is not None else os.getenv("TELEMETRY_PROM_FILE")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        # Yields the attrs dict so the body can attach sizes / row counts
+        started = time.time()
+        clock = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - clock, started, attrs)
+
+    def record(self, name, seconds, started=None, attrs=None):
+        entry = {
+            "ts": datetime.fromtimestamp(started or time.time(), timezone.utc).isoformat(),
+            "started": started or time.time(),
+            "span": name,
+            "ms": round(seconds * 1000, 3),
+            "thread": threading.current_thread().name,
+            **(attrs or {}),
+        }
+        with self._lock:
+            self.spans.append(entry)
+            totals = self.span_totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def since(self, started):
+        with self._lock:
+            return [s for s in self.spans if s["started"] >= started]
+
+    def recent(self, thread=None, limit=10):
+        with self._lock:
+            spans = [s for s in self.spans if thread is None or s["thread"] == thread]
+        return spans[-limit:]
+
+    def snapshot(self):
+        # Flat rows for the debug panel: (kind, name, labels, value)
+        with self._lock:
+            rows = [("counter", n, dict(k), v) for (n, k), v in sorted(self.counters.items())]
+            rows += [("gauge", n, dict(k), v) for (n, k), v in sorted(self.gauges.items())]
+        return rows
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            if self.span_totals:
+                metric = f"{PREFIX}_span_seconds"
+                lines.append(f"# HELP {metric} Time spent per dashboard phase.")
+                lines.append(f"# TYPE {metric} summary")
+                for name, (count, seconds) in sorted(self.span_totals.items()):
+                    lines.append(f'{metric}_sum{{span="{name}"}} {seconds:.6f}')
+                    lines.append(f'{metric}_count{{span="{name}"}} {count}')
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                seen = set()
+                for (name, key), value in sorted(values.items()):
+                    metric = f"{PREFIX}_{name}" + ("_total" if kind == "counter" else "")
+                    if metric not in seen:
+                        lines.append(f"# TYPE {metric} {kind}")
+                        seen.add(metric)
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        if not self.prom_path:
+            return
+        # Atomic replace so a scraper never reads a half-written file
+        staging = f"{self.prom_path}.tmp"
+        with open(staging, "w") as f:
+            f.write(self.prometheus())
+        os.replace(staging, self.prom_path)
+
+
+telemetry = Telemetry()
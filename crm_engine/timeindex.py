@@ -0,0 +1,50 @@
+# crm_engine/timeindex.py — Sorted time indexes for window slicing
+#
+# Every dashboard period is a half-open [start, end) window in IST. Instead of
+# building boolean masks over the whole frame for each window, we sort each
+# timestamp column once and answer windows with two binary searches.
+
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min
+
+
+def to_ns(value):
+    # Window bounds arrive as tz-aware datetimes (or None for open windows)
+    if value is None:
+        return None
+    return pd.Timestamp(value).as_unit("ns").value
+
+
+def time_values(series):
+    # int64 nanoseconds since epoch, NaT encoded as NAT
+    if series.empty:
+        return np.empty(0, dtype=np.int64)
+    return series.dt.as_unit("ns").to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class SortedTimeIndex:
+    """Row positions of a frame ordered by one timestamp column (NaT dropped)."""
+
+    def __init__(self, series):
+        self.values = time_values(series)
+        order = np.argsort(self.values, kind="stable")
+        n_missing = int(np.count_nonzero(self.values == NAT))
+        self.order = order[n_missing:]
+        self.sorted = self.values[self.order]
+
+    def bounds(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.sorted, to_ns(start), side="left"))
+        hi = len(self.sorted) if end is None else int(np.searchsorted(self.sorted, to_ns(end), side="left"))
+        return lo, max(lo, hi)
+
+    def since(self, start, rows=None):
+        # Mask over `rows` (default: all) where the column is at or after `start`; NaT never is
+        vals = self.values if rows is None else self.values[rows]
+        return vals >= to_ns(start)
+
+    def before(self, end, rows=None):
+        # Mask over `rows` (default: all) where the column is set and strictly earlier than `end`
+        vals = self.values if rows is None else self.values[rows]
+        return (vals != NAT) & (vals < to_ns(end))
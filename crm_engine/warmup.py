@@ -0,0 +1,47 @@
+# crm_engine/warmup.py — Precompute every selectable view after a sync
+#
+# A new store starts with empty memos, so the first session to open a period
+# after a sync paid for the slice, the KPIs and the chart queries. DeltaSync
+# calls warm() on a background thread whenever it installs a new store: the
+# period windows (each fixed period, its comparison partner and the rolling
+# windows), their KPIs and the Pipeline tab's chart data are computed into
+# the store's memos before any session asks for them.
+#
+# This runs in-process on purpose. The results have to land in this
+# process's store memos, and shipping a 1M-row store to a worker process
+# (pickling ~120 MB) costs more than computing every period here; the work
+# is numpy-bound, so a thread pool does not beat one thread either.
+
+from datetime import datetime
+
+from .explorer import SORT_COLUMNS, newest_first
+from .funnel import lead_deal_index
+from .kpis import get_date_range
+from .periods import ROLLING_WINDOWS, SUPERSET_LABELS, TREND_WINDOWS
+from .store import IST
+from .telemetry import telemetry
+
+WARM_PERIODS = SUPERSET_LABELS + list(ROLLING_WINDOWS)
+
+
+def warm(store, now=None):
+    # Same IST bounds the dashboard resolves, so its lookups hit these memo keys
+    now = now or datetime.now(IST)
+    bounds = {label: get_date_range(label, now=now)[2:] for label in WARM_PERIODS}
+
+    with telemetry.span("warmup", version=store.version) as span:
+        for start, end in bounds.values():
+            store.window(start, end)
+            store.kpis(start, end)
+
+        # Pipeline tab: lead trend windows, today's sources, this month's stage values
+        for label in TREND_WINDOWS.values():
+            store.chart_data("leads_per_day", bounds[label][0])
+        store.chart_data("lead_sources", bounds["Today"][0])
+        store.chart_data("amount_by_stage", bounds["This Month"][0])
+        # Lead → deal join behind the Conversion Funnel tab, deal explorer orderings
+        lead_deal_index(store)
+        for column in SORT_COLUMNS.values():
+            newest_first(store, column)
+        span["periods"] = len(bounds)
+    return store
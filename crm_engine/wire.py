@@ -0,0 +1,61 @@
+# crm_engine/wire.py — Decoder for the proxy's columnar binary format
+#
+# Mirror of backend/src/utils/columnar.js. Numeric, id and time columns are
+# viewed straight out of the response buffer; string columns arrive
+# dictionary-encoded and become categoricals, so each distinct value is
+# materialized once instead of once per row.
+
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from .timeindex import NAT
+
+COLUMNAR_TYPE = "application/vnd.aha.columnar"
+MAGIC = b"AHAC"
+IST_TZ = "+05:30"
+
+
+def _column(body, spec, rows):
+    kind = spec["type"]
+    start, length = spec["offset"], spec["length"]
+    if kind == "time":
+        micros = np.frombuffer(body, dtype="<i8", count=rows, offset=start)
+        nanos = np.where(micros == NAT, NAT, micros * 1000)
+        return pd.Series(nanos.view("datetime64[ns]")).dt.tz_localize("UTC").dt.tz_convert(IST_TZ)
+    if kind == "float64":
+        return pd.Series(np.frombuffer(body, dtype="<f8", count=rows, offset=start))
+    if kind == "bool":
+        return pd.Series(np.frombuffer(body, dtype=np.uint8, count=rows, offset=start).astype(bool))
+    if kind == "int64":
+        values = np.frombuffer(body, dtype="<i8", count=rows, offset=start)
+        missing = values == NAT
+        if missing.any():
+            return pd.Series(pd.arrays.IntegerArray(values, missing))
+        return pd.Series(values)
+    if kind == "dict":
+        # Codes map straight onto categories; -1 is already pandas' null code
+        codes = np.frombuffer(body, dtype="<i4", count=rows, offset=start)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(spec["dictionary"], dtype=object)))
+    raise ValueError(f"Unknown column type {kind!r} ({length} bytes)")
+
+
+def decode_columnar(buf):
+    if buf[:4] != MAGIC:
+        raise ValueError("Not an AHA columnar payload")
+    (header_len,) = struct.unpack_from("<I", buf, 4)
+    header = json.loads(bytes(buf[8:8 + header_len]))
+    if header.get("version") != 1:
+        raise ValueError(f"Unsupported columnar version {header.get('version')}")
+
+    body_start = 8 + header_len
+    body_start += (8 - body_start % 8) % 8
+    body = memoryview(buf)[body_start:]
+
+    payload = dict(header.get("meta", {}))
+    for name, frame in header["frames"].items():
+        rows = frame["rows"]
+        payload[name] = pd.DataFrame({spec["name"]: _column(body, spec, rows) for spec in frame["columns"]})
+    return payload
@@ -2,42 +2,62 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from supabase import create_client, ClientOptions
 import os
 import requests
-from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
-import json
+from datetime import datetime, timedelta
+import time
+from crm_engine import DeltaSync
+from crm_engine.aggregate import AggregateSource
+from crm_engine.pipeline import data_ready, follow_pipeline, start_pipeline
+from crm_engine.periods import CUSTOM_RANGE, PERIODS, SUPERSET_LABELS, TREND_WINDOWS, comparison_period
+from crm_engine.downsample import downsample
+from crm_engine.explorer import PAGE_SIZE, SORTS, deal_page, filter_options, remote_deal_page
+from crm_engine.funnel import conversion_velocity, funnel, lead_deal_index
+from crm_engine.history import MetricsHistory
+from crm_engine.kpis import get_comparison, get_date_range, get_delta, human_format, period_title
+from crm_engine.store import IST
+from crm_engine.telemetry import telemetry
 
 # Silence Pandas downcasting warning
 pd.set_option('future.no_silent_downcasting', True)
 
 def refresh():
-    st.cache_data.clear()
-    try:
-        # Call the backend sync trigger
-        requests.post("http://localhost:3001/api/ai/trigger", timeout=5)
-    except:
-        pass
-
-def human_format(num, is_currency=False):
-    if num is None: return "0"
-    prefix = "₹ " if is_currency else ""
-    
-    magnitude = 0
-    while abs(num) >= 1000 and magnitude < 4:
-        magnitude += 1
-        num /= 1000.0
-    
-    suffix = ['', 'k', 'M', 'B', 'T'][magnitude]
-    
-    if magnitude == 0:
-        return f"{prefix}{int(num):,}" if num % 1 == 0 else f"{prefix}{num:,.2f}"
-    
-    # 1.2k, 15.4M, etc.
-    return f"{prefix}{num:.1f}{suffix}"
+    # Run the backend sync, then rebuild once for the data version it publishes.
+    # Cached frames keep serving every session until the new version is in.
+    sync = get_sync()
+    with st.status("🔄 Syncing Zoho CRM...", expanded=True) as status:
+        try:
+            run = start_pipeline()
+        except Exception as e:
+            status.update(label="📡 Sync service unreachable — showing cached data", state="error")
+            st.caption(str(e))
+            return
+
+        bar = st.progress(0.0, text="Starting...")
+        for state in follow_pipeline(run):
+            bar.progress(min(state["stepIndex"] / state["totalSteps"], 1.0), text=state["step"] or "Starting...")
+            if data_ready(state):
+                break
+        if not data_ready(state):
+            if state.get("state") == "failed":
+                status.update(label=f"❌ Sync failed: {state.get('error')}", state="error")
+            else:
+                status.update(label="⏳ Sync is still running — the dashboard will update when it lands", state="running")
+            return
+
+        version = state["dataVersion"]
+        status.write("📥 CRM data synced — refreshing dashboard data...")
+        if AGGREGATE_MODE:
+            get_aggregates().expire()
+            if sync.store is None:
+                # No rows loaded in this worker (only the funnel needs them): nothing to rebuild
+                status.update(label="✅ Dashboard is up to date — AI insights are generating in the background", state="complete", expanded=False)
+                return
+        sync.wait_for(version)
+        if sync.data_version == version:
+            status.update(label="✅ Dashboard is up to date — AI insights are generating in the background", state="complete", expanded=False)
+        else:
+            status.update(label="⏳ Data synced — the dashboard will refresh on the next update", state="running")
 
 # =====================================================
 # CONFIG & STYLING
@@ -49,6 +69,10 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Per-run timing (spans recorded below are shown in the ?debug=1 panel)
+RUN_STARTED = time.time()
+RUN_CLOCK = time.perf_counter()
+
 PRIMARY = "#8b5cf6"
 SECONDARY = "#6366f1"
 SUCCESS = "#10b981"
@@ -106,113 +130,63 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # =====================================================
-# SUPABASE CONNECTION & TIME MATH
+# DATA ACCESS (all reads go through the proxy)
 # =====================================================
-def get_client():
-    dotenv_path = os.path.join(os.path.dirname(__file__), 'backend', '.env')
-    if os.path.exists(dotenv_path):
-        load_dotenv(dotenv_path)
-    else:
-        load_dotenv()
-    
-    # Increase connection timeout to 60s to handle network latency
-    return create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ["SUPABASE_SERVICE_KEY"],
-        options=ClientOptions(postgrest_client_timeout=60)
-    )
-
-# Establish IST timezone
-IST = timezone(timedelta(hours=5, minutes=30))
-
-def get_date_range(option):
-    now = datetime.now(IST)
-    start = None
-    end = None
-    
-    if option == "Today":
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif option == "Yesterday":
-        end = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        start = end - timedelta(days=1)
-    elif option == "This Month":
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif option == "This Year":
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif option == "Last Year":
-        start = now.replace(year=now.year-1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(year=now.year, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif option == "Last Month":
-        first_of_this = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end = first_of_this
-        start = (first_of_this - timedelta(days=1)).replace(day=1)
-    elif option == "Day Before Yesterday":
-        yesterday_start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-        end = yesterday_start
-        start = yesterday_start - timedelta(days=1)
-    
-    # Convert to UTC ISO for Supabase
-    start_utc = start.astimezone(timezone.utc).isoformat() if start else None
-    end_utc = end.astimezone(timezone.utc).isoformat() if end else None
-    return start_utc, end_utc, start, end
-
-@st.cache_data(ttl=30)
-def fetch_filtered_data(range_label):
-    url = "http://localhost:3001/api/dashboard/data"
-    start_utc, end_utc, _, _ = get_date_range(range_label)
-    
-    # Snapshot path for emergency fallback if backend is down
-    snapshot_path = os.path.join(os.path.dirname(__file__), 'backend', 'data_snapshot.json')
-
+# "aggregate": KPI cards and charts come from server-side rollups (/api/dashboard/rollup);
+# the deal explorer fetches single pages on demand and only the conversion funnel loads rows
+AGGREGATE_MODE = os.environ.get("DASHBOARD_DATA_MODE", "rows") == "aggregate"
+# Tabs that never read rows, served from the rollup in aggregate mode
+AGGREGATE_TABS = {"⚡ Strategic Pulse", "📊 Pipeline Performance", "🧠 AI Executive Insights"}
+
+@st.cache_resource
+def get_sync():
+    # Widest window needed this session (start of last year in IST)
+    superset_start = min(get_date_range(label)[2] for label in SUPERSET_LABELS)
+    sync = DeltaSync(superset_start, max_age=30, history=get_history())
+    # Changes pushed by the proxy land within seconds; the 30s poll is only the fallback
+    if os.environ.get("DASHBOARD_CHANGE_FEED", "1") != "0":
+        sync.follow()
+    return sync
+
+def get_store(start=None, end=None, progress=None):
+    # In-memory frames served immediately; rows past the modified_time watermark
+    # are pulled on a background thread once they are older than 30s.
+    # A window reaching past the loaded coverage fetches just the missing spans.
+    # On a first load with no snapshot, `progress` gets provisional stores as pages stream in.
+    if start is None:
+        return get_sync().current(progress)
+    return get_sync().ensure(start, end, progress)
+
+@st.cache_resource
+def get_aggregates():
+    return AggregateSource(max_age=30)
+
+def get_aggregate_store(start):
+    # Rollup from the superset start (or an earlier custom start) up to now; None if the proxy cannot serve it
+    superset_start = min(get_date_range(label)[2] for label in SUPERSET_LABELS)
+    span_start = min(superset_start, start) if start is not None else superset_start
     try:
-        # 1. Try fetching from Backend Proxy
-        params = {"range_label": range_label, "start_utc": start_utc, "end_utc": end_utc}
-        res = requests.get(url, params=params, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        source = "live"
+        return get_aggregates().current(span_start)
     except Exception as e:
-        # 2. Fallback to Local Snapshot if backend/network is unreachable
-        if os.path.exists(snapshot_path):
-            with open(snapshot_path, 'r') as f:
-                data = json.load(f)
-            source = "cache"
-        else:
-            raise ConnectionError(f"Backend unreachable and no local cache found. {str(e)}")
-
-    # PROCESS DATA (Unify for both Live and Cache)
-    leads = pd.DataFrame(data.get("leads", []))
-    deals = pd.DataFrame(data.get("deals", []))
-    
-    # Ensure proper typing and IST conversion
-    for df in [leads, deals]:
-        if not df.empty:
-            for col in ["created_time", "closed_time", "modified_time"]:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], utc=True).dt.tz_convert(IST)
-            if "amount" in df.columns:
-                df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0)
-            if "stage" in df.columns:
-                df["stage"] = df["stage"].astype(str)
-
-    return (
-        leads, 
-        deals,
-        pd.DataFrame(data.get("metrics", [])),
-        pd.DataFrame(data.get("ai_table", [])),
-        source
-    )
-
-    # Centers the entire dashboard content for better balance on large screens
-    st.markdown("""
-        <style>
-            .block-container {
-                max-width: 1200px;
-                padding-left: 2rem;
-                padding-right: 2rem;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+        telemetry.count("rollup_fallback", error=type(e).__name__)
+        return None
+
+@st.cache_resource
+def get_history():
+    return MetricsHistory()
+
+def metrics_history(metrics):
+    # Local daily metrics series; the feed appends pushed rows, and the proxy's
+    # history is synced on a background thread every few minutes
+    history = get_history()
+    history.refresh(metrics)
+    return history
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def period_kpis(version, bounds, _store, _period=None):
+    # One entry per (store version, IST interval): reruns on unchanged data skip the cube
+    with telemetry.span("kpis", period=_period):
+        return get_comparison(_store, *bounds)
 
 # =====================================================
 # HEADER
@@ -226,349 +200,240 @@ if c2.button("🔄 Sync AI / Cache", width="stretch"):
 
 st.divider()
 
-# -----------------------------------------------------
-# NAVIGATION & FILTER ROW
-# -----------------------------------------------------
-nav_cols = st.columns([8, 2])
-with nav_cols[0]:
-    active_tab = st.radio(
-        "Navigation",
-        ["⚡ Strategic Pulse", "📊 Pipeline Performance", "🧠 AI Executive Insights"],
-        horizontal=True,
-        label_visibility="collapsed"
-    )
-
-with nav_cols[1]:
-    st.markdown("<div style='margin-top: -15px;'></div>", unsafe_allow_html=True)
-    date_range = st.selectbox(
-        "Period Filter",
-        ["Today", "Yesterday", "This Month", "This Year"],
-        index=0,
-        label_visibility="collapsed"
-    )
-    
-
 # =====================================================
-# LOAD & PREP DATA
+# TAB SECTIONS (each one reruns on its own)
 # =====================================================
-try:
-    with st.spinner(f"⚡ Fetching {date_range} Pipeline..."):
-        # Get boundaries
-        start_utc, end_utc, win_start, win_end = get_date_range(date_range)
-        
-        # Fetch data (now includes all processing and typing)
-        raw_leads, raw_deals, metrics, ai_table, data_source = fetch_filtered_data(date_range)
-        # Make working copies for filter-driven tabs
-        leads = raw_leads.copy()
-        deals = raw_deals.copy()
-        
-        if data_source == "cache":
-            st.warning("📡 Offline Mode: Displaying last successful data snapshot (Supabase unreachable).")
-
-    # Strict Global Filtering by IST boundaries
-    if not leads.empty:
-        leads = leads[leads["created_time"] >= win_start]
-        if win_end:
-            leads = leads[leads["created_time"] < win_end]
-            
-    if not deals.empty:
-        # A deal is "active" in a period if created, modified, or closed then
-        deals = deals[
-            (deals["created_time"] >= win_start) | 
-            (deals["modified_time"] >= win_start) |
-            (deals["closed_time"] >= win_start)
-        ]
-        if win_end:
-            deals = deals[
-                (deals["created_time"] < win_end) & 
-                (
-                    (deals["modified_time"] < win_end) |
-                    (deals["closed_time"] < win_end)
-                )
-            ]
-except ConnectionError as ce:
-    st.error(f"❌ Network Error: {str(ce)}")
-    st.info("💡 Tip: Try pinging your Supabase URL or checking if your VPN is blocking the connection.")
-    st.stop()
-except Exception as e:
-    st.error(f"📡 API Error: Supabase is taking too long to respond or returned an error. {str(e)}")
-    st.warning("🔄 Please check your internet connection and ensure your Supabase project is active.")
-    st.stop()
-
-# Define Tab Objects (Inside tc1 to keep filter on same line)
-# Note: Data loading moved UP to before tab rendering
-
-# Replace Tab rendering with conditional rendering based on active_tab
-if active_tab == "⚡ Strategic Pulse":
-    # Use pre-calculated backend metrics only for "Today"
-    if date_range == "Today" and not metrics.empty:
-        m = metrics.iloc[0]
-        def safe_i(v): 
-            try: return int(v)
-            except: return 0
-        def safe_f(v): 
-            try: return float(v)
-            except: return 0.0
-
-        t_leads   = safe_i(m.get("new_leads_today", len(leads)))
-        t_won     = safe_i(m.get("deals_closed", 0))
-        rev_won   = safe_f(m.get("deal_amount_won", 0))
-        rev_lost  = safe_f(m.get("deal_amount_lost", 0))
-        t_rev     = safe_f(m.get("total_revenue", 0))
-        win_rate  = (rev_won / (rev_won + rev_lost) * 100) if (rev_won + rev_lost) > 0 else 0
-        t_nego    = safe_i(m.get("negotiations_active", 0))
-        t_prop    = safe_i(m.get("proposals_sent", 0))
-        avg_deal  = (rev_won / t_won) if t_won > 0 else 0
-    def get_comparison(leads_df, deals_df, start_dt, end_dt):
-        
-        # If deals empty OR stage column missing → safe return
-        if deals_df.empty or "stage" not in deals_df.columns:
-            return {
-                "leads": len(leads_df),
-                "won_count": 0,
-                "rev_won": 0,
-                "rev_lost": 0,
-                "rev_touched": 0,
-                "win_rate": 0,
-                "nego": 0,
-                "prop": 0,
-                "avg_deal": 0
-            }
-
-        # Ensure required cols exist
-        for col in ["closed_time", "amount"]:
-            if col not in deals_df.columns:
-                deals_df[col] = 0
-
-        won = deals_df[
-            (deals_df["stage"].str.contains("closed won", case=False, na=False)) &
-            (deals_df["closed_time"] >= start_dt)
-        ]
-
-        if end_dt and not won.empty:
-            won = won[won["closed_time"] < end_dt]
-
-        lost = deals_df[
-            (deals_df["stage"].str.contains("closed lost", case=False, na=False)) &
-            (deals_df["closed_time"] >= start_dt)
-        ]
-
-        if end_dt and not lost.empty:
-            lost = lost[lost["closed_time"] < end_dt]
-
-        nego = deals_df[deals_df["stage"].str.contains("negotiation", case=False, na=False)]
-        prop = deals_df[deals_df["stage"].str.contains("proposal|quote", case=False, na=False)]
-
-        rw = won["amount"].sum() if not won.empty else 0
-        rl = lost["amount"].sum() if not lost.empty else 0
-
-        return {
-            "leads": len(leads_df),
-            "won_count": len(won),
-            "rev_won": rw,
-            "rev_lost": rl,
-            "rev_touched": deals_df["amount"].sum() if not deals_df.empty else 0,
-            "win_rate": (rw / (rw + rl) * 100) if (rw + rl) > 0 else 0,
-            "nego": len(nego),
-            "prop": len(prop),
-            "avg_deal": (rw / len(won)) if not won.empty else 0
-        }
+@st.fragment
+def strategic_pulse(store, date_range, bounds, metrics):
+    def kpis_for(period, bounds=None):
+        # Engine KPIs from the rollup cube, memoized per store version
+        bounds = bounds or get_date_range(period)[2:]
+        return period_kpis(store.version, bounds, store, period)
 
     # Current Metrics (Data is already filtered)
-    curr = get_comparison(leads, deals, win_start, win_end)
+    curr = kpis_for(date_range, bounds)
 
-    # Fetch Comparison Data
-    comp_range = None
-    if date_range == "Today": comp_range = "Yesterday"
-    elif date_range == "Yesterday": comp_range = "Day Before Yesterday"
-    elif date_range == "This Month": comp_range = "Last Month"
-    elif date_range == "This Year": comp_range = "Last Year"
+    # Comparison partner (already inside the superset)
+    comp_range = comparison_period(date_range)
 
     prev = None
     if comp_range:
         try:
-            _, _, p_ws, p_we = get_date_range(comp_range)
-            p_leads, p_deals, p_met, p_ai, _ = fetch_filtered_data(comp_range)
-            prev = get_comparison(p_leads, p_deals, p_ws, p_we)
+            prev = kpis_for(comp_range)
         except:
             pass
 
-    def get_delta(key, is_percent=False):
+    def delta(key, is_percent=False):
         # Strict requirement: only show deltas for "Today"
         if date_range != "Today":
             return None
+        return get_delta(curr, prev, key, comp_range, is_percent)
 
-        label_map = {
-            "Yesterday": "vs prev day",
-            "Day Before Yesterday": "vs prev day",
-            "Last Month": "vs last month",
-            "Last Year": "vs last year"
-        }
-        suffix = label_map.get(comp_range, "vs prev")
-        
-        if not prev: 
-            return None
-            
-        c_val = curr[key]
-        p_val = prev[key]
-        
-        if p_val == 0: 
-            return f"+{c_val} {suffix}" if c_val > 0 else f"0% {suffix}"
-            
-        diff = c_val - p_val
-        if is_percent: 
-            return f"{diff:+.1f}% {suffix}"
-            
-        perc = (diff / p_val) * 100
-        return f"{perc:+.1f}% {suffix}"
-
-    st.markdown(f"#### ⚡ {date_range} Performance")
+    st.markdown(f"#### ⚡ {period_title(date_range, bounds)} Performance")
     k1, k2, k3, k4, k5 = st.columns(5)
-    k1.metric("🆕 New Leads",           human_format(curr["leads"]),      delta=get_delta("leads"))
-    k2.metric("🤝 Active Negotiations",  human_format(curr["nego"]),       delta=get_delta("nego"))
-    k3.metric("🏆 Deals Won",           human_format(curr["won_count"]),  delta=get_delta("won_count"))
-    k4.metric("💰 Revenue Won",         human_format(curr["rev_won"], True), delta=get_delta("rev_won"))
-    k5.metric("📉 Revenue Lost",        human_format(curr["rev_lost"], True), delta=get_delta("rev_lost"))
+    k1.metric("🆕 New Leads",           human_format(curr["leads"]),      delta=delta("leads"))
+    k2.metric("🤝 Active Negotiations",  human_format(curr["nego"]),       delta=delta("nego"))
+    k3.metric("🏆 Deals Won",           human_format(curr["won_count"]),  delta=delta("won_count"))
+    k4.metric("💰 Revenue Won",         human_format(curr["rev_won"], True), delta=delta("rev_won"))
+    k5.metric("📉 Revenue Lost",        human_format(curr["rev_lost"], True), delta=delta("rev_lost"))
 
     st.divider()
 
     st.markdown("#### 🏁 Period Outcomes")
     d1, d2, d3, d4 = st.columns(4)
-    d1.metric("💵 Revenue Touched",      human_format(curr["rev_touched"], True), delta=get_delta("rev_touched"))
-    d2.metric("📊 Period Win Rate",      f"{curr['win_rate']:.1f}%",           delta=get_delta("win_rate", True))
-    d3.metric("📄 Proposals Sent",       human_format(curr["prop"]),           delta=get_delta("prop"))
-    d4.metric("🎯 Avg Deal Size",        human_format(curr["avg_deal"], True), delta=get_delta("avg_deal"))
+    d1.metric("💵 Revenue Touched",      human_format(curr["rev_touched"], True), delta=delta("rev_touched"))
+    d2.metric("📊 Period Win Rate",      f"{curr['win_rate']:.1f}%",           delta=delta("win_rate", True))
+    d3.metric("📄 Proposals Sent",       human_format(curr["prop"]),           delta=delta("prop"))
+    d4.metric("🎯 Avg Deal Size",        human_format(curr["avg_deal"], True), delta=delta("avg_deal"))
 
     st.divider()
 
-    if date_range == "Today" and not metrics.empty:
-        m = metrics.iloc[0]
-        st.markdown(f"#### 🗓️ {date_range}'s Lifecycle Activity *(from daily sync)*")
+    # Lifecycle counts as of the period's last synced day, from the local daily history
+    history = metrics_history(metrics)
+    life = history.summary(*bounds)
+    st.markdown(f"#### 🗓️ {period_title(date_range, bounds)} Lifecycle Activity *(from daily syncs)*")
+    if life is None:
+        st.caption("No daily sync recorded in this period yet.")
+    else:
+        prev_life = history.summary(*get_date_range(comp_range)[2:]) if comp_range else None
+        trend = history.window(*bounds) if life["days"] > 1 else None
+
+        def lifecycle(col, label, key):
+            col.metric(
+                label,
+                human_format(life[key]),
+                delta=get_delta(life, prev_life, key, comp_range),
+                chart_data=trend[key].tolist() if trend is not None else None,
+            )
+
         l1, l2, l3, l4, l5 = st.columns(5)
-        l1.metric("📞 Contacted",      human_format(safe_i(m.get("leads_contacted", 0))))
-        l2.metric("⭐ Qualified",      human_format(safe_i(m.get("qualified_leads", 0))))
-        l3.metric("📅 Demo Sched.",    human_format(safe_i(m.get("demos_scheduled", 0))))
-        l4.metric("🖥️ Demo Held",      human_format(safe_i(m.get("demos_held", 0))))
-        l5.metric("⏱️ Last Synced",    str(m.get("updated_at","—"))[:16].replace("T"," "))
+        lifecycle(l1, "📞 Contacted",   "leads_contacted")
+        lifecycle(l2, "⭐ Qualified",   "qualified_leads")
+        lifecycle(l3, "📅 Demo Sched.", "demos_scheduled")
+        lifecycle(l4, "🖥️ Demo Held",   "demos_held")
+        l5.metric("⏱️ Last Synced",    f"{life['updated_at']:%Y-%m-%d %H:%M}")
 
     st.divider()
 
-elif active_tab == "📊 Pipeline Performance":
+def loading_pulse(placeholder, store, date_range, bounds):
+    # Provisional KPI cards while the first superset download is still streaming in
+    curr = store.kpis(*bounds)
+    with placeholder.container():
+        st.caption(f"⏳ Loading live data — {len(store.leads):,} leads, {len(store.deals):,} deals so far…")
+        st.markdown(f"#### ⚡ {period_title(date_range, bounds)} Performance")
+        k1, k2, k3, k4, k5 = st.columns(5)
+        k1.metric("🆕 New Leads",           human_format(curr["leads"]))
+        k2.metric("🤝 Active Negotiations",  human_format(curr["nego"]))
+        k3.metric("🏆 Deals Won",           human_format(curr["won_count"]))
+        k4.metric("💰 Revenue Won",         human_format(curr["rev_won"], True))
+        k5.metric("📉 Revenue Lost",        human_format(curr["rev_lost"], True))
 
-    # =====================================================
-    # IGNORE GLOBAL FILTER — Use FULL RAW DATA
-    # =====================================================
-    now_ist = datetime.now(IST)
-    month_start = now_ist.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    today_start = now_ist.replace(hour=0, minute=0, second=0, microsecond=0)
+# =====================================================
+# CHART FIGURES (built once per data version)
+# =====================================================
+def chart_layout(fig):
+    fig.update_layout(
+        template="plotly_dark",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        margin=dict(l=8, r=8, t=30, b=8),
+        font=dict(family="Inter, sans-serif", color="#94a3b8"),
+        yaxis=dict(gridcolor=GRID, zeroline=False),
+        xaxis=dict(gridcolor=GRID, zeroline=False),
+    )
+    return fig
 
-    # Always use RAW (unfiltered) data
-    full_leads = raw_leads.copy() if not raw_leads.empty else pd.DataFrame()
-    full_deals = raw_deals.copy() if not raw_deals.empty else pd.DataFrame()
+def leads_trend_figure(store, start, end):
+    import plotly.express as px  # only sessions that open the Pipeline tab pay for Plotly
+    # Daily counts, re-bucketed to weeks / months so long windows stay at MAX_POINTS
+    daily, grain = downsample(store.chart_data("leads_per_day", start, end), "day", "Leads")
 
-    # =====================================================
-    # Monthly Leads (Day 1 → Today)
-    # =====================================================
-    monthly_leads = full_leads[
-        (full_leads["created_time"] >= month_start) &
-        (full_leads["created_time"] <= now_ist)
-    ].copy()
+    fig = px.line(daily, x="day", y="Leads", labels={"Leads": "Leads" if grain == "day" else f"Leads per {grain}"})
+
+    fig.update_traces(
+        line_shape="spline",
+        line=dict(color=PRIMARY, width=3),
+        fill="tozeroy",
+        fillcolor="rgba(139, 92, 246, 0.25)"
+    )
+
+    fig.update_layout(height=360, hovermode="x unified")
+    return chart_layout(fig)
+
+def lead_sources_figure(store, start, end):
+    import plotly.express as px
+    src = store.chart_data("lead_sources", start, end)
+    if src.empty:
+        return None
+
+    fig = px.pie(
+        src,
+        values="Count",
+        names="Source",
+        hole=0.65,
+        color_discrete_sequence=[PRIMARY, CYAN, ACCENT, SUCCESS, DANGER, SECONDARY]
+    )
+
+    fig.update_traces(
+        textinfo="percent",
+        marker=dict(line=dict(color=BG, width=3))
+    )
+    return chart_layout(fig)
+
+def stage_value_figure(store, start, end):
+    import plotly.express as px
+    pv = store.chart_data("amount_by_stage", start, end)
+    if pv.empty:
+        return None
+
+    fig = px.bar(
+        pv,
+        x="amount",
+        y="stage",
+        orientation="h",
+        color="amount",
+        color_continuous_scale=[[0, SECONDARY], [0.5, PRIMARY], [1, CYAN]]
+    )
+
+    fig.update_coloraxes(showscale=False)
+    return chart_layout(fig)
+
+def funnel_figure(store, start, end):
+    import plotly.express as px
+    steps = funnel(store, start, end)
+    if not steps["leads"].iloc[0]:
+        return None
+
+    fig = px.funnel(steps, x="leads", y="step", custom_data=["of_total", "of_previous"], color_discrete_sequence=[PRIMARY])
+    fig.update_traces(
+        texttemplate="%{x:,} · %{customdata[0]:.0f}%",
+        hovertemplate="%{y}: %{x:,} leads<br>%{customdata[0]:.1f}% of the cohort<br>%{customdata[1]:.1f}% of the previous step<extra></extra>",
+        marker=dict(line=dict(color=BG, width=2))
+    )
+    fig.update_layout(height=380)
+    return chart_layout(fig)
+
+CHARTS = {
+    "leads_trend": leads_trend_figure,
+    "lead_sources": lead_sources_figure,
+    "stage_value": stage_value_figure,
+    "funnel": funnel_figure,
+}
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def chart_figure(version, chart, bounds, _store):
+    # Shared, never mutated: an unchanged figure serializes to the same spec,
+    # which Streamlit's message cache then sends to the browser by hash only
+    with telemetry.span("chart", chart=chart):
+        return CHARTS[chart](_store, *bounds)
+
+@st.fragment
+def pipeline_performance(store):
 
     # =====================================================
-    # Today's Leads (for Sources)
+    # IGNORE GLOBAL FILTER — Slice the full session superset
     # =====================================================
-    today_leads = full_leads[
-        (full_leads["created_time"] >= today_start) &
-        (full_leads["created_time"] <= now_ist)
-    ].copy()
+    month_start = get_date_range("This Month")[2]
+    today_start = get_date_range("Today")[2]
 
     # =====================================================
-    # Monthly Deals
+    # Monthly Leads & Deals (Day 1 → Today), from the cube
     # =====================================================
-    monthly_deals = full_deals[
-        (
-            (full_deals["created_time"] >= month_start) |
-            (full_deals["modified_time"] >= month_start) |
-            (full_deals["closed_time"] >= month_start)
-        )
-    ].copy()
+    no_leads = store.chart_data("lead_sources", month_start).empty
+    no_deals = store.chart_data("amount_by_stage", month_start).empty
 
-    if monthly_leads.empty and monthly_deals.empty:
+    if no_leads and no_deals:
         st.info("No activity recorded this month.")
-        st.stop()
+        return
 
-    # =====================================================
-    # Chart Helper
-    # =====================================================
-    def chart_layout(fig):
-        fig.update_layout(
-            template="plotly_dark",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=8, r=8, t=30, b=8),
-            font=dict(family="Inter, sans-serif", color="#94a3b8"),
-            yaxis=dict(gridcolor=GRID, zeroline=False),
-            xaxis=dict(gridcolor=GRID, zeroline=False),
-        )
-        return fig
+    def show(chart, start, empty_message=None):
+        fig = chart_figure(store.version, chart, (start, None), store)
+        if fig is not None:
+            st.plotly_chart(fig, width="stretch")
+        else:
+            st.info(empty_message)
 
     # =====================================================
-    # Row 1 — Leads This Month + Lead Sources Today
+    # Row 1 — Lead Trend + Lead Sources Today
     # =====================================================
     col1, col2 = st.columns(2)
 
-    # ---- Leads This Month ----
+    # ---- Lead Trend (This Month by default) ----
     with col1:
-        st.markdown("#### 📈 Leads This Month")
-
-        monthly_leads["day"] = monthly_leads["created_time"].dt.date
-        daily = monthly_leads.groupby("day").size().reset_index(name="Leads")
-
-        full_range = pd.date_range(
-            start=month_start.date(),
-            end=now_ist.date()
+        trend = st.radio(
+            "Lead trend window",
+            list(TREND_WINDOWS),
+            horizontal=True,
+            label_visibility="collapsed",
+            key="trend_window"
         )
-
-        full_df = pd.DataFrame({"day": full_range.date})
-        daily = full_df.merge(daily, on="day", how="left").fillna(0)
-
-        fig = px.line(daily, x="day", y="Leads")
-
-        fig.update_traces(
-            line_shape="spline",
-            line=dict(color=PRIMARY, width=3),
-            fill="tozeroy",
-            fillcolor="rgba(139, 92, 246, 0.25)"
-        )
-
-        fig.update_layout(height=360, hovermode="x unified")
-
-        st.plotly_chart(chart_layout(fig), use_container_width=True)
+        st.markdown(f"#### 📈 Leads {trend}")
+        show("leads_trend", get_date_range(TREND_WINDOWS[trend])[2])
 
     # ---- Lead Sources Today ----
     with col2:
         st.markdown("#### 🎯 Lead Sources (Today)")
-
-        if not today_leads.empty:
-            src = today_leads["source"].value_counts().reset_index()
-            src.columns = ["Source", "Count"]
-
-            fig = px.pie(
-                src,
-                values="Count",
-                names="Source",
-                hole=0.65,
-                color_discrete_sequence=[PRIMARY, CYAN, ACCENT, SUCCESS, DANGER, SECONDARY]
-            )
-
-            fig.update_traces(
-                textinfo="percent",
-                marker=dict(line=dict(color=BG, width=3))
-            )
-
-            st.plotly_chart(chart_layout(fig), use_container_width=True)
-        else:
-            st.info("No leads recorded today.")
+        show("lead_sources", today_start, "No leads recorded today.")
 
     st.divider()
 
@@ -576,47 +441,119 @@ elif active_tab == "📊 Pipeline Performance":
     # Pipeline Value (Monthly)
     # =====================================================
     st.markdown("#### 💰 Pipeline Value This Month")
-
-    if not monthly_deals.empty:
-        pv = (
-            monthly_deals
-            .groupby("stage")["amount"]
-            .sum()
-            .reset_index()
-            .sort_values("amount", ascending=True)
-        )
-
-        fig = px.bar(
-            pv,
-            x="amount",
-            y="stage",
-            orientation="h",
-            color="amount",
-            color_continuous_scale=[[0, SECONDARY], [0.5, PRIMARY], [1, CYAN]]
-        )
-
-        fig.update_coloraxes(showscale=False)
-
-        st.plotly_chart(chart_layout(fig), use_container_width=True)
-    else:
-        st.info("No deals in pipeline this month.")
+    show("stage_value", month_start, "No deals in pipeline this month.")
 
     st.divider()
 
     # =====================================================
-    # Deal Activity (Monthly)
+    # Deal Activity — explorer over the superset
     # =====================================================
-    st.markdown("#### 📰 Deal Activity (This Month)")
+    if not store.aggregated:
+        deal_explorer(store)
+    elif st.toggle("📰 Show deal activity", key="explorer_open"):
+        # Aggregate mode keeps deal rows on the server: pages are fetched only once asked for
+        deal_explorer(store)
+
+@st.fragment
+def deal_explorer(store):
+    # One page of deals per rerun, in a single (virtualized) table
+    st.markdown("#### 📰 Deal Activity")
+
+    def first_page():
+        st.session_state["explorer_page"] = 1
+
+    f1, f2, f3, f4, f5 = st.columns([2, 3, 2, 2, 2])
+    scope = f1.selectbox("Window", list(TREND_WINDOWS), key="explorer_window", on_change=first_page)
+    search = f2.text_input("Search", placeholder="Deal or owner name", key="explorer_search", on_change=first_page)
+    stage_options, source_options = filter_options(store)
+    stages = f3.multiselect("Stage", stage_options, key="explorer_stages", on_change=first_page)
+    sources = f4.multiselect("Source", source_options, key="explorer_sources", on_change=first_page)
+    sort = f5.selectbox("Sort", SORTS, key="explorer_sort", on_change=first_page)
+
+    start = get_date_range(TREND_WINDOWS[scope])[2]
+    filters = dict(search=search, stages=stages, sources=sources, sort=sort)
+    page = st.session_state.get("explorer_page", 1)
+    if store.aggregated:
+        page_of = lambda page: remote_deal_page(start, page=page - 1, **filters)
+    else:
+        page_of = lambda page: deal_page(store, start, None, page=page - 1, **filters)
+    try:
+        with telemetry.span("explorer", sort=sort, remote=store.aggregated) as span:
+            rows, total = page_of(page)
+            pages = max(1, -(-total // PAGE_SIZE))
+            if page > pages:
+                # New data shrank the result set under the current page
+                page = st.session_state["explorer_page"] = pages
+                rows, total = page_of(page)
+            span["rows"] = total
+    except requests.RequestException as e:
+        st.warning(f"📡 Deal activity is unavailable right now: {e}")
+        return
+
+    p1, p2 = st.columns([2, 10])
+    p1.number_input("Page", min_value=1, max_value=pages, step=1, key="explorer_page")
+    p2.caption(f"{total:,} deals · page {page} of {pages}")
+
+    if rows.empty:
+        st.info("No deals match these filters.")
+        return
+    st.dataframe(
+        rows,
+        hide_index=True,
+        width="stretch",
+        column_config={
+            "created_time": st.column_config.DatetimeColumn("Created", format="DD MMM YYYY, HH:mm"),
+            "deal_name": "Deal",
+            "owner_name": "Owner",
+            "stage": "Stage",
+            "source": "Source",
+            "amount": st.column_config.NumberColumn("Amount (₹)", format="localized"),
+            "modified_time": st.column_config.DatetimeColumn("Updated", format="DD MMM YYYY, HH:mm"),
+            "closed_time": st.column_config.DatetimeColumn("Closed", format="DD MMM YYYY"),
+        }
+    )
 
-    recent = monthly_deals.sort_values("created_time", ascending=False).head(20)
+@st.fragment
+def conversion_funnel(store, date_range, bounds):
+    # Leads created in the period, followed through their linked deals (any date)
+    st.markdown(f"#### 🔻 {period_title(date_range, bounds)} Lead Funnel")
+    fig = chart_figure(store.version, "funnel", bounds, store)
+    if fig is None:
+        st.info("No leads created in this period.")
+        return
+    st.plotly_chart(fig, width="stretch")
+    if not lead_deal_index(store).linked:
+        st.caption("No deals are linked to leads yet, so the funnel stops at the lead statuses (Contacted, Demo).")
 
-    if not recent.empty:
-        for _, row in recent.iterrows():
-            st.markdown(
-                f"• **{row.get('deal_name','Deal')}** — {human_format(row['amount'], True)} ({row['stage']})"
-            )
+    st.divider()
 
-elif active_tab == "🧠 AI Executive Insights":
+    st.markdown("#### ⏱️ Conversion Velocity")
+    by = st.radio(
+        "Group velocity by",
+        ["Source", "Owner"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="velocity_by"
+    )
+    table = conversion_velocity(store, *bounds, by={"Source": "source", "Owner": "owner_name"}[by])
+    st.dataframe(
+        table,
+        hide_index=True,
+        width="stretch",
+        column_config={
+            "source": "Source",
+            "owner_name": "Owner",
+            "leads": "Leads",
+            "converted": "Converted",
+            "conversion": st.column_config.NumberColumn("Conversion", format="%.1f%%"),
+            "won": "Won",
+            "median_days_to_deal": st.column_config.NumberColumn("Median days to deal", format="%.1f"),
+            "median_days_to_won": st.column_config.NumberColumn("Median days to win", format="%.1f"),
+        }
+    )
+
+@st.fragment
+def ai_insights(date_range, ai_table):
     # AI Insights strictly follow a "Today-only" visibility policy as requested
     if date_range == "Today":
         if not ai_table.empty:
@@ -625,15 +562,15 @@ elif active_tab == "🧠 AI Executive Insights":
             summary = payload.get("aiSummary", {}).get("text", "No summary available")
 
             st.markdown(f"""
-            <div style="background: linear-gradient(145deg, {CARD_BG}, rgba(15,23,42,0.8)); 
+            <div style="background: linear-gradient(145deg, {CARD_BG}, rgba(15,23,42,0.8));
                         padding: 32px; border-radius: 20px; border: 1px solid {BORDER};
                         box-shadow: 0 10px 30px -10px rgba(0,0,0,0.3);">
                 <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
                     <h3 style="margin:0;" class="gradient-header">
                         ✨ Daily Strategic Briefing
                     </h3>
-                    <span style="background:{ACCENT}22; color:{ACCENT}; font-size:0.75rem; 
-                                 font-weight:700; padding:4px 12px; border-radius:99px; 
+                    <span style="background:{ACCENT}22; color:{ACCENT}; font-size:0.75rem;
+                                 font-weight:700; padding:4px 12px; border-radius:99px;
                                  border:1px solid {ACCENT}44; text-transform:uppercase;">
                         Status: Live
                     </span>
@@ -652,9 +589,194 @@ elif active_tab == "🧠 AI Executive Insights":
             <h1 style="font-size: 3rem; margin-bottom: 20px;">🗓️</h1>
             <h3 style="color:#f8fafc; margin-bottom: 12px;">Strategic Narrative locked to "Today"</h3>
             <p style="color:#94a3b8; max-width: 500px; margin: 0 auto; line-height: 1.6;">
-                AI Strategic Briefings are precision-tuned for your daily pulse. 
+                AI Strategic Briefings are precision-tuned for your daily pulse.
                 Switch the <b>Period Filter</b> to <b>Today</b> to unlock your latest insights and action items.
             </p>
         </div>
         """, unsafe_allow_html=True)
 
+# =====================================================
+# DEBUG PANEL (opt-in: ?debug=1)
+# =====================================================
+def debug_panel(store, run_started):
+    with st.expander("⏱️ Timings for this run"):
+        spans = pd.DataFrame(telemetry.since(run_started))
+        if not spans.empty:
+            st.dataframe(spans.drop(columns=["started"]), hide_index=True, width="stretch")
+        feed = get_sync().feed
+        if feed:
+            state = "connected" if feed.connected else f"reconnecting ({feed.last_error or 'not connected'})"
+            st.caption(f"Change feed {state} · {feed.applied} changes applied")
+        background = telemetry.recent(thread="crm-revalidate")
+        if background:
+            st.caption("Recent background syncs")
+            st.dataframe(pd.DataFrame(background).drop(columns=["started"]), hide_index=True, width="stretch")
+
+    with st.expander("📟 Counters & gauges"):
+        rows = [
+            {"kind": kind, "metric": name, "labels": ", ".join(f"{k}={v}" for k, v in labels.items()), "value": value}
+            for kind, name, labels, value in telemetry.snapshot()
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, width="stretch")
+        st.download_button("Prometheus text", telemetry.prometheus(), file_name="crm_dashboard.prom")
+
+    sync = get_sync()
+    if sync.cache:
+        with st.expander("🗄️ Shared cache"):
+            entries = pd.DataFrame(
+                sync.cache.entries(),
+                columns=["key", "generation", "data_version", "bytes", "created_at", "accessed_at", "path"],
+            )
+            for col in ("created_at", "accessed_at"):
+                entries[col] = pd.to_datetime(entries[col], unit="s", utc=True).dt.tz_convert(IST)
+            entries["MB"] = (entries.pop("bytes") / 1e6).round(3)
+            st.caption(
+                f"Worker generation {sync.generation} · data version {sync.data_version or '—'} · "
+                f"budget {sync.cache.budget_bytes / 1e6:.0f} MB"
+            )
+            st.dataframe(entries.drop(columns=["path"]), hide_index=True, width="stretch")
+
+    if store.aggregated:
+        cube = store.cube
+        st.caption(
+            f"Aggregate mode · rollup rows: {len(cube.leads):,} lead, {len(cube.active):,} active, "
+            f"{len(cube.closed):,} closed"
+        )
+        aggregates = get_aggregates()
+        if aggregates.last_error:
+            st.caption(f"Serving the last good rollup — last error: {aggregates.last_error}")
+        return
+
+    with st.expander("🧮 Memory footprint per cached period"):
+        windows = {label: get_date_range(label)[2:] for label in SUPERSET_LABELS}
+        report = store.memory_report(windows)
+        report["MB"] = (report.pop("bytes") / 1e6).round(3)
+        st.dataframe(report, hide_index=True, width="stretch")
+
+# =====================================================
+# DASHBOARD BODY
+# =====================================================
+# Navigation, the period filter and the data load rerun as one fragment:
+# switching tab or period leaves the styling and header above untouched.
+@st.fragment
+def dashboard_body():
+    # Timed on its own: a tab or period switch reruns only this function
+    view_started = time.time()
+    view_clock = time.perf_counter()
+
+    # -----------------------------------------------------
+    # NAVIGATION & FILTER ROW
+    # -----------------------------------------------------
+    nav_cols = st.columns([8, 2])
+    with nav_cols[0]:
+        active_tab = st.radio(
+            "Navigation",
+            ["⚡ Strategic Pulse", "📊 Pipeline Performance", "🔻 Conversion Funnel", "🧠 AI Executive Insights"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+
+    with nav_cols[1]:
+        st.markdown("<div style='margin-top: -15px;'></div>", unsafe_allow_html=True)
+        date_range = st.selectbox(
+            "Period Filter",
+            PERIODS,
+            index=0,
+            label_visibility="collapsed"
+        )
+        custom = None
+        if date_range == CUSTOM_RANGE:
+            today = datetime.now(IST).date()
+            custom = st.date_input(
+                "Custom range",
+                value=(today - timedelta(days=29), today),
+                max_value=today,
+                key="custom_range",
+                label_visibility="collapsed"
+            )
+            if not custom:
+                custom = (today, today)
+
+    # =====================================================
+    # LOAD & PREP DATA
+    # =====================================================
+    try:
+        with st.spinner(f"⚡ Fetching {date_range} Pipeline..."):
+            # Strict IST window slices of the session superset (typed once, sorted by time)
+            _, _, win_start, win_end = get_date_range(date_range, custom)
+            loading = st.empty()
+            store = None
+            if AGGREGATE_MODE and active_tab in AGGREGATE_TABS:
+                # Falls back to the rows below if the proxy has no rollup to offer
+                store = get_aggregate_store(win_start)
+            if store is None:
+                with telemetry.span("store.current"):
+                    store = get_store(
+                        win_start,
+                        win_end,
+                        lambda partial: loading_pulse(loading, partial, date_range, (win_start, win_end))
+                    )
+            loading.empty()
+            metrics, ai_table, data_source = store.metrics, store.ai_table, store.source
+
+            gaps = store.coverage.missing(win_start, win_end)
+            if gaps:
+                st.warning("📡 Part of this range could not be loaded from the backend — figures are partial.")
+
+            # A local snapshot, or shared frames the backend could not revalidate since
+            sync = None if store.aggregated else get_sync()
+            if data_source == "cache" and sync.refreshing:
+                st.info("⏳ Showing the last data snapshot while live data loads in the background.")
+            elif data_source == "cache" or (sync and sync.last_error):
+                st.warning("📡 Offline Mode: Displaying last successful data snapshot (Supabase unreachable).")
+                if sync and sync.breaker.retry_in():
+                    st.caption(f"Backend paused after repeated failures — next attempt in {sync.breaker.retry_in():.0f}s.")
+    except ConnectionError as ce:
+        st.error(f"❌ Network Error: {str(ce)}")
+        st.info("💡 Tip: Try pinging your Supabase URL or checking if your VPN is blocking the connection.")
+        st.stop()
+    except Exception as e:
+        st.error(f"📡 API Error: Supabase is taking too long to respond or returned an error. {str(e)}")
+        st.warning("🔄 Please check your internet connection and ensure your Supabase project is active.")
+        st.stop()
+
+    # What this session shows; live_updates reruns the page once pushed changes replace it
+    # (aggregate views revalidate on their own max_age instead)
+    st.session_state["rendered_version"] = None if store.aggregated else store.render_token()
+
+    # Replace Tab rendering with conditional rendering based on active_tab
+    if active_tab == "⚡ Strategic Pulse":
+        strategic_pulse(store, date_range, (win_start, win_end), metrics)
+    elif active_tab == "📊 Pipeline Performance":
+        pipeline_performance(store)
+    elif active_tab == "🔻 Conversion Funnel":
+        conversion_funnel(store, date_range, (win_start, win_end))
+    elif active_tab == "🧠 AI Executive Insights":
+        ai_insights(date_range, ai_table)
+
+    telemetry.record("view", time.perf_counter() - view_clock, view_started, {"tab": active_tab, "period": date_range})
+    telemetry.flush()
+
+    if st.query_params.get("debug") == "1":
+        debug_panel(store, view_started)
+
+dashboard_body()
+
+# =====================================================
+# LIVE UPDATES (change feed)
+# =====================================================
+@st.fragment(run_every=3)
+def live_updates():
+    # Local check only: the feed thread has already applied the changes to the frames
+    store = get_sync().store
+    if store is not None and st.session_state.get("rendered_version") not in (None, store.render_token()):
+        st.rerun()
+
+if get_sync().feed:
+    live_updates()
+
+# =====================================================
+# RUN TELEMETRY (full script runs only)
+# =====================================================
+telemetry.record("run", time.perf_counter() - RUN_CLOCK, RUN_STARTED)
+telemetry.flush()
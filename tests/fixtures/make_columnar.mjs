@@ -0,0 +1,26 @@
+// Regenerates columnar_payload.bin with the proxy's encoder: node tests/fixtures/make_columnar.mjs
+import fs from 'fs';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { DEAL_SCHEMA, LEAD_SCHEMA, encodeColumnar } from '../../backend/src/utils/columnar.js';
+
+const leads = [
+    { lead_id: '987654321098765432', owner_name: 'Kushal Kalambi', status: 'Contacted', source: 'Website',
+      is_converted: true, created_time: '2026-02-16T09:10:58.123456+00:00', modified_time: '2026-02-17T10:00:00+00:00' },
+    { lead_id: '987654321098765433', owner_name: null, status: 'Contacted', source: 'Referral',
+      is_converted: false, created_time: '2026-02-16T18:45:00+00:00', modified_time: null },
+];
+const deals = [
+    { deal_id: '123456789012345678', lead_id: '987654321098765432', deal_name: 'Rishi Darda', owner_name: 'Kushal Kalambi',
+      stage: 'Closed Won', source: 'Website', amount: 2500000, created_time: '2026-02-18T05:30:00+00:00',
+      modified_time: '2026-03-01T12:00:00.5+00:00', closed_time: '2026-03-01T12:00:00.5+00:00' },
+    { deal_id: '123456789012345679', lead_id: null, deal_name: 'Pranav Atit', owner_name: 'Kushal Kalambi',
+      stage: 'Negotiation/Review', source: null, amount: null, created_time: '2026-02-19T00:00:00+00:00',
+      modified_time: '2026-02-19T00:00:00+00:00', closed_time: null },
+];
+
+const body = encodeColumnar(
+    { leads: { rows: leads, schema: LEAD_SCHEMA }, deals: { rows: deals, schema: DEAL_SCHEMA } },
+    { metrics: [], ai_table: [], source: 'live', since: null }
+);
+fs.writeFileSync(path.join(path.dirname(fileURLToPath(import.meta.url)), 'columnar_payload.bin'), body);
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from crm_engine.aggregate import AggregateSource, AggregateStore, SQLiteRollup
+from crm_engine.client import NOT_MODIFIED
+from crm_engine.periods import IST
+from crm_engine.store import CRMDataStore
+from crm_engine.synthetic import generate_payload
+
+NOW = datetime.now(IST).replace(microsecond=0)
+START = NOW - timedelta(days=800)
+WINDOWS = [
+    (START, None),
+    (NOW - timedelta(days=30), None),
+    (NOW - timedelta(days=400), NOW - timedelta(days=100)),
+    (NOW.replace(hour=0, minute=0, second=0), None),
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return CRMDataStore.from_payload(generate_payload(3000, seed=3), "live", START)
+
+
+@pytest.fixture(scope="module")
+def rollup(rows):
+    return SQLiteRollup(rows.leads, rows.deals, rows.metrics, rows.ai_table)
+
+
+@pytest.fixture(scope="module")
+def aggregated(rollup):
+    return AggregateStore.from_payload(rollup(START), START)
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+def test_rollup_kpis_match_the_row_store(rows, aggregated, start, end):
+    assert aggregated.kpis(start, end) == pytest.approx(rows.kpis(start, end))
+
+
+@pytest.mark.parametrize("name", ["leads_per_day", "lead_sources", "amount_by_stage"])
+@pytest.mark.parametrize("start, end", WINDOWS)
+def test_rollup_charts_match_the_row_store(rows, aggregated, name, start, end):
+    expected = rows.chart_data(name, start, end).reset_index(drop=True)
+    actual = aggregated.chart_data(name, start, end).reset_index(drop=True)
+    if name == "amount_by_stage":
+        # Ties in amount may come out in either order
+        expected = expected.sort_values(["amount", "stage"]).reset_index(drop=True)
+        actual = actual.sort_values(["amount", "stage"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+class FlakyRollup:
+    def __init__(self, rollup):
+        self.rollup = rollup
+        self.fail = False
+        self.calls = 0
+
+    def __call__(self, start, end=None, conditional=False):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("proxy unreachable")
+        return NOT_MODIFIED if conditional else self.rollup(start, end)
+
+
+def test_source_serves_the_last_good_store_when_the_proxy_fails(rollup):
+    fetch = FlakyRollup(rollup)
+    source = AggregateSource(fetch, max_age=0)
+    store = source.current(START)
+
+    fetch.fail = True
+    assert source.current(START) is store
+    assert source.last_error == "proxy unreachable"
+
+    fetch.fail = False
+    assert source.current(START) is store  # 304 keeps the store
+    assert source.last_error is None
+
+
+def test_source_stops_calling_a_failing_proxy(rollup):
+    fetch = FlakyRollup(rollup)
+    source = AggregateSource(fetch, max_age=0)
+    source.current(START)
+    fetch.fail = True
+    for _ in range(10):
+        source.current(START)
+    # The breaker opens after its failure threshold
+    assert fetch.calls == 1 + source.breaker.failure_threshold
+
+
+def test_source_raises_without_a_good_store(rollup):
+    fetch = FlakyRollup(rollup)
+    fetch.fail = True
+    with pytest.raises(ConnectionError):
+        AggregateSource(fetch).current(START)
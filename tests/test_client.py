@@ -0,0 +1,64 @@
+from crm_engine.client import MAX_ETAGS, NOT_MODIFIED, BackendClient
+
+
+class Response:
+    def __init__(self, status, etag=None, body=b"{}"):
+        self.status_code = status
+        self.content = body
+        self.headers = {"Content-Type": "application/json", "X-Data-Version": "v1"}
+        if etag:
+            self.headers["ETag"] = etag
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {}
+
+
+def fake_session(client, etags):
+    sent = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        sent.append(headers.get("If-None-Match"))
+        key = tuple(sorted(params.items()))
+        if key in etags and headers.get("If-None-Match") == etags[key]:
+            return Response(304)
+        return Response(200, etags.setdefault(key, f'"{len(etags)}"'))
+
+    client.session.get = get
+    return sent
+
+
+def test_etags_are_replayed_and_bounded():
+    client = BackendClient()
+    etags = {}
+    sent = fake_session(client, etags)
+
+    client.get_payload("/data", {"since": 0})
+    assert client.get_payload("/data", {"since": 0}) is NOT_MODIFIED
+    assert sent == [None, '"0"']
+    assert client.served_version() == "v1"
+
+    # Every delta poll has a new `since`: old entries are evicted, recent ones kept
+    for since in range(1, 3 * MAX_ETAGS):
+        client.get_payload("/data", {"since": since})
+    assert len(client._etags) == MAX_ETAGS
+    assert client.get_payload("/data", {"since": 3 * MAX_ETAGS - 1}) is NOT_MODIFIED
+    client.get_payload("/data", {"since": 0})
+    assert sent[-1] is None
+
+
+def test_list_params_are_sent_as_repeated_parameters():
+    client = BackendClient()
+    sent = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        sent.append(params)
+        return Response(200, '"deals"')
+
+    client.session.get = get
+    client.get_payload("/deals", {"stage": ["Closed Won", "Proposal, Revised"], "source": None})
+    assert sent == [{"stage": ["Closed Won", "Proposal, Revised"]}]
+    assert client.get_payload("/deals", {"stage": ["Closed Won", "Proposal, Revised"]}) is not NOT_MODIFIED
+    assert len(client._etags) == 1
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from crm_engine.coverage import CoverageIndex
+from crm_engine.periods import IST
+from crm_engine.store import CRMDataStore
+from crm_engine.sync import DeltaSync
+from crm_engine.synthetic import generate_payload
+
+
+def day(n):
+    return datetime(2026, 1, n, tzinfo=timezone.utc)
+
+
+def test_missing_within_one_open_span():
+    index = CoverageIndex.of(day(10))
+    assert index.missing(day(12), day(15)) == []
+    assert index.missing(day(5), day(12)) == [(day(5), day(10))]
+    assert index.missing(None, day(3)) == [(None, day(3))]
+
+
+def test_overlapping_spans_merge():
+    index = CoverageIndex.of(day(1), day(5)).add(day(3), day(8))
+    assert index.spans == CoverageIndex.of(day(1), day(8)).spans
+    assert index.covers(day(2), day(7))
+
+
+def test_adjacent_spans_merge():
+    index = CoverageIndex.of(day(1), day(5)).add(day(5), day(9))
+    assert len(index.spans) == 1
+    assert index.covers(day(1), day(9))
+
+
+def test_gaps_between_disjoint_spans():
+    index = CoverageIndex.of(day(1), day(3)).add(day(5), day(7)).add(day(9), None)
+    assert index.missing(day(2), day(10)) == [(day(3), day(5)), (day(7), day(9))]
+    assert index.missing(day(1), day(3)) == []
+
+
+def test_empty_spans():
+    assert CoverageIndex().missing(day(1), day(2)) == [(day(1), day(2))]
+    # An empty interval is never missing, and an empty span adds nothing
+    assert CoverageIndex().missing(day(2), day(2)) == []
+    assert CoverageIndex.of(day(4), day(4)).spans == []
+    assert CoverageIndex.of(day(1), day(2)).add(day(6), day(6)).spans == CoverageIndex.of(day(1), day(2)).spans
+
+
+def test_minus():
+    held = CoverageIndex.of(day(1), day(4)).add(day(6), None)
+    assert held.minus(CoverageIndex.of(day(6))) == [(day(1), day(4))]
+    assert held.minus(CoverageIndex.of(day(2))) == [(day(1), day(2))]
+    assert held.minus(held) == []
+    assert CoverageIndex().minus(held) == []
+
+
+@pytest.fixture
+def sync():
+    start = datetime.now(IST) - timedelta(days=200)
+    sync = DeltaSync(start, persist=False, prewarm=False)
+    sync.store = CRMDataStore.from_payload(generate_payload(300, seed=1, span_days=200), "live", start)
+    sync.checked_at = datetime.now(IST)
+    return sync
+
+
+def test_full_reload_keeps_backfilled_rows_and_prefers_fresh_ones(sync, monkeypatch):
+    lo, hi = sync.coverage_start - timedelta(days=100), sync.coverage_start
+    older = generate_payload(100, seed=2, end=hi, span_days=100)
+    monkeypatch.setattr("crm_engine.sync.fetch_range", lambda start, end: older)
+    sync.ensure(lo, hi)
+    backfilled_ids = {int(d["deal_id"]) for d in older["deals"]}
+
+    # The reload sees one of the backfilled deals again, modified since
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    touched = dict(older["deals"][0], stage="Closed Lost", modified_time=now)
+    reload = generate_payload(300, seed=1, span_days=200)
+    reload["deals"].append(touched)
+    monkeypatch.setattr("crm_engine.sync.fetch_payload", lambda start: reload)
+    monkeypatch.setattr(sync, "since", lambda: None)
+    sync._revalidate()
+
+    store = sync.store
+    assert sync.last_error is None
+    assert store.coverage.covers(lo, None)
+    assert backfilled_ids <= set(store.deals["deal_id"].tolist())
+    row = store.deals[store.deals["deal_id"] == int(touched["deal_id"])]
+    assert row["stage"].tolist() == ["Closed Lost"]
@@ -0,0 +1,166 @@
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from crm_engine.client import client
+from crm_engine.feed import LocalFeed
+from crm_engine.history import MetricsHistory
+from crm_engine.periods import IST
+from crm_engine.store import CRMDataStore
+from crm_engine.sync import DeltaSync
+from crm_engine.synthetic import generate_payload
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the feed")
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def payload():
+    return generate_payload(400, seed=1)
+
+
+@pytest.fixture
+def sync(payload):
+    # A loaded sync that never touches the network: no persistence, nothing stale
+    start = datetime.now(IST) - timedelta(days=800)
+    sync = DeltaSync(start, persist=False, prewarm=False)
+    sync.store = CRMDataStore.from_payload(payload, "live", start)
+    sync.checked_at = datetime.now(IST)
+    return sync
+
+
+@pytest.fixture
+def feed(sync):
+    source = LocalFeed()
+    follower = sync.follow(source)
+    wait_until(lambda: follower.connected)
+    yield source
+    follower.stop()
+
+
+def test_feed_upserts_leads_and_deals(sync, feed, payload):
+    before = sync.store
+    now = datetime.now(IST).isoformat()
+    deal = dict(payload["deals"][0], stage="Closed Lost", modified_time=now, closed_time=now)
+    lead = dict(payload["leads"][0], lead_id="999000000000000001", created_time=now, modified_time=now)
+
+    feed.publish(leads=[lead], deals=[deal])
+    wait_until(lambda: sync.store.version != before.version)
+
+    store = sync.store
+    assert len(store.leads) == len(before.leads) + 1
+    assert len(store.deals) == len(before.deals)
+    row = store.deals[store.deals["deal_id"] == int(deal["deal_id"])]
+    assert row["stage"].tolist() == ["Closed Lost"]
+    assert sync.feed.applied == 1
+
+
+def test_feed_side_table_change_moves_render_token(sync, feed):
+    before = sync.store
+    summary = {"id": 7, "payload": {"aiSummary": {"text": "Pipeline is up"}}, "created_at": datetime.now(IST).isoformat()}
+
+    feed.publish(ai_table=[summary])
+    wait_until(lambda: sync.store.render_token() != before.render_token())
+
+    store = sync.store
+    # Frames and memos are kept; only the side-table token moves
+    assert store.version == before.version
+    assert store.leads is before.leads
+    assert store.ai_table.iloc[0]["payload"]["aiSummary"]["text"] == "Pipeline is up"
+
+
+def test_feed_metrics_change_moves_render_token(sync, feed, payload):
+    before = sync.store
+    row = dict(payload["metrics"][0], leads_contacted=123, updated_at=datetime.now(IST).isoformat())
+
+    feed.publish(metrics=[row])
+    wait_until(lambda: sync.store.render_token() != before.render_token())
+
+    assert sync.store.metrics.iloc[0]["leads_contacted"] == 123
+
+
+def test_unchanged_side_tables_keep_render_token(sync, payload):
+    # A poll re-sending the same side tables is not a change
+    store = sync.store.with_delta({"leads": [], "deals": [], "metrics": payload["metrics"], "ai_table": []})
+    assert store.render_token() == sync.store.render_token()
+
+
+def test_feed_version_event_marks_data_version(sync, feed):
+    feed.publish(version="2026-10-17T10:00:00Z")
+    wait_until(lambda: sync.data_version == "2026-10-17T10:00:00Z")
+    assert sync.feed_live
+    assert isinstance(sync.store.metrics, pd.DataFrame)
+
+
+def test_revalidate_keeps_rows_pushed_during_the_fetch(sync, payload, monkeypatch):
+    now = datetime.now(IST).isoformat()
+    pushed = dict(payload["leads"][0], lead_id="999000000000000002", created_time=now, modified_time=now)
+    polled = dict(payload["leads"][1], lead_id="999000000000000003", created_time=now, modified_time=now)
+
+    def fetch_delta(start, since):
+        # A feed push lands while the poll is in flight
+        sync.apply_change({"leads": [pushed]})
+        return {"leads": [polled], "deals": [], "metrics": [], "ai_table": []}
+
+    monkeypatch.setattr("crm_engine.sync.fetch_delta", fetch_delta)
+    sync._revalidate()
+
+    ids = set(sync.store.leads["lead_id"].tolist())
+    assert {999000000000000002, 999000000000000003} <= ids
+    assert sync.last_error is None
+
+
+def test_feed_appends_metrics_history(sync, feed, payload, tmp_path):
+    sync.history = MetricsHistory(str(tmp_path))
+    before = sync.store
+    row = dict(payload["metrics"][0], metric_date="2026-10-16", leads_contacted=42,
+               updated_at="2026-10-16T18:00:00+00:00")
+
+    feed.publish(metrics_history=[row])
+    wait_until(lambda: sync.store.render_token() != before.render_token())
+
+    assert str(sync.history.last_date()) == "2026-10-16"
+    assert sync.history.summary(datetime(2026, 10, 16, tzinfo=IST))["leads_contacted"] == 42
+    # Only the history changed: the frames and their memos are kept
+    assert sync.store.version == before.version
+
+
+def test_full_reload_keeps_backfilled_spans(sync, monkeypatch):
+    # Backfill a year before the superset, then force a full reload
+    lo, hi = sync.coverage_start - timedelta(days=365), sync.coverage_start
+    older = generate_payload(200, seed=2, end=hi, span_days=365)
+    monkeypatch.setattr("crm_engine.sync.fetch_range", lambda start, end: older)
+    sync.ensure(lo, hi)
+    backfilled = len(sync.store.leads)
+    assert sync.store.coverage.covers(lo, None)
+
+    monkeypatch.setattr("crm_engine.sync.fetch_payload", lambda start: generate_payload(400, seed=1))
+    monkeypatch.setattr(sync, "since", lambda: None)
+    sync._revalidate()
+
+    assert sync.last_error is None
+    assert sync.store.coverage.covers(lo, None)
+    assert len(sync.store.leads) == backfilled
+
+
+def test_revalidate_labels_frames_with_the_served_version(sync, monkeypatch):
+    def fetch_delta(start, since):
+        # A response the proxy produced before the newer pipeline run landed
+        client._local.version = "run-1"
+        return None
+
+    monkeypatch.setattr("crm_engine.sync.fetch_delta", fetch_delta)
+    sync.target_version = "run-2"
+    sync._revalidate()
+
+    assert sync.data_version == "run-1"
+    # Still behind the requested version: asked again after PEER_RECHECK
+    sync.checked_at -= timedelta(seconds=1)
+    assert sync._stale()
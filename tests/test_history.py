@@ -0,0 +1,34 @@
+from crm_engine.history import MetricsHistory
+
+
+def row(day, contacted, updated):
+    return {"metric_date": f"2026-10-{day:02d}", "updated_at": f"2026-10-{day:02d}T{updated}:00+00:00",
+            "leads_contacted": contacted, "new_leads_today": 1}
+
+
+def test_later_row_for_a_date_wins(tmp_path):
+    history = MetricsHistory(str(tmp_path))
+    history.append([row(1, 5, "10:00"), row(2, 7, "10:00")])
+    history.append([row(2, 9, "12:00"), row(2, 3, "11:00")])
+    assert len(history) == 2
+    assert history.window(None)["leads_contacted"].tolist() == [5, 9]
+
+
+def test_compact_keeps_rows_appended_by_another_worker(tmp_path):
+    mine, other = MetricsHistory(str(tmp_path)), MetricsHistory(str(tmp_path))
+    mine.append([row(1, 5, "10:00"), row(1, 6, "11:00")])
+    assert len(mine) == 1
+
+    file_lock = mine._file_lock
+
+    def contended():
+        # The other worker takes the lock first and appends
+        other.append([row(2, 8, "10:00")])
+        return file_lock()
+
+    mine._file_lock = contended
+    mine.compact()
+
+    fresh = MetricsHistory(str(tmp_path))
+    assert fresh.window(None)["leads_contacted"].tolist() == [6, 8]
+    assert len(fresh._raw["metric_date"]) == 2
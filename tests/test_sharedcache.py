@@ -0,0 +1,78 @@
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pytest
+
+from crm_engine.periods import IST
+from crm_engine.sharedcache import SharedCache
+from crm_engine.store import CRMDataStore
+from crm_engine.sync import DeltaSync
+from crm_engine.synthetic import generate_payload
+
+START = datetime.now(IST) - timedelta(days=800)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SharedCache(str(tmp_path))
+
+
+def worker(cache):
+    return DeltaSync(START, persist=True, cache=cache, prewarm=False)
+
+
+def test_peer_snapshot_is_adopted_as_live_and_revalidated_with_a_delta(cache, monkeypatch):
+    publisher = worker(cache)
+    with publisher._lock:
+        publisher._publish(CRMDataStore.from_payload(generate_payload(300, seed=4), "live", START))
+
+    # Published an hour before a peer reads it
+    with closing(cache._connect()) as db:
+        db.execute("UPDATE cache_entries SET created_at = created_at - 3600")
+    peer = worker(cache)
+    assert peer._adopt()
+    assert peer.store.source == "live"
+    assert peer._stale()
+
+    calls = []
+    monkeypatch.setattr("crm_engine.sync.fetch_payload", lambda start: calls.append("full"))
+    monkeypatch.setattr("crm_engine.sync.fetch_delta", lambda start, since: calls.append(("delta", since)))
+    peer._revalidate()
+    assert [c[0] for c in calls] == ["delta"]
+    assert calls[0][1] is not None
+
+
+def test_readers_are_served_while_a_peer_snapshot_is_adopted(cache, monkeypatch):
+    publisher, peer = worker(cache), worker(cache)
+    with publisher._lock:
+        publisher._publish(CRMDataStore.from_payload(generate_payload(300, seed=4), "live", START))
+    assert peer.current().source == "live"
+    old = peer.store
+    with publisher._lock:
+        publisher._publish(CRMDataStore.from_payload(generate_payload(300, seed=5), "live", START))
+
+    read = peer._read_shared
+    served = []
+
+    def slow_read():
+        # Another session reads while this one types the snapshot
+        served.append(peer.current())
+        return read()
+
+    monkeypatch.setattr(peer, "_read_shared", slow_read)
+    assert peer.current() is not old
+    assert served == [old]
+    assert peer.generation == publisher.generation
+
+
+def test_eviction_keeps_the_newest_generations_within_the_budget(tmp_path):
+    store = CRMDataStore.from_payload(generate_payload(100, seed=6), "live", START)
+    cache = SharedCache(str(tmp_path), keep=2)
+    for _ in range(4):
+        cache.put("superset", store)
+    assert [row[1] for row in cache.entries()] == [4, 3]
+
+    # Over budget, older generations go too; the newest one always stays
+    cache.budget_bytes = 0
+    cache.put("superset", store)
+    assert [row[1] for row in cache.entries()] == [5]
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from crm_engine.periods import IST
+from crm_engine.store import CRMDataStore
+from crm_engine.synthetic import generate_payload
+
+START = datetime.now(IST) - timedelta(days=800)
+EDITED = "2026-10-17T10:00:00+00:00"
+
+
+@pytest.fixture
+def payload():
+    return generate_payload(200, seed=4)
+
+
+@pytest.fixture
+def store(payload):
+    return CRMDataStore.from_payload(payload, "live", START)
+
+
+def delta(leads=(), deals=()):
+    return {"leads": list(leads), "deals": list(deals), "metrics": [], "ai_table": []}
+
+
+def test_apply_delta_upserts_changed_rows_by_id(store, payload):
+    deal = dict(payload["deals"][0], stage="Closed Lost", modified_time=EDITED)
+    updated = store._apply_delta(delta(deals=[deal]))
+
+    assert len(updated.deals) == len(store.deals)
+    row = updated.deals[updated.deals["deal_id"] == int(deal["deal_id"])]
+    assert row["stage"].tolist() == ["Closed Lost"]
+    assert updated.version != store.version
+    # The previous store is untouched for readers still holding it
+    assert store.deals[store.deals["deal_id"] == int(deal["deal_id"])]["stage"].tolist() != ["Closed Lost"]
+
+
+def test_apply_delta_skips_rows_with_unchanged_modified_time(store, payload):
+    # The overlap window re-sends rows as they were; a stale edit must not win either
+    resent = dict(payload["deals"][1], stage="Closed Lost")
+    updated = store._apply_delta(delta(leads=payload["leads"][:5], deals=[resent]))
+
+    assert updated.leads is store.leads
+
+    assert updated.version == store.version
+
+
+def test_apply_delta_inserts_new_rows(store, payload):
+    lead = dict(payload["leads"][0], lead_id="999000000000000010", created_time=EDITED, modified_time=EDITED)
+    updated = store._apply_delta(delta(leads=[lead]))
+
+    assert len(updated.leads) == len(store.leads) + 1
+    assert 999000000000000010 in set(updated.leads["lead_id"].tolist())
+
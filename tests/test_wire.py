@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+from crm_engine.periods import IST
+from crm_engine.wire import decode_columnar
+
+# Encoded by backend/src/utils/columnar.js (tests/fixtures/make_columnar.mjs)
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "columnar_payload.bin")
+
+
+def decode():
+    with open(FIXTURE, "rb") as fh:
+        return decode_columnar(fh.read())
+
+
+def test_decodes_meta_and_frames():
+    payload = decode()
+    assert payload["source"] == "live"
+    assert len(payload["leads"]) == 2
+    assert len(payload["deals"]) == 2
+
+
+def test_dictionary_columns_decode_to_categoricals_with_nulls():
+    payload = decode()
+    leads, deals = payload["leads"], payload["deals"]
+    assert isinstance(leads["status"].dtype, pd.CategoricalDtype)
+    assert leads["status"].tolist() == ["Contacted", "Contacted"]
+    assert leads["owner_name"].iloc[0] == "Kushal Kalambi"
+    assert pd.isna(leads["owner_name"].iloc[1])
+    assert deals["stage"].tolist() == ["Closed Won", "Negotiation/Review"]
+    assert pd.isna(deals["source"].iloc[1])
+
+
+def test_numeric_ids_keep_full_precision_and_nulls():
+    payload = decode()
+    leads, deals = payload["leads"], payload["deals"]
+    assert leads["lead_id"].tolist() == [987654321098765432, 987654321098765433]
+    assert deals["deal_id"].tolist() == [123456789012345678, 123456789012345679]
+    assert deals["lead_id"].iloc[0] == 987654321098765432
+    assert pd.isna(deals["lead_id"].iloc[1])
+
+
+def test_timestamps_decode_to_microseconds_in_ist():
+    payload = decode()
+    leads, deals = payload["leads"], payload["deals"]
+    created = leads["created_time"].iloc[0]
+    assert created.tzinfo is not None and created.utcoffset() == IST.utcoffset(None)
+    assert created == pd.Timestamp("2026-02-16T09:10:58.123456+00:00")
+    assert deals["closed_time"].iloc[0] == pd.Timestamp("2026-03-01T12:00:00.5+00:00")
+    assert pd.isna(deals["closed_time"].iloc[1])
+    assert pd.isna(leads["modified_time"].iloc[1])
+    assert deals["amount"].iloc[0] == 2500000
+    assert pd.isna(deals["amount"].iloc[1])
+    assert leads["is_converted"].tolist() == [True, False]